@@ -0,0 +1,49 @@
+"""Micro-benchmark of srcs.jsonStream against docker's json_stream on build progress shaped input.
+
+python benchmarks/jsonStreamBenchmark.py
+"""
+import json
+import os
+import sys
+import timeit
+from docker.utils.json_stream import json_stream as docker_json_stream
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from srcs.jsonStream import json_stream
+
+REPEAT = 5
+
+
+def chunked(data, size):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+def progress_lines(count, width):
+    """count build output messages of about width bytes each, as the daemon sends them."""
+    return b"".join(json.dumps({"stream": "x" * width + "\n"}).encode() + b"\r\n" for _ in range(count))
+
+
+SCENARIOS = [
+    # (name, chunks)
+    ("10k short lines, one per chunk", chunked(progress_lines(10000, 80), 95)),
+    ("10k short lines, 64 KB chunks", chunked(progress_lines(10000, 80), 65536)),
+    ("one 1 MB message, 1 KB chunks", chunked(progress_lines(1, 1024 * 1024), 1024)),
+    ("one 4 MB message, 4 KB chunks", chunked(progress_lines(1, 4 * 1024 * 1024), 4096)),
+]
+
+
+def best_time(decode, chunks):
+    return min(timeit.repeat(lambda: sum(1 for _ in decode(chunks)), number=1, repeat=REPEAT))
+
+
+def main():
+    print(f"{'scenario':<34} {'docker json_stream':>18} {'jsonStream':>12} {'speedup':>8}")
+    for name, chunks in SCENARIOS:
+        assert list(json_stream(chunks)) == list(docker_json_stream(chunks))
+        docker_time = best_time(docker_json_stream, chunks)
+        our_time = best_time(json_stream, chunks)
+        print(f"{name:<34} {docker_time * 1000:>16.1f}ms {our_time * 1000:>10.1f}ms {docker_time / our_time:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,82 +1,129 @@
-
+import argparse
+import logging
 import os
-import shutil
 import sys
+import threading
 sys.path.append(os.path.join(os.path.dirname(__file__), 'srcs'))
 from srcs.pythonDockerHandler import DockerHandler
+from srcs.batchRunner import read_manifest, run_batch
+from srcs.dockerClientManager import get_client_manager
+from srcs.logArchive import LogArchive
+from srcs.projectValidator import ValidationConfig, validate_project, warm_up
+from srcs.validationServer import serve
 
 PYTHON_IMAGE_LIST = ["python:3.7-slim", "python:3.8-slim", "python:3.9-slim", "python:3.10-slim", "python:3.11-slim", "python:3.12-slim"]
-
-def write_or_copy_code_to_workspace(option,source_code,user_directory,working_directory,filename="app.py") :
-
-    # Delete previous workspace
-    if os.path.normpath(user_directory) == os.path.normpath(working_directory):
-        print("The user_directory and working_directory can not be equal.")
+VERSION_STRATEGY = "matrix"  # "sequential" tries one version after another, "matrix" builds all versions concurrently, "race" starts all versions and cancels the ones that can no longer win, "bisect" searches for the lowest passing version in O(log n) builds, "multistage" builds every version as a stage of one BuildKit build
+MAX_PARALLEL_BUILDS = 3  # Upper bound on concurrent builds for the "matrix" strategy, "race" always starts every version
+WORKSPACE_ROOT = "/tmp/executionWorkspace"  # Every job gets its own workspace under it, deleted after the job. The winning Dockerfile is saved here as <image tag>.Dockerfile
+WORKSPACE_TMPFS = False  # Create the job workspaces on tmpfs (/dev/shm) when available
+STAGING_MODE = "copy"  # "copy" stages the code in the job workspace, "sync" keeps a workspace per project under WORKSPACE_CACHE_ROOT and only copies what changed, "stream" tars it straight from your directory or the typed source
+WORKSPACE_CACHE_ROOT = "/tmp/executionWorkspaces"  # Per-project workspaces of the "sync" staging mode
+DEFAULT_DOCKERIGNORE = True  # Leave .git, __pycache__, virtualenvs, node_modules and dumps out of the build context, your .dockerignore can bring them back with "!pattern"
+MAX_CONTEXT_SIZE = 500 * 1024 * 1024  # Bytes, a larger build context aborts the job before anything is copied or uploaded, None for no limit
+CONTEXT_REPORT_TOP_N = 5  # Largest paths listed in the build context report
+BUILD_BACKEND = "classic"  # "classic" builds through the docker API, "buildkit" runs `docker buildx build` with a pip cache shared per Python version
+CONTAINER_RUN_TIMEOUT = 60  # Seconds app.py gets to exit with code 0 when the validation container runs
+CONTAINER_LOG_DIRECTORY = "/tmp/executionLogs"  # Full output of every validation container as <image tag>-<version>-<job id>.log, only its tail is printed. None keeps only the tail
+LOG_ARCHIVE_DIRECTORY = "/tmp/executionLogs/archive"  # Compressed archive of the build and run logs of every job, read them back with `python main.py logs <job id>`. None disables it
+DOCKER_API_VERSION = None  # Pin the daemon API version (i.e: "1.43") to skip the /version negotiation, None negotiates once per process
+RESULT_CACHE_FILE = "/tmp/executionCache/results.json"  # Validation results keyed by workspace hash and base image digest, set to None to always rebuild
+DEDUPLICATE_BUILDS = True  # Jobs asking for a build identical to one already running wait for its result instead of building it again
+BASE_IMAGE_FILE = "/tmp/executionCache/base_images.json"  # Digests of the pre-pulled base images the FROM lines are pinned to, set to None to let each build pull FROM the tag
+BASE_IMAGE_REFRESH_INTERVAL = 24 * 3600  # Seconds before the base images are pulled again for newer digests
+VALIDATION_MODE = "container"  # "container" runs app.py in warm containers of each version and builds only the winning image, "image" builds and runs an image per version
+CONTAINER_POOL_SIZE = 2  # Idle warm containers kept per version in container mode
+BATCH_JOBS = 2  # Projects validated concurrently by `python main.py batch`, each one runs up to MAX_PARALLEL_BUILDS builds
+SERVER_HOST = "127.0.0.1"  # Address `python main.py serve` listens on, local only by default
+SERVER_PORT = 8765
+SERVER_WORKERS = 2  # Jobs the server validates concurrently, further jobs wait in its priority queue
+
+def default_config():
+    """ValidationConfig made of the constants above."""
+    return ValidationConfig(versions=PYTHON_IMAGE_LIST, strategy=VERSION_STRATEGY, max_parallel_builds=MAX_PARALLEL_BUILDS, workspace_root=WORKSPACE_ROOT,
+                            workspace_tmpfs=WORKSPACE_TMPFS, staging_mode=STAGING_MODE, workspace_cache_root=WORKSPACE_CACHE_ROOT,
+                            default_dockerignore=DEFAULT_DOCKERIGNORE, max_context_size=MAX_CONTEXT_SIZE, context_report_top_n=CONTEXT_REPORT_TOP_N,
+                            build_backend=BUILD_BACKEND, run_timeout=CONTAINER_RUN_TIMEOUT, container_log_directory=CONTAINER_LOG_DIRECTORY,
+                            log_archive_directory=LOG_ARCHIVE_DIRECTORY, docker_api_version=DOCKER_API_VERSION, result_cache_file=RESULT_CACHE_FILE,
+                            deduplicate_builds=DEDUPLICATE_BUILDS, base_image_file=BASE_IMAGE_FILE,
+                            base_image_refresh_interval=BASE_IMAGE_REFRESH_INTERVAL, validation_mode=VALIDATION_MODE,
+                            container_pool_size=CONTAINER_POOL_SIZE)
+
+def print_job_logs(job_id, version=None):
+    """Print the archived build and run logs of a job, or of one version of it."""
+    if LOG_ARCHIVE_DIRECTORY is None:
+        print("The log archive is disabled, set LOG_ARCHIVE_DIRECTORY to keep the logs of every job.")
         return False
-    if os.path.exists(working_directory):
-       shutil.rmtree(working_directory)
-    
-    os.makedirs(working_directory)
-
-    # Empty requirements.txt
-    requirements_txt_path = os.path.join(working_directory, "requirements.txt")
-
-    with open(requirements_txt_path, "w") as f:
-        f.write("")  # Create an empty requirements.txt
-        f.close()
-        print(f"Empty requirements.txt created at {requirements_txt_path}.")
-
-    if option == '1':
-        # write the source code as filename which is app.py by default
-        with open(os.path.join(working_directory, filename), "w") as f:
-            f.write(source_code)
-            f.close()
-    if option == '2':
-        # copy entire user directory to the workspace directory
-        # first check if the directory contains app.py, then do the copying
-        file_path = os.path.join(user_directory, "app.py")
-
-        if os.path.exists(file_path) and os.path.isfile(file_path):
-            for item in os.listdir(user_directory):
-                source_item = os.path.join(user_directory, item)
-                dest_item = os.path.join(working_directory, item)
-                if os.path.isdir(source_item):
-                    shutil.copytree(source_item, dest_item)
-                else:
-                    shutil.copy2(source_item, dest_item)
-        else:
-            print("You should have app.py in your project directory. If this is main.py, remane to app.py and then run.")
-            return False
+    log_archive = LogArchive(LOG_ARCHIVE_DIRECTORY)
+    records = [record for record in log_archive.job_records(job_id) if version is None or record["version"] == version]
+    if not records:
+        print(f"No archived logs for job {job_id}{' and version ' + version if version else ''}.")
+        return False
+    for record in records:
+        print(f"===== {record['version']} {record['kind']} ({record['size']} bytes) =====")
+        print(log_archive.read(record["job"], record["version"], record["kind"]).decode("utf-8", "replace"))
     return True
-        
-def main():
-    # Dockerfile content for a Python-based image, including pip install for requirements.txt
-    dockerfile_content = """
-    # Use an official Python runtime as a parent image
-    FROM {version}
 
-    # Set the working directory in the container
-    WORKDIR /app
-
-    # Copy the current directory contents into the container at /app
-    COPY . /app
-
-    # Install dependencies from requirements.txt
-    RUN pip install -r requirements.txt
-
-    # Run app.py during the build process
-    RUN python app.py
-
-    # Run the application when the container starts
-    CMD ["python", "app.py"]
-    """
+def warm_base_images():
+    """Pull every base image of PYTHON_IMAGE_LIST in parallel and print the digests the FROM lines are pinned to."""
+    config = default_config()
+    if config.base_images() is None:
+        print("BASE_IMAGE_FILE is None, base images are not pinned.")
+        return False
+    client = get_client_manager(maxPoolSize=len(PYTHON_IMAGE_LIST), apiVersion=DOCKER_API_VERSION).get_client()
+    pins = config.base_images().warm(client, PYTHON_IMAGE_LIST, refresh=True)
+    for version in PYTHON_IMAGE_LIST:
+        print(f"{version:<20}{pins.get(version, 'not pinned, the pull failed')}")
+    return len(pins) == len(PYTHON_IMAGE_LIST)
+
+def run_batch_manifest(manifest_file, jobs=BATCH_JOBS, output_file=None):
+    """Validate every project of a JSON lines manifest, writing one JSON line per result to output_file or stdout."""
+    config = default_config()
+    manifest = read_manifest(manifest_file)
+    logging.getLogger(__name__).info(f"Validating {len(manifest)} projects from {manifest_file}, {jobs} at a time.")
+    if output_file is None:
+        counts = run_batch(manifest, config, jobs, sys.stdout)
+    else:
+        with open(output_file, "a") as output:
+            counts = run_batch(manifest, config, jobs, output)
+    logging.getLogger(__name__).info("Batch finished: " + ", ".join(f"{count} {status}" for status, count in sorted(counts.items())))
+    return counts.get("pass", 0) == len(manifest)
+
+def run_job(option,source_code,user_directory,image_tag,config):
+    """Validate the typed source or the project directory and print the outcome."""
+    # Create DockerHandler object and execute the steps
+    print("Creating a Docker image based on your input. We'll attempt to use Python versions ranging from 3.7 to 3.12 to build the image")
+    if option == '1':
+        result = validate_project(source=source_code, tag=image_tag, config=config)
+    else:
+        result = validate_project(path=user_directory, tag=image_tag, config=config)
+    if result.results:
+        print(result.table())
+    if result.passed:
+        print("Execution completed successfully with python version " + result.winner.version)
+    else:
+        print("Execution failed. Please check the logs for errors.")
+    if result.log_archive is not None:
+        print(f"Build and run logs archived as job {result.job_id}, print them with: python main.py logs {result.job_id} [version]")
+    return result
+
+def warm_in_background(config):
+    """Pull the base images and start the warm containers while the user types, the first validation doesn't wait for them."""
+    def warm():
+        try:
+            warm_up(config, get_client_manager(maxPoolSize=2 * max(MAX_PARALLEL_BUILDS, len(PYTHON_IMAGE_LIST)), apiVersion=DOCKER_API_VERSION))
+        except Exception as e:
+            logging.getLogger(__name__).error(f"Error warming up: {e}")
+
+    threading.Thread(target=warm, daemon=True).start()
 
+def main():
+    config = default_config()
+    warm_in_background(config)
     while True:
         # Taking user input for the directory that should contain app.py
         userDirectory = ""
         userOption = '0'
         inputSourceCode = ""
-        workingDirectory = "/tmp/executionWorkspace" # hard coded
 
         userOption = input("\n\nEnter 1 if you want to provide source code, Enter 2 if you want to provide the directory location where your app.py (main method) located \n\n")
 
@@ -106,24 +153,41 @@ def main():
                 print(f"Error: The directory {userDirectory} does not exist.")
                 continue
         
-        write_or_copy_code_to_workspace(userOption,source_code=inputSourceCode,user_directory=userDirectory,working_directory=workingDirectory)
-
         # Define image tag
         imagName = input("Enter the docker image tag you want your docker image to tag with. No space and only small case english letter please,i.e:python-user-hello-world\n")
 
         image_tag = imagName
 
-        # Create DockerHandler object and execute the steps
-        print("Creating a Docker image based on your input. We'll attempt to use Python versions ranging from 3.7 to 3.12 to build the image")
-        
-        for version in PYTHON_IMAGE_LIST:
-            dockerfile = dockerfile_content.replace("{version}", version)
-            dockerHandler = DockerHandler(dockerfile, image_tag, "", workingDirectory)
-            if dockerHandler.execute():
-                print("Execution completed successfully with python version " + version)
-                break
-            else:
-                print("Execution failed. Please check the logs for errors.")
+        run_job(userOption, inputSourceCode, userDirectory, image_tag, config)
+
+def parse_arguments(argv):
+    parser = argparse.ArgumentParser(description="Validate a Python project against several Python versions and build its Docker image. Interactive without a command.")
+    commands = parser.add_subparsers(dest="command")
+    batch = commands.add_parser("batch", help="validate every project of a JSON lines manifest without prompts")
+    batch.add_argument("manifest", help='one JSON object per line: {"path": "/projects/a", "tag": "a", "strategy": "race"}, or "source_file" instead of "path"')
+    batch.add_argument("--jobs", type=int, default=BATCH_JOBS, help="projects validated concurrently")
+    batch.add_argument("--output", help="append the JSON lines results to this file instead of stdout")
+    server = commands.add_parser("serve", help="run a local HTTP server validating submitted jobs from a priority queue")
+    server.add_argument("--host", default=SERVER_HOST)
+    server.add_argument("--port", type=int, default=SERVER_PORT)
+    server.add_argument("--workers", type=int, default=SERVER_WORKERS, help="jobs validated concurrently")
+    commands.add_parser("warm", help="pull every base image in parallel and pin the FROM lines to their digests")
+    logs = commands.add_parser("logs", help="print the archived build and run logs of a job")
+    logs.add_argument("job_id")
+    logs.add_argument("version", nargs="?")
+    return parser.parse_args(argv)
 
 if __name__ == "__main__":
-    main()
+    arguments = parse_arguments(sys.argv[1:])
+    # The library logs its progress, the console shows it as plain lines. In batch mode stdout is kept for the results
+    logging.basicConfig(level=logging.INFO, format="%(message)s", stream=sys.stderr if arguments.command == "batch" else sys.stdout)
+    if arguments.command == "batch":
+        sys.exit(0 if run_batch_manifest(arguments.manifest, arguments.jobs, arguments.output) else 1)
+    elif arguments.command == "serve":
+        serve(default_config(), arguments.host, arguments.port, arguments.workers)
+    elif arguments.command == "warm":
+        sys.exit(0 if warm_base_images() else 1)
+    elif arguments.command == "logs":
+        print_job_logs(arguments.job_id, arguments.version)
+    else:
+        main()
@@ -0,0 +1,108 @@
+import concurrent.futures
+import json
+import logging
+import threading
+import time
+import docker
+from srcs.resultCache import write_json
+from srcs.singleFlight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BASE_IMAGE_FILE = "/tmp/executionCache/base_images.json"
+DEFAULT_REFRESH_INTERVAL = 24 * 3600  # Seconds a recorded digest is used before the base image is pulled again
+
+
+def repository_digest(image, version):
+    """The repository@sha256 reference of a pulled base image, None if the image has no registry digest."""
+    repository = docker.utils.parse_repository_tag(version)[0]
+    for reference in image.attrs.get("RepoDigests") or []:
+        if reference.split("@")[0] == repository:
+            return reference
+    return None
+
+
+class BaseImageRegistry:
+    """Digests of the pulled base images. The generated FROM lines are pinned to them, and they are refreshed on a schedule
+    instead of being pulled by the builds."""
+
+    def __init__(self, stateFile=DEFAULT_BASE_IMAGE_FILE, refreshInterval=DEFAULT_REFRESH_INTERVAL):
+        self.state_file = stateFile  # JSON file mapping each version to its pinned reference, image id and pull time
+        self.refresh_interval = refreshInterval
+        self.lock = threading.Lock()
+        self.pulls = SingleFlight()  # Concurrent jobs warming the same version share one pull
+        self.stop_event = threading.Event()  # Stops the scheduled refresh
+        self.refresher = None
+        self.entries = self.load()
+
+    def load(self):
+        """Load the state file, an unreadable file is treated as empty."""
+        try:
+            with open(self.state_file) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def save(self):
+        """Write the state file atomically."""
+        write_json(self.state_file, self.entries)
+
+    def stale(self, version):
+        """True if the version was never pulled or its digest is older than the refresh interval."""
+        with self.lock:
+            entry = self.entries.get(version)
+        return entry is None or time.time() - entry["pulled"] >= self.refresh_interval
+
+    def pull(self, client, version):
+        """Pull one base image and record its digest, returns its entry or None if the pull failed."""
+
+        def pull():
+            logger.info(f"Pulling the base image {version}...")
+            image = client.images.pull(version)
+            entry = {"reference": repository_digest(image, version), "image_id": image.id, "pulled": time.time()}
+            with self.lock:
+                self.entries[version] = entry
+                try:
+                    self.save()
+                except OSError as e:
+                    logger.error(f"Error saving the base image digests {self.state_file}: {e}")
+            return entry
+
+        try:
+            return self.pulls.do(version, pull)[0]
+        except Exception as e:
+            logger.error(f"Error pulling the base image {version}: {e}")
+            return None
+
+    def warm(self, client, versions, refresh=False):
+        """Pull the stale base images of the versions in parallel, every one of them if refresh. Returns pins(versions)."""
+        pending = [version for version in versions if refresh or self.stale(version)]
+        if pending:
+            start = time.monotonic()
+            with concurrent.futures.ThreadPoolExecutor(max_workers=len(pending)) as pool:
+                pulled = sum(1 for entry in pool.map(lambda version: self.pull(client, version), pending) if entry)
+            logger.info(f"Pulled {pulled} of {len(pending)} base images in {time.monotonic() - start:.1f}s.")
+        return self.pins(versions)
+
+    def pins(self, versions):
+        """{version: repository@sha256 reference} of the versions with a recorded digest."""
+        with self.lock:
+            return {version: self.entries[version]["reference"] for version in versions
+                    if self.entries.get(version, {}).get("reference")}
+
+    def start_refresh(self, client, versions):
+        """Pull the base images again every refresh interval in a background thread, until stop_refresh()."""
+
+        def refresh():
+            while not self.stop_event.wait(self.refresh_interval):
+                self.warm(client, versions, refresh=True)
+
+        self.stop_event.clear()
+        self.refresher = threading.Thread(target=refresh, name="base-image-refresh", daemon=True)
+        self.refresher.start()
+
+    def stop_refresh(self):
+        self.stop_event.set()
+        if self.refresher is not None:
+            self.refresher.join()
+            self.refresher = None
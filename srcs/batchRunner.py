@@ -0,0 +1,92 @@
+import concurrent.futures
+import json
+import logging
+import os
+import uuid
+from srcs.dockerClientManager import get_client_manager
+from srcs.projectValidator import MatrixResult, validate_project, warm_up
+
+logger = logging.getLogger(__name__)
+
+
+class BatchJob:
+    def __init__(self, line, path=None, source_file=None, tag=None, strategy=None, versions=None, error=None):
+        self.line = line  # Line of the manifest, results are matched to jobs by it
+        self.path = path  # Project directory holding app.py
+        self.source_file = source_file  # Or a single file validated as app.py
+        self.tag = tag or f"batch-job-{line}"
+        self.strategy = strategy  # None uses the strategy of the config
+        self.versions = versions  # None uses the versions of the config
+        self.error = error  # Why the manifest line can't be run
+
+    def project(self):
+        return self.path if self.path is not None else self.source_file
+
+
+def parse_manifest_line(line_number, line):
+    """BatchJob for one JSON line of the manifest, i.e: {"path": "/projects/a", "tag": "a", "strategy": "race"}."""
+    try:
+        entry = json.loads(line)
+        if not isinstance(entry, dict):
+            raise ValueError("expected a JSON object")
+    except ValueError as e:
+        return BatchJob(line_number, error=f"Invalid manifest line: {e}")
+    versions = entry.get("versions")
+    if versions is not None and (not isinstance(versions, list) or not all(isinstance(version, str) for version in versions)):
+        return BatchJob(line_number, error='Invalid manifest line: "versions" is a list of base images')
+    for field in ["path", "source_file", "tag", "strategy"]:
+        if entry.get(field) is not None and not isinstance(entry[field], str):
+            return BatchJob(line_number, error=f'Invalid manifest line: "{field}" is a string')
+    job = BatchJob(line_number, entry.get("path"), entry.get("source_file"), entry.get("tag"), entry.get("strategy"), entry.get("versions"))
+    if (job.path is None) == (job.source_file is None):
+        job.error = "A manifest line names either a project \"path\" or a \"source_file\"."
+    return job
+
+
+def read_manifest(manifest_file):
+    """Jobs of a JSON lines manifest, blank lines and lines starting with # are skipped."""
+    jobs = []
+    with open(manifest_file) as f:
+        for line_number, line in enumerate(f, 1):
+            if line.strip() and not line.lstrip().startswith("#"):
+                jobs.append(parse_manifest_line(line_number, line))
+    return jobs
+
+
+def run_batch_job(job, config):
+    """Validate one manifest job, returns its MatrixResult."""
+    if job.error is not None:
+        return MatrixResult(job.tag, job.strategy or config.strategy, uuid.uuid4().hex[:12], error=job.error)
+    if job.source_file is not None:
+        try:
+            with open(job.source_file) as f:
+                source = f.read()
+        except OSError as e:
+            return MatrixResult(job.tag, job.strategy or config.strategy, uuid.uuid4().hex[:12], error=f"Error reading {job.source_file}: {e}")
+        return validate_project(source=source, versions=job.versions, strategy=job.strategy, tag=job.tag, config=config)
+    return validate_project(path=os.path.expanduser(job.path), versions=job.versions, strategy=job.strategy, tag=job.tag, config=config)
+
+
+def run_batch(jobs, config, max_jobs=2, output=None):
+    """Run the jobs on max_jobs workers and write one JSON line per finished job to output. Returns {status: count}."""
+    # Every job's builds share one client, its pool has room for all of them
+    client_manager = get_client_manager(maxPoolSize=2 * max_jobs * max(config.max_parallel_builds, len(config.versions)), apiVersion=config.docker_api_version)
+    # Every base image pulled and every warm container started up front in parallel, not by whichever job needs it first
+    warm_up(config, client_manager)
+    counts = {}
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, max_jobs)) as executor:
+        futures = {executor.submit(run_batch_job, job, config): job for job in jobs}
+        for future in concurrent.futures.as_completed(futures):
+            job = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                logger.error(f"Error validating manifest line {job.line}: {e}")
+                result = MatrixResult(job.tag, job.strategy or config.strategy, uuid.uuid4().hex[:12], error=str(e))
+            record = dict(line=job.line, project=job.project(), **result.to_dict())
+            counts[result.status()] = counts.get(result.status(), 0) + 1
+            if output is not None:
+                # Written as each job finishes, a crash mid-batch keeps the results so far
+                output.write(json.dumps(record) + "\n")
+                output.flush()
+    return counts
@@ -0,0 +1,271 @@
+import hashlib
+import io
+import logging
+import os
+import stat
+import tarfile
+import tempfile
+import threading
+from srcs.ignoreMatcher import exclude_paths
+
+logger = logging.getLogger(__name__)
+
+BLOCK_SIZE = tarfile.BLOCKSIZE
+CHUNK_SIZE = 1024 * 1024
+# Never needed to run app.py but often huge, excluded before the user's own .dockerignore so a "!pattern" there brings them back
+DEFAULT_IGNORE_PATTERNS = [
+    ".git", ".hg", ".svn",
+    "**/__pycache__", "**/*.py[cod]",
+    ".venv", "venv", ".tox", ".nox", "**/node_modules",
+    ".mypy_cache", ".pytest_cache", ".ruff_cache", ".ipynb_checkpoints", "**/.DS_Store",
+    "**/*.dump", "**/*.sql.gz", "**/*.bak",
+]
+
+
+def is_generated_file(relative_path):
+    """Dockerfiles written by DockerHandler are not part of the user's project."""
+    name = os.path.basename(relative_path)
+    return relative_path == name and (name == "Dockerfile" or name.startswith("Dockerfile."))
+
+
+def read_dockerignore(directory):
+    """Patterns from the .dockerignore in the directory, like docker-py reads them."""
+    dockerignore = os.path.join(directory, ".dockerignore")
+    if not os.path.isfile(dockerignore):
+        return []
+    with open(dockerignore) as f:
+        return [line.strip() for line in f.read().splitlines() if line.strip() and not line.startswith("#")]
+
+
+def find_virtualenvs(directory):
+    """Top-level directories holding a virtualenv or conda environment, whatever their name."""
+    environments = []
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False) and (os.path.isfile(os.path.join(entry.path, "pyvenv.cfg")) or os.path.isdir(os.path.join(entry.path, "conda-meta"))):
+                environments.append(entry.name)
+    return sorted(environments)
+
+
+def ignore_patterns(directory, use_defaults=True):
+    """The default ignore policy followed by the patterns of the user's .dockerignore, later patterns win like in docker."""
+    if not use_defaults:
+        return read_dockerignore(directory)
+    return DEFAULT_IGNORE_PATTERNS + find_virtualenvs(directory) + read_dockerignore(directory)
+
+
+def format_size(size):
+    """Human readable byte count, i.e: 12.3 MB."""
+    for unit in ["B", "KB", "MB", "GB"]:
+        if size < 1024 or unit == "GB":
+            return f"{size} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+
+
+class ContextReport:
+    def __init__(self, total_size, file_count, largest):
+        self.total_size = total_size  # Bytes of file content the context sends to the daemon
+        self.file_count = file_count  # Files in the context
+        self.largest = largest  # Largest top-level paths of the context, [(path, bytes)] largest first
+
+    def exceeds(self, limit):
+        """True if the context is larger than the limit, None means no limit."""
+        return limit is not None and self.total_size > limit
+
+    def __str__(self):
+        lines = [f"Build context: {format_size(self.total_size)} in {self.file_count} files."]
+        lines += [f"  {format_size(size):>10}  {path}" for path, size in self.largest]
+        return "\n".join(lines)
+
+
+def tar_header(info):
+    """Tar header blocks for the member."""
+    return info.tobuf(tarfile.PAX_FORMAT, "utf-8", "surrogateescape")
+
+
+def tar_padding(size):
+    """Zero bytes completing the last block of a member of the given size."""
+    return b"\0" * (-size % BLOCK_SIZE)
+
+
+def tar_bytes_member(name, data):
+    """Header, data and padding of an in-memory file member."""
+    info = tarfile.TarInfo(name)
+    info.size = len(data)
+    info.mode = 0o644
+    return tar_header(info) + data + tar_padding(len(data))
+
+
+def tar_end():
+    """End-of-archive marker."""
+    return b"\0" * (2 * BLOCK_SIZE)
+
+
+class OverlayReader:
+    """File-like build context: the shared base tar without its end-of-archive marker, then a small tar of the overlay files."""
+
+    def __init__(self, base_path, base_size, overlay):
+        self.base = open(base_path, "rb")
+        self.base_remaining = base_size
+        self.overlay = io.BytesIO(overlay)
+        self.length = base_size + len(overlay)
+
+    def __len__(self):
+        # requests sends a Content-Length instead of a chunked body
+        return self.length
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            data = self.base.read(self.base_remaining)
+            self.base_remaining = 0
+            return data + self.overlay.read()
+        if self.base_remaining > 0:
+            data = self.base.read(min(size, self.base_remaining))
+            self.base_remaining -= len(data)
+            if data:
+                return data
+        return self.overlay.read(size)
+
+    def close(self):
+        self.base.close()
+
+
+class BuildContext:
+    def __init__(self, directory=None, files=None, spool=True, use_default_ignores=True):
+        self.directory = directory  # Project directory the context is made of, None for in-memory source only
+        self.files = {name: content.encode() if isinstance(content, str) else content for name, content in (files or {}).items()}  # In-memory files overlaid on the directory, i.e: {"app.py": source}
+        self.spool = spool  # True tars the directory once into a temp file, False streams it from the directory on every open()
+        self.use_default_ignores = use_default_ignores  # Apply DEFAULT_IGNORE_PATTERNS before the user's .dockerignore
+        self.lock = threading.Lock()  # Concurrent version builds share one context
+        self.tar_path = None  # Spooled base tar, built once on first use
+        self.tar_size = None  # Bytes of the spooled base tar, it has no end-of-archive marker
+
+    def directory_paths(self):
+        """Relative paths of the directory that go in the context: not excluded by the ignore policy, not generated, not overlaid."""
+        if self.directory is None:
+            return []
+        paths = exclude_paths(self.directory, ignore_patterns(self.directory, self.use_default_ignores))
+        return sorted(path for path in paths if not is_generated_file(path) and path not in self.files)
+
+    def has_file(self, name):
+        """True if the context holds the file."""
+        return name in self.files or (self.directory is not None and os.path.isfile(os.path.join(self.directory, name)))
+
+    def read_file(self, name):
+        """Content of a file of the context as bytes, None if it doesn't exist."""
+        if name in self.files:
+            return self.files[name]
+        if not self.has_file(name):
+            return None
+        with open(os.path.join(self.directory, name), "rb") as f:
+            return f.read()
+
+    def iter_directory_member(self, path):
+        """Tar header, content and padding of one directory entry, read straight from the file."""
+        full_path = os.path.join(self.directory, path)
+        st = os.lstat(full_path)
+        info = tarfile.TarInfo(path)
+        info.mode = stat.S_IMODE(st.st_mode)
+        info.mtime = int(st.st_mtime)
+        if stat.S_ISDIR(st.st_mode):
+            info.type = tarfile.DIRTYPE
+        elif stat.S_ISLNK(st.st_mode):
+            info.type = tarfile.SYMTYPE
+            info.linkname = os.readlink(full_path)
+        elif stat.S_ISREG(st.st_mode):
+            info.size = st.st_size
+        else:
+            return  # Sockets and other files tar can't hold
+        yield tar_header(info)
+        if info.isfile():
+            remaining = info.size
+            with open(full_path, "rb") as f:
+                while remaining > 0:
+                    chunk = f.read(min(CHUNK_SIZE, remaining))
+                    if not chunk:
+                        break
+                    remaining -= len(chunk)
+                    yield chunk
+            if remaining:
+                yield b"\0" * remaining  # The file shrank while streaming, keep the size the header announced
+            yield tar_padding(info.size)
+
+    def iter_base(self):
+        """Tar of the directory and the in-memory files, without the end-of-archive marker."""
+        for path in self.directory_paths():
+            yield from self.iter_directory_member(path)
+        for name, content in sorted(self.files.items()):
+            yield tar_bytes_member(name, content)
+
+    def build(self):
+        """Spool the base tar into a temp file once."""
+        with self.lock:
+            if self.tar_path is not None:
+                return self.tar_path
+            fd, tar_path = tempfile.mkstemp(suffix=".tar")
+            size = 0
+            with os.fdopen(fd, "wb") as f:
+                for chunk in self.iter_base():
+                    f.write(chunk)
+                    size += len(chunk)
+            self.tar_path = tar_path
+            self.tar_size = size
+            logger.info(f"Build context created once, {size} bytes.")
+            return tar_path
+
+    def iter_stream(self, overlay):
+        """Stream the tar straight from the directory, followed by the overlay and the end-of-archive marker."""
+        yield from self.iter_base()
+        yield overlay
+
+    def open(self, dockerfile_name, dockerfile_content):
+        """Open the context for one build, with the Dockerfile added as an extra entry.
+
+        Spooled contexts return a file-like object, streamed ones a generator of tar chunks.
+        """
+        overlay = tar_bytes_member(dockerfile_name, dockerfile_content.encode()) + tar_end()
+        if not self.spool:
+            return self.iter_stream(overlay)
+        self.build()
+        return OverlayReader(self.tar_path, self.tar_size, overlay)
+
+    def report(self, top_n=10, paths=None):
+        """Size of the context and its top_n largest top-level paths, without reading any file."""
+        sizes = {}
+        file_count = 0
+        for path in (self.directory_paths() if paths is None else paths):
+            st = os.lstat(os.path.join(self.directory, path))
+            if stat.S_ISREG(st.st_mode):
+                top_level = path.replace(os.sep, "/").split("/", 1)[0]
+                sizes[top_level] = sizes.get(top_level, 0) + st.st_size
+                file_count += 1
+        for name, content in self.files.items():
+            sizes[name] = len(content)
+            file_count += 1
+        largest = sorted(sizes.items(), key=lambda item: (-item[1], item[0]))[:top_n]
+        return ContextReport(sum(sizes.values()), file_count, largest)
+
+    def content_hash(self):
+        """Hash of the relative paths and contents of the files in the context."""
+        digest = hashlib.sha256()
+        entries = [(path, os.path.join(self.directory, path)) for path in self.directory_paths()]
+        entries += [(name, None) for name in self.files]
+        for path, full_path in sorted(entries):
+            if full_path is not None and not os.path.isfile(full_path):
+                continue
+            digest.update(path.encode() + b"\0")
+            if full_path is None:
+                digest.update(self.files[path])
+            else:
+                with open(full_path, "rb") as f:
+                    for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                        digest.update(chunk)
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def cleanup(self):
+        """Delete the spooled base tar."""
+        with self.lock:
+            if self.tar_path is not None:
+                os.remove(self.tar_path)
+                self.tar_path = None
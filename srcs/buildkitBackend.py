@@ -0,0 +1,92 @@
+import json
+import os
+import shutil
+import subprocess
+import threading
+
+_available = None
+_available_lock = threading.Lock()
+
+
+def buildkit_available():
+    """True if the docker CLI with the buildx plugin is installed, checked once per process."""
+    global _available
+    with _available_lock:
+        if _available is None:
+            _available = False
+            if shutil.which("docker"):
+                try:
+                    _available = subprocess.run(["docker", "buildx", "version"], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=30).returncode == 0
+                except (OSError, subprocess.SubprocessError):
+                    _available = False
+        return _available
+
+
+def start_build(context_directory, dockerfile_name, image_tag, context_from_stdin=False, iidfile=None):
+    """Start `docker buildx build` for the context, returns the process with stdout and stderr merged into one text pipe.
+
+    With context_from_stdin the context is a tar the caller writes to the process stdin, dockerfile_name is then a path inside it.
+    The id of the built image is written to iidfile when given.
+    """
+    command = [
+        "docker", "buildx", "build",
+        "--load",  # Put the image in the daemon's image store, as the classic builder does
+        "--progress=plain",
+        "--file", dockerfile_name if context_from_stdin else os.path.join(context_directory, dockerfile_name),
+        "--tag", image_tag,
+        *(["--iidfile", iidfile] if iidfile else []),
+        "-" if context_from_stdin else context_directory,
+    ]
+    return subprocess.Popen(command, stdin=subprocess.PIPE if context_from_stdin else None, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                            text=True, bufsize=1, env=dict(os.environ, DOCKER_BUILDKIT="1"))
+
+
+def feed_context(process, context):
+    """Write the tar chunks of a streamed context to the process stdin, run it on its own thread."""
+    try:
+        for chunk in context:
+            process.stdin.buffer.write(chunk)  # stdin is a text pipe like stdout, the tar goes to its binary buffer
+    except (BrokenPipeError, ValueError):
+        pass  # buildx stopped reading, its exit code tells why
+    finally:
+        context.close()
+        try:
+            process.stdin.close()
+        except BrokenPipeError:
+            pass
+
+
+def start_bake(bake_file, metadata_file=None):
+    """Start `docker buildx bake` for every target of the bake file in one build, stdout and stderr merged like start_build.
+
+    The build results of the targets, their image ids included, are written to metadata_file when given, see bake_image_ids.
+    """
+    command = ["docker", "buildx", "bake", "--load", "--progress=plain", "--file", bake_file]
+    if metadata_file:
+        command += ["--metadata-file", metadata_file]
+    return subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, bufsize=1,
+                            env=dict(os.environ, DOCKER_BUILDKIT="1"))
+
+
+def write_bake_file(bake_file, context_directory, dockerfile_name, targets):
+    """Write a bake file building every {stage: image_tag} target from the same context and Dockerfile."""
+    bake = {
+        "group": {"default": {"targets": list(targets)}},
+        "target": {
+            stage: {"context": context_directory, "dockerfile": dockerfile_name, "target": stage, "tags": [image_tag]}
+            for stage, image_tag in targets.items()
+        },
+    }
+    with open(bake_file, "w") as f:
+        json.dump(bake, f, indent=2)
+
+
+def bake_image_ids(metadata_file):
+    """{stage: image id} of the targets in the metadata file of a finished bake, targets without an id are left out."""
+    try:
+        with open(metadata_file) as f:
+            metadata = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return {stage: result["containerimage.config.digest"] for stage, result in metadata.items()
+            if isinstance(result, dict) and result.get("containerimage.config.digest")}
@@ -0,0 +1,133 @@
+import concurrent.futures
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+POOL_LABEL = "dockerAutomation.pool"  # Label of the pool containers, its value is the base image
+CONTAINER_LIFETIME = 3600  # Seconds a pool container lives, it then exits and the daemon removes it even if this process died
+APP_DIRECTORY = "/app"
+PACKAGES_DIRECTORY = "/app/.packages"  # requirements.txt is installed here, so the reset removes it with the code
+
+
+class PooledContainer:
+    def __init__(self, container, image):
+        self.container = container
+        self.image = image  # Base image it was started from, i.e: python:3.8-slim or python@sha256:...
+        self.started = time.monotonic()
+
+
+class ContainerPool:
+    """Started containers per base image. A validation copies the code into one with put_archive and runs app.py with exec,
+    then the container is reset and reused, no image is built."""
+
+    def __init__(self, client, maxIdle=2, lifetime=CONTAINER_LIFETIME):
+        self.client = client
+        self.max_idle = maxIdle  # Idle containers kept per base image, more are started when concurrent jobs need them
+        self.lifetime = lifetime
+        self.lock = threading.Lock()
+        self.idle = {}  # {base image: [PooledContainer]}
+        self.closed = False
+
+    def start(self, image):
+        """Start a container of the base image that idles until it is used."""
+        container = self.client.containers.run(image, ["sleep", str(self.lifetime)], detach=True, auto_remove=True, labels={POOL_LABEL: image})
+        return PooledContainer(container, image)
+
+    def warm(self, images):
+        """Start one container per base image in parallel, before the first validation needs them."""
+        def start(image):
+            try:
+                self.release(self.start(image), reset=False)
+            except Exception as e:
+                logger.error(f"Error starting a warm container of {image}: {e}")
+
+        images = list(images)
+        if images:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=len(images)) as pool:
+                list(pool.map(start, images))
+
+    def acquire(self, image):
+        """An idle container of the base image, started if there is none."""
+        pooled = None
+        expired = []
+        with self.lock:
+            idle = self.idle.get(image, [])
+            while idle and pooled is None:
+                candidate = idle.pop()
+                # Leave a margin so a validation never runs into the end of the container's sleep
+                if time.monotonic() - candidate.started < self.lifetime / 2:
+                    pooled = candidate
+                else:
+                    expired.append(candidate)
+        for candidate in expired:
+            self.discard(candidate)
+        return pooled or self.start(image)
+
+    def release(self, pooled, reset=True):
+        """Give the container back once reset to its image, it is removed if it can't be reset or the pool is full."""
+        if not reset or self.reset(pooled):
+            with self.lock:
+                idle = self.idle.setdefault(pooled.image, [])
+                if not self.closed and len(idle) < self.max_idle:
+                    idle.append(pooled)
+                    return
+        self.discard(pooled)
+
+    def reset(self, pooled):
+        """Delete the job's files. True only if the container is then unchanged from its image and runs nothing but its sleep,
+        a job that wrote anywhere else or left a process behind makes the container unusable for the next one."""
+        try:
+            exit_code, _ = pooled.container.exec_run(["rm", "-rf", APP_DIRECTORY])
+            return exit_code == 0 and not pooled.container.diff() and self.only_sleeping(pooled)
+        except Exception as e:
+            logger.info(f"Container {pooled.container.short_id} can't be reused: {e}")
+            return False
+
+    def only_sleeping(self, pooled):
+        """True if the sleep the container was started with is its only process, app.py may have forked children that outlived it."""
+        top = pooled.container.top()
+        column = top["Titles"].index("CMD")  # The daemon runs ps -ef
+        commands = [process[column] for process in top["Processes"] or []]
+        return commands == [f"sleep {self.lifetime}"]
+
+    def discard(self, pooled):
+        """Kill the container, the daemon removes it."""
+        try:
+            pooled.container.kill()
+        except Exception:
+            pass  # Already gone
+
+    def copy_in(self, pooled, archive):
+        """Extract the tar archive, a build context, to the app directory of the container."""
+        exit_code, output = pooled.container.exec_run(["mkdir", "-p", APP_DIRECTORY])
+        if exit_code != 0:
+            raise RuntimeError(f"mkdir {APP_DIRECTORY} failed: {output.decode('utf-8', 'replace')}")
+        if not pooled.container.put_archive(APP_DIRECTORY, archive):
+            raise RuntimeError(f"Copying the code to {APP_DIRECTORY} failed")
+
+    def run_app(self, pooled, timeout, install_requirements=False):
+        """Start app.py in the container, after installing requirements.txt if asked. Returns the exec id and its output stream.
+
+        app.py is killed after timeout seconds, the dependencies get no deadline just like in a build.
+        """
+        script = f"cd {APP_DIRECTORY} && "
+        if install_requirements:
+            script += f"pip install --quiet --no-cache-dir --disable-pip-version-check --target {PACKAGES_DIRECTORY} -r requirements.txt && "
+        script += f"exec timeout -s KILL {int(timeout)} python app.py"
+        exec_id = self.client.api.exec_create(pooled.container.id, ["sh", "-c", script], workdir=APP_DIRECTORY,
+                                              environment={"PYTHONPATH": PACKAGES_DIRECTORY, "PYTHONDONTWRITEBYTECODE": "1"})["Id"]
+        return exec_id, self.client.api.exec_start(exec_id, stream=True)
+
+    def exit_code(self, exec_id):
+        return self.client.api.exec_inspect(exec_id).get("ExitCode")
+
+    def close(self):
+        """Remove every idle container, containers in use are removed when released."""
+        with self.lock:
+            self.closed = True
+            idle = [pooled for containers in self.idle.values() for pooled in containers]
+            self.idle = {}
+        for pooled in idle:
+            self.discard(pooled)
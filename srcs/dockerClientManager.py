@@ -0,0 +1,57 @@
+import logging
+import threading
+import docker
+from docker.constants import DEFAULT_MAX_POOL_SIZE
+
+logger = logging.getLogger(__name__)
+
+
+class DockerClientManager:
+    def __init__(self, maxPoolSize=DEFAULT_MAX_POOL_SIZE, apiVersion=None):
+        self.max_pool_size = maxPoolSize  # urllib3 connections kept open, size it for the number of concurrent builds
+        self.api_version = apiVersion  # Pinned API version, negotiated once with the daemon when None
+        self.client = None
+        self.lock = threading.Lock()
+
+    def get_client(self):
+        """Return the shared client, creating it on first use."""
+        with self.lock:
+            if self.client is None:
+                self.client = docker.from_env(version=self.api_version, max_pool_size=self.max_pool_size)
+                # Pin whatever was negotiated so a recreated client never queries /version again
+                self.api_version = self.client.api.api_version
+            return self.client
+
+    def grow(self, maxPoolSize):
+        """Raise the connection pool size, the client is recreated with it on the next get_client(). The previous client is
+        left to the handlers still using it and closed when they drop it."""
+        with self.lock:
+            if maxPoolSize > self.max_pool_size:
+                logger.info(f"Growing the Docker connection pool from {self.max_pool_size} to {maxPoolSize} connections.")
+                self.max_pool_size = maxPoolSize
+                self.client = None
+
+    def close(self):
+        """Close the shared client and its connection pool."""
+        with self.lock:
+            if self.client is not None:
+                self.client.close()
+                self.client = None
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def get_client_manager(maxPoolSize=DEFAULT_MAX_POOL_SIZE, apiVersion=None):
+    """Return the process-wide DockerClientManager. Its pool grows to the largest maxPoolSize asked for, the first call decides
+    the API version."""
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = DockerClientManager(maxPoolSize, apiVersion)
+            return _manager
+        if apiVersion is not None and apiVersion != _manager.api_version:
+            logger.warning(f"Docker API version {apiVersion} ignored, the shared client already uses {_manager.api_version}.")
+    _manager.grow(maxPoolSize)
+    return _manager
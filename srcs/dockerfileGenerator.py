@@ -0,0 +1,94 @@
+import os
+
+
+def requirements_listed(requirements_text):
+    """True if the requirements.txt content lists at least one requirement."""
+    for line in requirements_text.splitlines():
+        line = line.strip()
+        if line and not line.startswith("#"):
+            return True
+    return False
+
+
+def requirements_needed(working_directory):
+    """True if the workspace requirements.txt lists at least one requirement."""
+    requirements_txt_path = os.path.join(working_directory, "requirements.txt")
+    if not os.path.isfile(requirements_txt_path):
+        return False
+    with open(requirements_txt_path) as f:
+        return requirements_listed(f.read())
+
+
+def generate_dockerfile(working_directory, version="{version}", pip_cache=False, install_requirements=None):
+    """Generate the Dockerfile for the staged workspace, ordered so a source-only change keeps the dependency layer cached.
+
+    By default the FROM line keeps a {version} placeholder to be filled in per Python version.
+    pip_cache mounts a pip cache shared by every build of the same Python version, it needs the BuildKit builder.
+    install_requirements overrides the check of the workspace requirements.txt, for contexts that aren't staged.
+    """
+    if install_requirements is None:
+        install_requirements = requirements_needed(working_directory)
+    lines = [
+        "# Use an official Python runtime as a parent image",
+        f"FROM {version}",
+        "",
+    ]
+    if pip_cache:
+        lines.append("# No .pyc files in the layers, no pip version check")
+        lines.append("ENV PYTHONDONTWRITEBYTECODE=1 PIP_DISABLE_PIP_VERSION_CHECK=1")
+    else:
+        lines.append("# No .pyc files in the layers, no pip cache or version check")
+        lines.append("ENV PYTHONDONTWRITEBYTECODE=1 PIP_NO_CACHE_DIR=1 PIP_DISABLE_PIP_VERSION_CHECK=1")
+    lines += [
+        "",
+        "# Set the working directory in the container",
+        "WORKDIR /app",
+        "",
+    ]
+    if install_requirements:
+        if pip_cache:
+            install = f"RUN --mount=type=cache,id=pip-{version},target=/root/.cache/pip,sharing=locked pip install -r requirements.txt"
+        else:
+            install = "RUN pip install --no-cache-dir -r requirements.txt"
+        lines += [
+            "# Install dependencies first, this layer is reused until requirements.txt changes",
+            "COPY requirements.txt /app/",
+            install,
+            "",
+        ]
+    lines += [
+        "# Copy the current directory contents into the container at /app",
+        "COPY . /app",
+        "",
+        "# Run app.py during the build process",
+        "RUN python app.py",
+        "",
+        "# Run the application when the container starts",
+        'CMD ["python", "app.py"]',
+    ]
+    return "\n".join(lines) + "\n"
+
+
+def version_dockerfile(template, version, base_image=None):
+    """The Dockerfile of one Python version from the {version} template. base_image pins the FROM line, i.e: to python@sha256:..."""
+    if base_image:
+        template = template.replace("FROM {version}", f"FROM {base_image}", 1)
+    return template.replace("{version}", version)
+
+
+def stage_name(version):
+    """Build stage name for a Python version, i.e: python3.8-slim."""
+    return version.replace(":", "")
+
+
+def generate_multistage_dockerfile(template, versions, base_images=None):
+    """Combine the per-version Dockerfiles generated from the {version} template into one Dockerfile with a stage per version.
+
+    base_images maps versions to the references their FROM lines are pinned to.
+    """
+    stages = []
+    for version in versions:
+        base_image = (base_images or {}).get(version, version)
+        stage = template.replace("FROM {version}", f"FROM {base_image} AS {stage_name(version)}", 1)
+        stages.append(stage.replace("{version}", version))
+    return "\n".join(stages)
@@ -0,0 +1,85 @@
+import bisect
+import os
+import re
+from docker.utils.build import Pattern, normalize_slashes, split_path
+from docker.utils.fnmatch import translate
+
+
+def pattern_regex(pattern):
+    """Body of the regex docker's fnmatch uses for the pattern, without anchors or capturing groups."""
+    return translate(pattern.cleaned_pattern.lower())[1:-1].replace("(.*/)?", "(?:.*/)?")
+
+
+def compile_patterns(indexed_patterns):
+    """One regex for all the [(index, Pattern)], the group of the last pattern in .dockerignore order that matches is the one reported."""
+    # Alternatives are tried in order, reversed so the first full match is the pattern docker would apply last
+    alternatives = [f"(?P<p{index}>{pattern_regex(pattern)})" for index, pattern in reversed(indexed_patterns)]
+    return re.compile("^(?:" + "|".join(alternatives) + ")$")
+
+
+class IgnoreMatcher:
+    """docker's PatternMatcher with the patterns compiled into a few regexes instead of one fnmatch per pattern and path.
+
+    Same semantics: patterns are matched case-insensitively against the path and against its leading directories
+    of the pattern's depth, the last matching pattern wins, and excluded directories are skipped unless a "!pattern"
+    starts with their path.
+    """
+
+    def __init__(self, patterns):
+        self.patterns = [pattern for pattern in (Pattern(p) for p in patterns) if pattern.dirs]
+        self.patterns.append(Pattern("!.dockerignore"))
+        self.exclusions = [pattern.exclusion for pattern in self.patterns]
+        indexed_patterns = list(enumerate(self.patterns))
+        self.path_regex = compile_patterns(indexed_patterns)  # Every pattern against the whole path
+        depths = {}
+        for index, pattern in indexed_patterns:
+            depths.setdefault(len(pattern.dirs), []).append((index, pattern))
+        # Patterns of depth k against the first k directories of the path, one regex per depth
+        self.parent_regexes = [(depth, compile_patterns(group)) for depth, group in sorted(depths.items())]
+        # Sorted so one bisect finds whether some "!pattern" starts with a directory's path
+        self.exclusion_prefixes = sorted(pattern.cleaned_pattern for pattern in self.patterns if pattern.exclusion)
+
+    @staticmethod
+    def last_match(regex, path):
+        """Index of the last pattern of the regex matching the path, -1 if none does."""
+        match = regex.match(path)
+        return int(match.lastgroup[1:]) if match else -1
+
+    def matches(self, filepath):
+        """True if the relative path is excluded from the context."""
+        last = self.last_match(self.path_regex, normalize_slashes(filepath).lower())
+        parent_path = os.path.dirname(filepath)
+        if parent_path != "":
+            parent_path_dirs = split_path(parent_path)
+            for depth, regex in self.parent_regexes:
+                if depth > len(parent_path_dirs):
+                    break
+                parent = normalize_slashes(os.path.sep.join(parent_path_dirs[:depth])).lower()
+                last = max(last, self.last_match(regex, parent))
+        return last >= 0 and not self.exclusions[last]
+
+    def has_exception_under(self, directory):
+        """True if a "!pattern" starts with the directory's path, so the directory can't be skipped as a whole."""
+        prefix = normalize_slashes(directory)
+        position = bisect.bisect_left(self.exclusion_prefixes, prefix)
+        return position < len(self.exclusion_prefixes) and self.exclusion_prefixes[position].startswith(prefix)
+
+    def walk(self, root):
+        """Relative paths, files and directories, of root that are not excluded."""
+        pending = [""]
+        while pending:
+            relative_directory = pending.pop()
+            with os.scandir(os.path.join(root, relative_directory)) as entries:
+                for entry in entries:
+                    path = os.path.join(relative_directory, entry.name) if relative_directory else entry.name
+                    excluded = self.matches(path)
+                    if not excluded:
+                        yield path
+                    # Symlinks to directories are context entries, they are not followed
+                    if entry.is_dir(follow_symlinks=False) and (not excluded or self.has_exception_under(path)):
+                        pending.append(path)
+
+
+def exclude_paths(root, patterns, dockerfile=None):
+    """Drop-in for docker.utils.build.exclude_paths, the relative paths of root that are not excluded by the patterns."""
+    return set(IgnoreMatcher(list(patterns) + [f"!{dockerfile or 'Dockerfile'}"]).walk(root))
@@ -0,0 +1,84 @@
+import json
+from docker.errors import StreamParseError
+
+NEWLINE = ord("\n")
+json_decoder = json.JSONDecoder()
+
+
+def decode_concatenated(text):
+    """Every JSON document of a text holding several of them back to back, i.e: '{"a": 1}{"b": 2}'."""
+    documents = []
+    index = 0
+    text = text.strip()
+    while index < len(text):
+        document, index = json_decoder.raw_decode(text, index)
+        documents.append(document)
+        while index < len(text) and text[index] in " \t\r\n":
+            index += 1
+    return documents
+
+
+class JsonStreamDecoder:
+    """Incremental decoder for the newline-delimited JSON progress of the daemon, fed raw bytes as they arrive.
+
+    Unlike docker's json_stream, which re-strips and re-parses the whole pending str on every chunk, each byte is
+    appended once, searched for a newline once and decoded once, so large or fragmented messages stay linear.
+    """
+
+    def __init__(self):
+        self.buffer = bytearray()  # Bytes after the last newline received, the start of the next message
+        self.scanned = 0  # Bytes of the buffer already searched for a newline
+        self.pending = ""  # Lines of a message spanning several lines, i.e: pretty printed JSON
+
+    def feed(self, data):
+        """Append a chunk and return the messages it completes."""
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        self.buffer += data
+        end = self.buffer.rfind(NEWLINE, self.scanned)
+        if end == -1:
+            self.scanned = len(self.buffer)
+            return []
+        # A newline byte is never part of a multi-byte character, every complete line decodes on its own
+        text = self.buffer[:end + 1].decode("utf-8", "replace")
+        del self.buffer[:end + 1]  # Deleting the front of a bytearray doesn't move the rest
+        self.scanned = len(self.buffer)
+        messages = []
+        for line in text.split("\n")[:-1]:
+            if self.pending:
+                line = self.pending + "\n" + line
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                # Fast path, one message per line as the daemon sends them
+                messages.append(json_decoder.decode(line))
+                self.pending = ""
+            except ValueError:
+                try:
+                    messages.extend(decode_concatenated(line))
+                    self.pending = ""
+                except ValueError:
+                    self.pending = line  # Not complete yet, retried with the next line
+        return messages
+
+    def close(self):
+        """Return the messages left without a trailing newline, raises StreamParseError on a truncated message."""
+        rest = self.buffer.decode("utf-8", "replace")
+        if self.pending:
+            rest = self.pending + "\n" + rest
+        self.buffer = bytearray()
+        self.scanned = 0
+        self.pending = ""
+        try:
+            return decode_concatenated(rest)
+        except ValueError as e:
+            raise StreamParseError(e) from e
+
+
+def json_stream(chunks):
+    """Decoded JSON messages of a stream of bytes or str chunks, a drop-in for docker.utils.json_stream.json_stream."""
+    decoder = JsonStreamDecoder()
+    for chunk in chunks:
+        yield from decoder.feed(chunk)
+    yield from decoder.close()
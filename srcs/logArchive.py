@@ -0,0 +1,153 @@
+import fcntl
+import hashlib
+import json
+import os
+import threading
+import zlib
+
+ARCHIVE_FILE = "logs.archive"  # Append-only, zlib compressed chunks back to back
+INDEX_FILE = "logs.index"  # One JSON line per archived log: job id, version, kind and the offsets of its chunks
+CHUNKS_FILE = "chunks.index"  # "sha256 offset length" per stored chunk, so an identical chunk is stored once
+MAX_CHUNK_SIZE = 64 * 1024
+BOUNDARY_MASK = 0x0F  # A line whose crc32 has these bits clear ends a chunk, about every 16 lines
+
+
+def chunk_boundary(line):
+    """True if the chunk ends after this line. The cut depends on the line content only, so identical runs of lines
+    in the logs of two versions are cut the same way and stored once even when the lines before them differ."""
+    return zlib.crc32(line) & BOUNDARY_MASK == 0
+
+
+class LogArchive:
+    def __init__(self, directory):
+        self.directory = directory
+        self.lock = threading.Lock()  # Concurrent versions append to the same archive
+        self.chunks = {}  # {sha256: [offset, length]} of the stored chunks
+        self.records = {}  # {(job id, version, kind): record} of the archived logs
+        os.makedirs(directory, exist_ok=True)
+        self.load()
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def load(self):
+        """Read both indexes, a line cut short by a crash is ignored."""
+        if os.path.isfile(self.path(CHUNKS_FILE)):
+            with open(self.path(CHUNKS_FILE)) as f:
+                for line in f:
+                    parts = line.split()
+                    if len(parts) == 3:
+                        self.chunks[parts[0]] = [int(parts[1]), int(parts[2])]
+        if os.path.isfile(self.path(INDEX_FILE)):
+            with open(self.path(INDEX_FILE)) as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue
+                    self.records[(record["job"], record["version"], record["kind"])] = record
+
+    def append(self, name, data):
+        """Append to one of the archive files, returns the offset the data was written at."""
+        with open(self.path(name), "ab") as f:
+            # Other processes may append to the same archive, the lock keeps offsets and lines whole
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                offset = f.seek(0, os.SEEK_END)
+                f.write(data)
+                return offset
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def put_chunk(self, data):
+        """Store a chunk unless an identical one is already stored, returns its [offset, length]."""
+        digest = hashlib.sha256(data).hexdigest()
+        with self.lock:
+            if digest in self.chunks:
+                return self.chunks[digest]
+            compressed = zlib.compress(data)
+            location = [self.append(ARCHIVE_FILE, compressed), len(compressed)]
+            self.append(CHUNKS_FILE, f"{digest} {location[0]} {location[1]}\n".encode())
+            self.chunks[digest] = location
+            return location
+
+    def add_record(self, job_id, version, kind, chunks, size):
+        """Index a log made of the chunks, a later log of the same job, version and kind replaces it."""
+        record = {"job": job_id, "version": version, "kind": kind, "size": size, "chunks": chunks}
+        with self.lock:
+            self.append(INDEX_FILE, (json.dumps(record) + "\n").encode())
+            self.records[(job_id, version, kind)] = record
+
+    def writer(self, job_id, version, kind):
+        """File-like writer archiving one log, indexed when it is closed."""
+        return ArchiveWriter(self, job_id, version, kind)
+
+    def read(self, job_id, version, kind="run"):
+        """The log of one version of a job, None if it wasn't archived. Only that log's chunks are read."""
+        record = self.records.get((job_id, version, kind))
+        if record is None:
+            return None
+        if not record["chunks"]:
+            return b""  # Nothing written, the archive file may not even exist yet
+        data = bytearray()
+        with open(self.path(ARCHIVE_FILE), "rb") as f:
+            for offset, length in record["chunks"]:
+                f.seek(offset)
+                data += zlib.decompress(f.read(length))
+        return bytes(data)
+
+    def job_records(self, job_id):
+        """Index records of every log of the job."""
+        return [record for (job, _, _), record in self.records.items() if job == job_id]
+
+
+class ArchiveWriter:
+    def __init__(self, archive, job_id, version, kind):
+        self.archive = archive
+        self.job_id = job_id
+        self.version = version
+        self.kind = kind  # "build" or "run"
+        self.pending = bytearray()  # Bytes of the chunk being filled
+        self.scanned = 0  # Bytes of pending already checked for a chunk boundary
+        self.chunks = []  # [offset, length] of the stored chunks, in log order
+        self.size = 0  # Bytes written
+
+    def write(self, data):
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        self.pending += data
+        self.size += len(data)
+        line_start = self.scanned
+        while True:
+            end = self.pending.find(b"\n", self.scanned)
+            if end == -1:
+                break
+            self.scanned = end + 1
+            if chunk_boundary(self.pending[line_start:end + 1]) or self.scanned >= MAX_CHUNK_SIZE:
+                self.flush_chunk(self.scanned)
+            line_start = self.scanned
+        while len(self.pending) >= MAX_CHUNK_SIZE:
+            self.flush_chunk(MAX_CHUNK_SIZE)  # A line longer than a chunk
+
+    def flush_chunk(self, size):
+        self.chunks.append(self.archive.put_chunk(bytes(self.pending[:size])))
+        del self.pending[:size]
+        self.scanned = max(0, self.scanned - size)
+
+    def close(self):
+        """Store the last chunk and index the log."""
+        if self.pending:
+            self.flush_chunk(len(self.pending))
+        self.archive.add_record(self.job_id, self.version, self.kind, self.chunks, self.size)
+
+
+class JobLog:
+    """The archive as seen by the handler of one version of a job."""
+
+    def __init__(self, archive, job_id, version):
+        self.archive = archive
+        self.job_id = job_id
+        self.version = version
+
+    def writer(self, kind):
+        return self.archive.writer(self.job_id, self.version, kind)
@@ -0,0 +1,104 @@
+import struct
+
+LOG_CHUNK_SIZE = 64 * 1024  # Bytes read from the daemon per call, instead of docker-py's 1 byte reads
+FRAME_HEADER_SIZE = 8  # Stream type, 3 zero bytes and the big-endian payload length
+STREAM_NAMES = {0: "stdin", 1: "stdout", 2: "stderr"}
+
+
+class FrameDemuxer:
+    """Splits the multiplexed stdout/stderr stream of a container without a TTY into its frames, fed chunks of any size.
+
+    Payloads are handed out as they arrive, a large frame never has to be held in memory as a whole.
+    """
+
+    def __init__(self):
+        self.header = bytearray()  # Bytes received of the next frame header
+        self.stream = None  # Stream of the frame being received
+        self.remaining = 0  # Payload bytes of that frame still to come
+
+    def feed(self, data):
+        """Return the [(stream, payload)] pieces of the chunk."""
+        view = memoryview(data)
+        pieces = []
+        position = 0
+        while position < len(view):
+            if self.remaining == 0:
+                needed = FRAME_HEADER_SIZE - len(self.header)
+                self.header += view[position:position + needed]
+                position += min(needed, len(view) - position)
+                if len(self.header) == FRAME_HEADER_SIZE:
+                    stream_type, self.remaining = struct.unpack(">BxxxL", self.header)
+                    self.stream = STREAM_NAMES.get(stream_type, "stdout")
+                    self.header.clear()
+                continue
+            size = min(self.remaining, len(view) - position)
+            pieces.append((self.stream, bytes(view[position:position + size])))
+            self.remaining -= size
+            position += size
+        return pieces
+
+
+class LogTail:
+    """Fixed-size ring buffer holding the last max_bytes of a log, however long the log gets."""
+
+    def __init__(self, max_bytes=64 * 1024):
+        self.max_bytes = max_bytes
+        self.ring = bytearray(max_bytes)  # Allocated once, overwritten in place
+        self.position = 0  # Where the next byte goes, the oldest byte once the ring is full
+        self.total = 0  # Bytes seen, including the overwritten ones
+
+    @property
+    def size(self):
+        """Bytes held."""
+        return min(self.total, self.max_bytes)
+
+    def append(self, data):
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        self.total += len(data)
+        if len(data) >= self.max_bytes:
+            self.ring[:] = data[-self.max_bytes:]
+            self.position = 0
+            return
+        first = min(len(data), self.max_bytes - self.position)
+        self.ring[self.position:self.position + first] = data[:first]
+        self.ring[:len(data) - first] = data[first:]
+        self.position = (self.position + len(data)) % self.max_bytes
+
+    def truncated(self):
+        """True if part of the log was dropped."""
+        return self.total > self.max_bytes
+
+    def contents(self):
+        """The held bytes, oldest first."""
+        if not self.truncated():
+            return bytes(self.ring[:self.total])
+        return bytes(self.ring[self.position:] + self.ring[:self.position])
+
+    def text(self):
+        """The tail as text, starting at a line boundary when it was truncated."""
+        data = self.contents()
+        if self.truncated() and b"\n" in data:
+            data = data[data.index(b"\n") + 1:]
+        return data.decode("utf-8", "replace")
+
+
+def stream_container_logs(client, container_id, tail, log_files=(), tty=False):
+    """Stream the stdout and stderr of a container to the log_files and tail in LOG_CHUNK_SIZE reads, returns the log size in bytes.
+
+    Memory stays bounded by the chunk size and the tail however much the container printed.
+    """
+    api = client.api
+    response = api._get(api._url("/containers/{0}/logs", container_id), params={"stdout": 1, "stderr": 1}, stream=True)
+    api._raise_for_status(response)
+    demuxer = None if tty else FrameDemuxer()
+    try:
+        for chunk in response.iter_content(LOG_CHUNK_SIZE):
+            # With a TTY the daemon sends the raw output, without one it is multiplexed in frames
+            for _, payload in ([("stdout", chunk)] if tty else demuxer.feed(chunk)):
+                for log_file in log_files:
+                    log_file.write(payload)
+                tail.append(payload)
+    finally:
+        response.close()
+    return tail.total
@@ -0,0 +1,496 @@
+import concurrent.futures
+import contextlib
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+import time
+import docker
+from srcs import buildkitBackend
+from srcs.buildContext import BuildContext
+from srcs.dockerfileGenerator import generate_multistage_dockerfile, requirements_listed, stage_name, version_dockerfile
+from srcs.logArchive import JobLog
+from srcs.pythonDockerHandler import DockerHandler
+from srcs.resultCache import hash_workspace
+from srcs.singleFlight import FlightAbandoned, SingleFlight
+
+logger = logging.getLogger(__name__)
+
+MULTISTAGE_DOCKERFILE_NAME = "Dockerfile.matrix"
+STRATEGIES = ("sequential", "matrix", "race", "bisect", "multistage")  # Names run_strategy accepts
+
+_version_builds = SingleFlight()  # Identical builds of concurrent jobs of this process, keyed by MatrixExecutor.flight_key
+
+
+def version_image_tag(image_tag, version):
+    """Per-version tag so concurrent builds of the same project don't overwrite each other, i.e: myapp-python3.8-slim."""
+    return f"{image_tag}-{version.replace(':', '')}"
+
+
+def version_dockerfile_name(version):
+    """Per-version Dockerfile name inside the shared workspace, i.e: Dockerfile.python3.8-slim."""
+    return f"Dockerfile.{version.replace(':', '')}"
+
+
+def format_table(results):
+    """The per-version pass/fail table of {version: VersionResult}."""
+    lines = [f"{'VERSION':<20}{'RESULT':<10}{'TIME':>8}"]
+    for result in results.values():
+        note = " (cached)" if result.cached else " (shared)" if result.shared else ""
+        lines.append(f"{result.version:<20}{result.status():<10}{result.duration:>7.1f}s{note}")
+    return "\n".join(lines)
+
+
+class VersionResult:
+    def __init__(self, version, passed, duration, image_tag, cancelled=False, skipped=False, cached=False, image_id=None, log_file=None, shared=False):
+        self.version = version
+        self.passed = passed  # True if the image built and the container ran
+        self.duration = duration  # Wall-clock seconds spent on this version
+        self.image_tag = image_tag  # Tag the version was built with
+        self.cancelled = cancelled  # True if the version was cancelled because it could no longer win
+        self.skipped = skipped  # True if the strategy never needed to build this version
+        self.cached = cached  # True if the result came from the result cache without building
+        self.image_id = image_id  # Id of the image that passed, None if the version didn't pass
+        self.log_file = log_file  # Full container log of the version, None if it wasn't written
+        self.shared = shared  # True if the result came from an identical build another job ran at the same time
+
+    def status(self):
+        """Short status for the result table."""
+        if self.passed:
+            return "pass"
+        if self.skipped:
+            return "skipped"
+        return "cancelled" if self.cancelled else "fail"
+
+    def to_dict(self):
+        return {"version": self.version, "status": self.status(), "duration": round(self.duration, 3), "image_tag": self.image_tag,
+                "image_id": self.image_id, "cached": self.cached, "shared": self.shared, "log_file": self.log_file}
+
+
+class MatrixExecutor:
+    def __init__(self, dockerfileContent, image_tag, workingDirectory, versions, max_workers=3, cache=None, client_manager=None, run_timeout=60, builder="classic", build_context=None, output_directory=None, log_directory=None, log_archive=None, job_id=None, deduplicate=True, base_images=None, container_pool=None, use_default_ignores=True):
+        self.dockerfile_content = dockerfileContent  # Template with a {version} placeholder
+        self.image_tag = image_tag
+        self.workingDirectory = workingDirectory  # Workspace already populated by write_or_copy_code_to_workspace
+        self.versions = list(versions)
+        self.max_workers = max(1, min(max_workers, len(self.versions)))  # Bounded pool, never more threads than versions
+        self.cache = cache  # Optional ResultCache, versions with a cached result are not built again
+        self.workspace_hash = None  # Hash of the staged workspace, computed once per run when caching or deduplicating
+        self.base_digests = {}  # {version: digest} resolved once per job, a later job sees a tag that moved since
+        self.client_manager = client_manager  # Optional DockerClientManager whose client is shared by every handler
+        self.run_timeout = run_timeout  # Seconds each validation container gets to exit
+        self.builder = builder  # "classic" or "buildkit", see DockerHandler
+        self.source_context = build_context  # Optional BuildContext streamed from the user's directory or source, nothing staged then
+        self.build_context = build_context  # Context shared by the builds of one run
+        self.output_directory = output_directory  # Where the winning Dockerfile is saved when the workspace is deleted after the job, the workspace otherwise
+        self.log_directory = log_directory  # Where each version's full container log is written, None keeps only the printed tail
+        self.log_archive = log_archive  # Optional LogArchive keeping the build and run logs of every version under job_id
+        self.job_id = job_id
+        self.base_images = base_images or {}  # {version: repository@sha256 reference} the FROM lines are pinned to
+        self.container_pool = container_pool  # Optional ContainerPool, versions are then validated in warm containers and only the winner is built
+        self.install_requirements = False  # True if requirements.txt lists something, set by prepare_handlers for the container pool
+        self.deduplicate = deduplicate  # Coalesce identical builds running at the same time, in this process and across processes sharing the cache
+        self.use_default_ignores = use_default_ignores  # Apply DEFAULT_IGNORE_PATTERNS to the workspace's build context and hash
+
+    def create_handler(self, version):
+        """Create the DockerHandler for one Python version."""
+        dockerfile = version_dockerfile(self.dockerfile_content, version, self.base_images.get(version))
+        client = self.client_manager.get_client() if self.client_manager else None
+        return DockerHandler(dockerfile, version_image_tag(self.image_tag, version), "", self.workingDirectory,
+                             dockerfileName=version_dockerfile_name(version), client=client, runTimeout=self.run_timeout, builder=self.builder,
+                             buildContext=self.build_context, logDirectory=self.log_directory,
+                             jobLog=JobLog(self.log_archive, self.job_id, version) if self.log_archive else None, useDefaultIgnores=self.use_default_ignores,
+                             jobId=self.job_id)
+
+    def cached_result(self, handler, version, start):
+        """Return the VersionResult from the result cache, or None when the version has to be built."""
+        cache_key = self.cache_key(handler, version)
+        if cache_key:
+            entry = self.cache.get(cache_key)
+            if entry and self.restore(handler, entry):
+                logger.info(f"Python {version}: reusing the cached result, build skipped.")
+                return VersionResult(version, entry["passed"], time.monotonic() - start, handler.image_tag, cached=True, image_id=entry["image_id"])
+        return None
+
+    def run_version(self, handler, version, validate_only=False):
+        """Build and validate one version, timing the attempt. A cached result skips the build entirely, and a job
+        asking for a build identical to one in flight waits for that build instead of running its own.
+
+        validate_only runs an image that was already built, as the multistage strategy does.
+        """
+        start = time.monotonic()
+        result = self.cached_result(handler, version, start)
+        if result:
+            return result
+        if validate_only or not self.deduplicate or self.workspace_hash is None:
+            return self.build_version(handler, version, start, validate_only)
+
+        try:
+            result, shared = _version_builds.do(self.flight_key(handler), lambda: self.build_version(handler, version, start), abandon=handler.cancelled,
+                                                on_join=lambda: logger.info(f"Python {version}: an identical build is running for another job, waiting for its result."))
+        except FlightAbandoned:
+            return VersionResult(version, False, time.monotonic() - start, handler.image_tag, cancelled=True)
+        return self.shared_result(handler, version, result, start) if shared else result
+
+    def shared_result(self, handler, version, result, start):
+        """This job's VersionResult from the result of another job's identical build."""
+        # Validated in a warm container there is no image to restore yet, this job builds its own if the version wins
+        if result.cancelled or (result.passed and result.image_id and not self.restore(handler, {"passed": True, "image_id": result.image_id})):
+            # The other job stopped its build or its image is already gone, build it for this job
+            return self.run_version(handler, version)
+        return VersionResult(version, result.passed, time.monotonic() - start, handler.image_tag, image_id=result.image_id, shared=True)
+
+    def build_version(self, handler, version, start, validate_only=False):
+        """Build and validate one version. With a result cache, other processes building the same cache key are waited for."""
+        cache_key = self.cache_key(handler, version)
+        locking = cache_key is not None and self.deduplicate and not validate_only
+        try:
+            with self.cache.building(cache_key, abandon=handler.cancelled) if locking else contextlib.nullcontext(False) as waited:
+                result = self.cached_result(handler, version, start) if waited else None
+                if result:
+                    return result
+                passed = handler.validate_image() if validate_only else self.validate(handler)
+        except FlightAbandoned:
+            return VersionResult(version, False, time.monotonic() - start, handler.image_tag, cancelled=True)
+        except Exception as e:
+            logger.error(f"Error validating {version}: {e}")
+            return VersionResult(version, False, time.monotonic() - start, handler.image_tag, cancelled=handler.cancelled())
+        image_id = self.image_id(handler) if passed and (validate_only or self.container_pool is None) else None
+        if cache_key and not handler.cancelled() and (image_id or not passed):
+            self.cache.put(cache_key, version, passed, image_id)
+        log_file = handler.log_file_path()
+        return VersionResult(version, passed, time.monotonic() - start, handler.image_tag, cancelled=handler.cancelled(), image_id=image_id,
+                             log_file=log_file if log_file and os.path.isfile(log_file) else None)
+
+    def validate(self, handler):
+        """Build and run the image of one version, or only run the code in a warm container when there is a container pool."""
+        if self.container_pool is None:
+            return handler.execute()
+        archive = self.build_context.open(handler.dockerfile_name, handler.dockerfile_content)
+        try:
+            return handler.validate_in_pool(self.container_pool, archive, self.install_requirements)
+        finally:
+            if hasattr(archive, "close"):
+                archive.close()
+
+    def flight_key(self, handler):
+        """Key of a build, identical for the same staged content, Dockerfile, validation mode and run timeout."""
+        return hashlib.sha256("\0".join([self.workspace_hash, handler.dockerfile_content, self.validation_mode(), str(self.run_timeout)]).encode()).hexdigest()
+
+    def validation_mode(self):
+        """How the versions are validated: the builder, or "container" with a container pool."""
+        return self.builder if self.container_pool is None else "container"
+
+    def cache_key(self, handler, version):
+        """Result cache key for the version, None when caching is off or the base image digest is unknown."""
+        if self.cache is None or self.workspace_hash is None:
+            return None
+        # A pinned FROM line names its digest, no registry lookup needed
+        digest = self.base_images.get(version)
+        if digest is None:
+            if version not in self.base_digests:
+                self.base_digests[version] = self.cache.base_image_digest(handler.client, version)
+            digest = self.base_digests[version]
+        if digest is None:
+            return None
+        return self.cache.key(self.workspace_hash, handler.dockerfile_content, digest, self.run_timeout, self.validation_mode())
+
+    def restore(self, handler, entry):
+        """Re-tag the cached image with the version tag, False if the image is gone and the version must be rebuilt."""
+        if not entry["passed"]:
+            return True
+        try:
+            repository, tag = docker.utils.parse_repository_tag(handler.image_tag)
+            handler.client.images.get(entry["image_id"]).tag(repository, tag=tag)
+            return True
+        except docker.errors.ImageNotFound:
+            return False
+        except Exception as e:
+            logger.error(f"Error restoring the cached image {entry['image_id']}: {e}")
+            return False
+
+    def image_id(self, handler):
+        """Id of the image the handler built, None if it can't be found."""
+        if handler.image_id:
+            return handler.image_id
+        try:
+            return handler.client.images.get(handler.image_tag).id
+        except Exception as e:
+            logger.error(f"Error looking up the image {handler.image_tag}: {e}")
+            return None
+
+    def prepare_handlers(self):
+        """Create one handler per version and write every Dockerfile up front so all builds see the same build context."""
+        if self.source_context is None and (self.builder == "classic" or self.container_pool is not None):
+            # BuildKit transfers the directory itself, the classic builder and the container pool get the tar made once for every version
+            self.build_context = BuildContext(self.workingDirectory, use_default_ignores=self.use_default_ignores)
+        if self.container_pool is not None:
+            requirements = self.build_context.read_file("requirements.txt")
+            self.install_requirements = requirements is not None and requirements_listed(requirements.decode("utf-8", "replace"))
+        handlers = {version: self.create_handler(version) for version in self.versions}
+        for handler in handlers.values():
+            if not handler.copy_directory():
+                return None
+        if self.cache is not None or self.deduplicate:
+            self.workspace_hash = self.source_context.content_hash() if self.source_context else hash_workspace(self.workingDirectory, self.use_default_ignores)
+        return handlers
+
+    def run_sequential(self):
+        """Try one version after another and stop at the first one that passes."""
+        handlers = self.prepare_handlers()
+        if handlers is None:
+            return {}
+
+        results = {}
+        for version in self.versions:
+            results[version] = self.run_version(handlers[version], version)
+            logger.info(f"Python {version}: {results[version].status()} in {results[version].duration:.1f}s")
+            if results[version].passed:
+                break
+
+        for version in self.versions:
+            if version not in results:
+                results[version] = VersionResult(version, False, 0.0, handlers[version].image_tag, skipped=True)
+        return self.finish(handlers, results)
+
+    def run_matrix(self):
+        """Build and validate every version concurrently, returns {version: VersionResult} in version order."""
+        handlers = self.prepare_handlers()
+        if handlers is None:
+            return {}
+
+        results = {}
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = {pool.submit(self.run_version, handler, version): version for version, handler in handlers.items()}
+            for future in concurrent.futures.as_completed(futures):
+                result = future.result()
+                results[result.version] = result
+                logger.info(f"Python {result.version}: {result.status()} in {result.duration:.1f}s")
+
+        return self.finish(handlers, results)
+
+    def run_race(self):
+        """Start every version at once and cancel the versions that can no longer win as soon as a lower one passes."""
+        handlers = self.prepare_handlers()
+        if handlers is None:
+            return {}
+
+        results = {}
+        best = None  # Index of the lowest passing version so far
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = {pool.submit(self.run_version, handler, version): version for version, handler in handlers.items()}
+            for future in concurrent.futures.as_completed(futures):
+                version = futures[future]
+                if future.cancelled():
+                    # Never started, the pool was still busy with lower versions
+                    results[version] = VersionResult(version, False, 0.0, handlers[version].image_tag, cancelled=True)
+                    continue
+                result = future.result()
+                results[version] = result
+                logger.info(f"Python {version}: {result.status()} in {result.duration:.1f}s")
+
+                index = self.versions.index(version)
+                if result.passed and (best is None or index < best):
+                    best = index
+                    for loser in self.versions[index + 1:]:
+                        if loser not in results:
+                            self.cancel_version(futures, handlers, loser)
+        return self.finish(handlers, results)
+
+    def run_bisect(self):
+        """Bisect the version list for the lowest passing version, assuming the versions that work are contiguous.
+
+        Falls back to a linear scan of the untried lower versions when the newest version fails
+        although an older one passed, since the window is then not monotonic. When every probe
+        failed, the untried versions are scanned from the oldest, a project may only work on
+        versions older than the first probe.
+        """
+        handlers = self.prepare_handlers()
+        if handlers is None:
+            return {}
+
+        results = {}
+
+        def probe(index):
+            version = self.versions[index]
+            if version not in results:
+                results[version] = self.run_version(handlers[version], version)
+                logger.info(f"Python {version}: {results[version].status()} in {results[version].duration:.1f}s")
+            return results[version].passed
+
+        low, high = 0, len(self.versions)  # The lowest passing index is in [low, high], high meaning none passes
+        while low < high:
+            middle = (low + high) // 2
+            if probe(middle):
+                high = middle
+            else:
+                low = middle + 1
+
+        newest = len(self.versions) - 1
+        if low == len(self.versions):
+            untried = [index for index, version in enumerate(self.versions) if version not in results]
+            if untried:
+                logger.info("No probed version passed, falling back to a linear scan of the untried versions.")
+            for index in untried:
+                if probe(index):
+                    break
+        elif low < newest and not probe(newest):
+            logger.info("Results look non-monotonic, falling back to a linear scan of the older versions.")
+            for index in range(low):
+                if probe(index):
+                    break
+
+        for version in self.versions:
+            if version not in results:
+                results[version] = VersionResult(version, False, 0.0, handlers[version].image_tag, skipped=True)
+        return self.finish(handlers, results)
+
+    def run_multistage(self):
+        """Build every version as a stage of one Dockerfile in a single BuildKit build, then validate each image.
+
+        The context is sent once and BuildKit schedules the stages in parallel. BuildKit stops the whole
+        build on the first failing stage, so then every version is built on its own, reusing the
+        stages that already completed from the BuildKit cache.
+        """
+        if self.builder != "buildkit" or self.source_context is not None or self.container_pool is not None:
+            logger.info("The multistage strategy needs the BuildKit backend, a staged workspace and image validation, validating the versions separately.")
+            return self.run_matrix()
+        handlers = self.prepare_handlers()
+        if handlers is None:
+            return {}
+
+        start = time.monotonic()
+        results = {}
+        for version in self.versions:
+            result = self.cached_result(handlers[version], version, start)
+            if result:
+                results[version] = result
+        pending = [version for version in self.versions if version not in results]
+        if not pending:
+            return self.finish(handlers, results)
+
+        if not self.bake(handlers, pending):
+            logger.info("The multi-stage build failed for at least one version, building the versions separately.")
+            return self.run_matrix()
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = [pool.submit(self.run_version, handlers[version], version, True) for version in pending]
+            for future in concurrent.futures.as_completed(futures):
+                result = future.result()
+                results[result.version] = result
+                logger.info(f"Python {result.version}: {result.status()} in {result.duration:.1f}s")
+        return self.finish(handlers, results)
+
+    def bake(self, handlers, versions):
+        """Build the versions as targets of one multi-stage Dockerfile with docker buildx bake, True if every target built."""
+        dockerfile = generate_multistage_dockerfile(self.dockerfile_content, versions, self.base_images)
+        dockerfile_path = os.path.join(self.workingDirectory, MULTISTAGE_DOCKERFILE_NAME)
+        with open(dockerfile_path, "w") as f:
+            f.write(dockerfile)
+
+        bake_directory = tempfile.mkdtemp()  # Outside the build context
+        bake_file = os.path.join(bake_directory, "docker-bake.json")
+        metadata_file = os.path.join(bake_directory, "metadata.json")
+        # One build for every version, archived under a version of its own
+        log_writer = self.log_archive.writer(self.job_id, MULTISTAGE_DOCKERFILE_NAME, "build") if self.log_archive else None
+        try:
+            targets = {stage_name(version): handlers[version].image_tag for version in versions}
+            buildkitBackend.write_bake_file(bake_file, self.workingDirectory, MULTISTAGE_DOCKERFILE_NAME, targets)
+            logger.info(f"Building {len(versions)} Python versions in one multi-stage build...")
+            process = buildkitBackend.start_bake(bake_file, metadata_file)
+            for line in process.stdout:
+                if log_writer is not None:
+                    log_writer.write(line)
+                if line.strip():
+                    logger.info(f"[{self.image_tag}] {line.rstrip()}")
+            process.stdout.close()
+            if process.wait() != 0:
+                return False
+            # Validate the images of this bake, not whatever the shared tags point to by then
+            image_ids = buildkitBackend.bake_image_ids(metadata_file)
+            for version in versions:
+                handlers[version].image_id = image_ids.get(stage_name(version))
+            return True
+        except Exception as e:
+            logger.error(f"Error running the multi-stage build: {e}")
+            return False
+        finally:
+            if log_writer is not None:
+                log_writer.close()
+            shutil.rmtree(bake_directory, ignore_errors=True)
+
+    def run_strategy(self, strategy):
+        """Run the named strategy, one of "sequential", "matrix", "race", "bisect" or "multistage"."""
+        strategies = {"sequential": self.run_sequential, "matrix": self.run_matrix, "race": self.run_race, "bisect": self.run_bisect,
+                      "multistage": self.run_multistage}
+        if strategy not in strategies:
+            logger.info(f"Unknown version strategy {strategy}, expected one of {', '.join(strategies)}.")
+            return {}
+        return strategies[strategy]()
+
+    def cancel_version(self, futures, handlers, version):
+        """Cancel a queued or in-flight version."""
+        for future, future_version in futures.items():
+            if future_version == version and not future.cancel():
+                handlers[version].cancel()
+
+    def finish(self, handlers, results):
+        """Order the results by version and promote the lowest passing one."""
+        results = {version: results[version] for version in self.versions}
+        if self.container_pool is not None:
+            self.build_winner(handlers, results)
+        if self.build_context is not None and self.build_context is not self.source_context:
+            self.build_context.cleanup()
+            self.build_context = None
+        winner = self.first_passing(results)
+        if winner:
+            self.promote(handlers[winner.version], winner)
+        return results
+
+    def build_winner(self, handlers, results):
+        """Build the image of the lowest version that passed in a warm container, the only image the pool needs.
+        A version whose image then fails to build counts as failed and the next passing version is built."""
+        for version in self.versions:
+            result = results[version]
+            if not result.passed:
+                continue
+            if result.image_id:
+                return  # Restored from the result cache
+            handler = handlers[version]
+            start = time.monotonic()
+            built = handler.build()
+            result.duration += time.monotonic() - start
+            if built:
+                result.image_id = self.image_id(handler)
+                cache_key = self.cache_key(handler, version)
+                if cache_key and result.image_id:
+                    self.cache.put(cache_key, version, True, result.image_id)
+                return
+            logger.info(f"Python {version} passed in a warm container but its image failed to build.")
+            result.passed = False
+
+    def first_passing(self, results):
+        """Return the lowest passing VersionResult, or None if every version failed."""
+        for version in self.versions:
+            result = results.get(version)
+            if result and result.passed:
+                return result
+        return None
+
+    def promote(self, handler, result):
+        """Tag the winning version with the user requested tag and keep its Dockerfile in the workspace. The image is looked up by
+        the id this job built or validated, its per-version tag may already name the build of another job using the same tag."""
+        try:
+            repository, tag = docker.utils.parse_repository_tag(self.image_tag)
+            handler.client.images.get(result.image_id or result.image_tag).tag(repository, tag=tag)
+            logger.info(f"Docker image {self.image_tag} tagged from {result.image_tag}.")
+        except Exception as e:
+            logger.error(f"Error tagging {result.image_tag} as {self.image_tag}: {e}")
+            return False
+        if self.output_directory:
+            # The job workspace goes away, keep the Dockerfile under a name of its own so concurrent jobs don't overwrite it
+            handler.save_dockerfile(self.output_directory, self.image_tag.replace("/", "_").replace(":", "_") + ".Dockerfile")
+        else:
+            handler.save_dockerfile()
+        return True
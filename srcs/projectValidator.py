@@ -0,0 +1,324 @@
+import atexit
+import hashlib
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+from srcs.baseImages import BaseImageRegistry
+from srcs.buildContext import BuildContext, format_size, is_generated_file
+from srcs.buildkitBackend import buildkit_available
+from srcs.containerPool import ContainerPool
+from srcs.dockerClientManager import get_client_manager
+from srcs.dockerfileGenerator import generate_dockerfile, requirements_listed
+from srcs.logArchive import LogArchive
+from srcs.matrixExecutor import STRATEGIES, MatrixExecutor, format_table
+from srcs.resultCache import ResultCache
+from srcs.workspaceManager import WorkspaceManager, locked_workspace
+from srcs.workspaceSync import copy_paths, sync_directory, sync_files
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_VERSIONS = ["python:3.7-slim", "python:3.8-slim", "python:3.9-slim", "python:3.10-slim", "python:3.11-slim", "python:3.12-slim"]
+
+
+class ValidationError(Exception):
+    """The project can't be validated, i.e: it has no app.py or its build context is too large."""
+
+
+class ValidationConfig:
+    """Settings shared by every validation of a process, see the constants of main.py for what each one does."""
+
+    def __init__(self, versions=None, strategy="matrix", max_parallel_builds=3, workspace_root="/tmp/executionWorkspace", workspace_tmpfs=False,
+                 staging_mode="copy", workspace_cache_root="/tmp/executionWorkspaces", default_dockerignore=True, max_context_size=500 * 1024 * 1024,
+                 context_report_top_n=5, build_backend="classic", run_timeout=60, container_log_directory="/tmp/executionLogs",
+                 log_archive_directory="/tmp/executionLogs/archive", docker_api_version=None, result_cache_file="/tmp/executionCache/results.json",
+                 deduplicate_builds=True, base_image_file="/tmp/executionCache/base_images.json", base_image_refresh_interval=24 * 3600,
+                 validation_mode="container", container_pool_size=2):
+        self.versions = list(versions or DEFAULT_VERSIONS)
+        self.strategy = strategy
+        self.max_parallel_builds = max_parallel_builds
+        self.workspace_root = workspace_root
+        self.workspace_tmpfs = workspace_tmpfs
+        self.staging_mode = staging_mode
+        self.workspace_cache_root = workspace_cache_root
+        self.default_dockerignore = default_dockerignore
+        self.max_context_size = max_context_size
+        self.context_report_top_n = context_report_top_n
+        self.build_backend = build_backend
+        self.run_timeout = run_timeout
+        self.container_log_directory = container_log_directory
+        self.log_archive_directory = log_archive_directory
+        self.docker_api_version = docker_api_version
+        self.result_cache_file = result_cache_file
+        self.deduplicate_builds = deduplicate_builds
+        self.base_image_file = base_image_file
+        self.base_image_refresh_interval = base_image_refresh_interval
+        self.validation_mode = validation_mode
+        self.container_pool_size = container_pool_size
+        self.lock = threading.Lock()
+        self.shared = {}  # Result cache, log archive, workspace manager, base image digests and container pool, created once and reused by every validation
+
+    def get_shared(self, name, create):
+        with self.lock:
+            if name not in self.shared:
+                self.shared[name] = create()
+            return self.shared[name]
+
+    def result_cache(self):
+        """The process-wide ResultCache, None when caching is off."""
+        if not self.result_cache_file:
+            return None
+        return self.get_shared("result_cache", lambda: ResultCache(self.result_cache_file))
+
+    def log_archive(self):
+        """The process-wide LogArchive, None when archiving is off."""
+        if not self.log_archive_directory:
+            return None
+        return self.get_shared("log_archive", lambda: LogArchive(self.log_archive_directory))
+
+    def base_images(self):
+        """The process-wide BaseImageRegistry, None when base images are neither pre-pulled nor pinned."""
+        if not self.base_image_file:
+            return None
+        return self.get_shared("base_images", lambda: BaseImageRegistry(self.base_image_file, self.base_image_refresh_interval))
+
+    def container_pool(self, client_manager):
+        """The process-wide ContainerPool, None when the versions are validated by building their images."""
+        if self.validation_mode != "container":
+            return None
+
+        def create():
+            pool = ContainerPool(client_manager.get_client(), self.container_pool_size)
+            atexit.register(pool.close)  # Idle containers go away with the process
+            return pool
+
+        return self.get_shared("container_pool", create)
+
+    def workspace_manager(self):
+        return self.get_shared("workspace_manager", lambda: WorkspaceManager(self.workspace_root, use_tmpfs=self.workspace_tmpfs))
+
+
+class MatrixResult:
+    def __init__(self, image_tag, strategy, job_id, results=None, duration=0.0, error=None, log_archive=None):
+        self.image_tag = image_tag  # Tag the lowest passing version was promoted to
+        self.strategy = strategy
+        self.job_id = job_id  # Key of the job's logs in the log archive
+        self.results = results or {}  # {version: VersionResult}
+        self.duration = duration  # Wall-clock seconds of the whole validation
+        self.error = error  # Why the project couldn't be validated at all, None if the versions were tried
+        self.log_archive = log_archive
+        passing = [result for result in self.results.values() if result.passed]
+        self.winner = passing[0] if passing else None  # VersionResult of the lowest passing version, None if none passed
+
+    @property
+    def passed(self):
+        return self.winner is not None
+
+    def status(self):
+        """"pass", "fail" when no version passed, "error" when the project couldn't be validated."""
+        if self.error is not None:
+            return "error"
+        return "pass" if self.passed else "fail"
+
+    def table(self):
+        """The per-version pass/fail table."""
+        return format_table(self.results)
+
+    def read_log(self, version, kind="run"):
+        """Archived "build" or "run" log of one version as text, None if it wasn't archived."""
+        if self.log_archive is None:
+            return None
+        data = self.log_archive.read(self.job_id, version, kind)
+        return None if data is None else data.decode("utf-8", "replace")
+
+    def to_dict(self):
+        return {
+            "job_id": self.job_id,
+            "image_tag": self.image_tag,
+            "strategy": self.strategy,
+            "status": self.status(),
+            "version": self.winner.version if self.winner else None,
+            "duration": round(self.duration, 3),
+            "error": self.error,
+            "versions": [result.to_dict() for result in self.results.values()],
+        }
+
+
+def write_or_copy_code_to_workspace(option,source_code,user_directory,working_directory,filename="app.py",paths=None) :
+
+    # Delete previous workspace
+    if os.path.normpath(user_directory) == os.path.normpath(working_directory):
+        raise ValidationError("The user_directory and working_directory can not be equal.")
+    if os.path.exists(working_directory):
+       shutil.rmtree(working_directory)
+
+    os.makedirs(working_directory)
+
+    # Empty requirements.txt
+    requirements_txt_path = os.path.join(working_directory, "requirements.txt")
+
+    with open(requirements_txt_path, "w") as f:
+        f.write("")  # Create an empty requirements.txt
+        f.close()
+        logger.info(f"Empty requirements.txt created at {requirements_txt_path}.")
+
+    if option == '1':
+        # write the source code as filename which is app.py by default
+        with open(os.path.join(working_directory, filename), "w") as f:
+            f.write(source_code)
+            f.close()
+    if option == '2':
+        # copy entire user directory to the workspace directory
+        # first check if the directory contains app.py, then do the copying
+        file_path = os.path.join(user_directory, "app.py")
+
+        if os.path.exists(file_path) and os.path.isfile(file_path) and paths is not None:
+            # Only what goes in the build context
+            copy_paths(user_directory, working_directory, paths)
+        elif os.path.exists(file_path) and os.path.isfile(file_path):
+            for item in os.listdir(user_directory):
+                source_item = os.path.join(user_directory, item)
+                dest_item = os.path.join(working_directory, item)
+                if os.path.isdir(source_item):
+                    shutil.copytree(source_item, dest_item)
+                else:
+                    shutil.copy2(source_item, dest_item)
+        else:
+            raise ValidationError("You should have app.py in your project directory. If this is main.py, remane to app.py and then run.")
+
+
+def sync_workspace_path(option,source_code,user_directory,cache_root):
+    """Long-lived workspace of the "sync" staging mode, one per project directory so its previous staging is reused.
+    Typed source gets one per distinct source, jobs of different snippets don't wait for each other's workspace."""
+    if option == '1':
+        return os.path.join(cache_root, "source-" + hashlib.sha256(source_code.encode()).hexdigest()[:16])
+    return os.path.join(cache_root, hashlib.sha256(os.path.abspath(user_directory).encode()).hexdigest()[:16])
+
+
+def sync_code_to_workspace(option,source_code,user_directory,working_directory,filename="app.py",paths=None):
+    """Incrementally sync the code into the workspace, only what changed since the previous staging is copied."""
+    if option == '1':
+        stats = sync_files({filename: source_code, "requirements.txt": ""}, working_directory, keep=is_generated_file)
+    else:
+        if not os.path.isfile(os.path.join(user_directory, "app.py")):
+            raise ValidationError("You should have app.py in your project directory. If this is main.py, remane to app.py and then run.")
+        if os.path.normpath(user_directory) == os.path.normpath(working_directory):
+            raise ValidationError("The user_directory and working_directory can not be equal.")
+        has_requirements = os.path.isfile(os.path.join(user_directory, "requirements.txt"))
+        keep = lambda path: is_generated_file(path) or (path == "requirements.txt" and not has_requirements)
+        stats = sync_directory(user_directory, working_directory, keep=keep, include=paths)
+        if not has_requirements:
+            # Empty requirements.txt
+            stats.copied += sync_files({"requirements.txt": ""}, working_directory, keep=lambda path: True).copied
+    logger.info(f"Workspace {working_directory} synced: {stats}.")
+
+
+def stream_code_to_context(option,source_code,user_directory,working_directory,filename="app.py",use_default_ignores=True):
+    """Build context streamed from the source code or user directory, nothing is copied to the working directory."""
+    # The working directory only receives the generated Dockerfiles
+    os.makedirs(working_directory, exist_ok=True)
+
+    if option == '1':
+        return BuildContext(files={filename: source_code, "requirements.txt": ""}, spool=False)
+    if not os.path.isfile(os.path.join(user_directory, "app.py")):
+        raise ValidationError("You should have app.py in your project directory. If this is main.py, remane to app.py and then run.")
+    # Empty requirements.txt when the project has none, overlaid in the stream
+    files = {} if os.path.isfile(os.path.join(user_directory, "requirements.txt")) else {"requirements.txt": ""}
+    return BuildContext(user_directory, files, spool=False, use_default_ignores=use_default_ignores)
+
+
+def preflight_context(user_directory, config):
+    """Report the size of the build context the project directory makes and return its paths, raises ValidationError above max_context_size."""
+    context = BuildContext(user_directory, use_default_ignores=config.default_dockerignore)
+    paths = context.directory_paths()
+    report = context.report(config.context_report_top_n, paths)
+    logger.info(report)
+    if report.exceeds(config.max_context_size):
+        raise ValidationError(f"The build context is larger than the {format_size(config.max_context_size)} limit. "
+                              f"Add the paths you don't need to run app.py to a .dockerignore in {user_directory}.\n{report}")
+    return paths
+
+
+def build_versions(option, source_code, user_directory, image_tag, working_directory, config, versions, strategy, job_id):
+    """Stage the code in working_directory, build it against the versions and tag the lowest passing one. Returns {version: VersionResult}."""
+    build_context = None
+    install_requirements = None
+    paths = None
+    if option == '2' and os.path.isfile(os.path.join(user_directory, "app.py")):
+        paths = preflight_context(user_directory, config)
+    if config.staging_mode == "stream":
+        build_context = stream_code_to_context(option, source_code, user_directory, working_directory, use_default_ignores=config.default_dockerignore)
+        install_requirements = requirements_listed(build_context.read_file("requirements.txt").decode())
+    elif config.staging_mode == "sync":
+        sync_code_to_workspace(option, source_code, user_directory, working_directory, paths=paths)
+    else:
+        write_or_copy_code_to_workspace(option, source_code, user_directory, working_directory, paths=paths)
+
+    builder = config.build_backend
+    if builder == "buildkit" and not buildkit_available():
+        logger.info("docker buildx is not available, falling back to the classic builder.")
+        builder = "classic"
+
+    # Dockerfile for a Python-based image, the pip install step only when requirements.txt lists something
+    dockerfile_content = generate_dockerfile(working_directory, pip_cache=(builder == "buildkit"), install_requirements=install_requirements)
+
+    max_workers = len(versions) if strategy == "race" else config.max_parallel_builds
+    # One streaming build plus one API call per worker
+    client_manager = get_client_manager(maxPoolSize=2 * max_workers, apiVersion=config.docker_api_version)
+    # Base images missing or older than the refresh interval are pulled in parallel before the builds, which then start FROM their digests
+    base_images = config.base_images().warm(client_manager.get_client(), versions) if config.base_images() else None
+    # Job workspaces are deleted after the job, the winning Dockerfile goes to the workspace root
+    output_directory = None if config.staging_mode == "sync" else config.workspace_root
+    executor = MatrixExecutor(dockerfile_content, image_tag, working_directory, versions, max_workers=max_workers, cache=config.result_cache(),
+                              client_manager=client_manager, run_timeout=config.run_timeout, builder=builder, build_context=build_context,
+                              output_directory=output_directory, log_directory=config.container_log_directory, log_archive=config.log_archive(), job_id=job_id,
+                              deduplicate=config.deduplicate_builds, base_images=base_images,
+                              container_pool=config.container_pool(client_manager), use_default_ignores=config.default_dockerignore)
+    return executor.run_strategy(strategy)
+
+
+def warm_up(config, client_manager, versions=None):
+    """Pull the stale base images and start a warm container per version before the first job, so no job waits for them.
+    Returns {version: pinned base image reference}."""
+    versions = list(versions or config.versions)
+    base_images = config.base_images().warm(client_manager.get_client(), versions) if config.base_images() else {}
+    if config.container_pool(client_manager) is not None:
+        config.container_pool(client_manager).warm(base_images.get(version, version) for version in versions)
+    return base_images
+
+
+def validate_project(path=None, source=None, versions=None, strategy=None, tag="python-app", config=None, job_id=None):
+    """Validate a project directory holding app.py, or the source code of app.py, against Python versions.
+
+    The lowest passing version is tagged as tag. Nothing is printed or prompted, progress goes to the logging module.
+    versions and strategy default to the ones of config.
+    """
+    config = config or ValidationConfig()
+    versions = list(versions or config.versions)
+    strategy = strategy or config.strategy
+    job_id = job_id or uuid.uuid4().hex[:12]
+    start = time.monotonic()
+    if (path is None) == (source is None):
+        return MatrixResult(tag, strategy, job_id, error="Pass either the path of a project directory or the source code of app.py.")
+    option = '1' if source is not None else '2'
+    user_directory = "" if path is None else path
+    try:
+        if strategy not in STRATEGIES:
+            raise ValidationError(f"Unknown version strategy {strategy}, expected one of {', '.join(STRATEGIES)}.")
+        if option == '2' and not os.path.isdir(user_directory):
+            raise ValidationError(f"The directory {user_directory} does not exist.")
+        if config.staging_mode == "sync":
+            # The project's long-lived workspace, concurrent jobs of the same project take turns
+            working_directory = sync_workspace_path(option, source, user_directory, config.workspace_cache_root)
+            with locked_workspace(working_directory):
+                results = build_versions(option, source, user_directory, tag, working_directory, config, versions, strategy, job_id)
+        else:
+            with config.workspace_manager().job_workspace() as working_directory:
+                results = build_versions(option, source, user_directory, tag, working_directory, config, versions, strategy, job_id)
+    except ValidationError as e:
+        logger.error(str(e))
+        return MatrixResult(tag, strategy, job_id, duration=time.monotonic() - start, error=str(e))
+    error = None if results else f"No version could be validated with the {strategy} strategy, see the log."
+    return MatrixResult(tag, strategy, job_id, results, time.monotonic() - start, error, config.log_archive())
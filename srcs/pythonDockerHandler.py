@@ -1,140 +1,467 @@
 import docker
+import logging
 import os
+import requests
+import shutil
+import socket
+import tempfile
+import threading
+from urllib.parse import urlparse
+from srcs import buildkitBackend
+from srcs.buildContext import BuildContext
+from srcs.jsonStream import json_stream
+from srcs.logStream import LogTail, stream_container_logs
+from srcs.singleFlight import FlightAbandoned, SingleFlight
+from srcs.workspaceSync import copy_paths
+
+logger = logging.getLogger(__name__)
+
+_build_tracking = threading.local()  # The handler building on the current thread, clients are shared between threads
+_base_image_pulls = SingleFlight()  # Concurrent builds from one missing base image wait for a single pull of it
+
+
+def track_build_response(response, *args, **kwargs):
+    """requests response hook handing the streaming build response to the handler building on this thread."""
+    handler = getattr(_build_tracking, "handler", None)
+    if handler is not None and urlparse(response.url).path.endswith("/build"):
+        handler.build_response = response
+        if handler.cancelled():
+            handler.abort_build()
+
 
 class DockerHandler:
-    def __init__(self, dockerfileContent, image_tag, userDirectory="", workingDirectory="/tmp"):
+    def __init__(self, dockerfileContent, image_tag, userDirectory="", workingDirectory="/tmp", dockerfileName="Dockerfile", client=None, buildLogCallback=None, runTimeout=60, builder="classic", buildContext=None, logDirectory=None, logTailBytes=64 * 1024, jobLog=None, useDefaultIgnores=True, jobId=None):
         self.dockerfile_content = dockerfileContent.strip()  # Strip any extra spaces around the content
         self.image_tag = image_tag
+        self.dockerfile_name = dockerfileName  # Dockerfile name inside the workspace, unique per version when builds share a workspace
         self.userDirectory = userDirectory  # User input project directory where app.py should be
-        self.client = docker.from_env()  # Docker client initialization
-        self.workingDirectory = workingDirectory  # temporary file location where DockerHandler does it's operation. Copies content from self.userDirectory and put in self.workingDirectory before proceeding.
+        self.client = client or docker.from_env()  # Docker client, pass the shared client from DockerClientManager to reuse its connection pool
+        self.workingDirectory = workingDirectory  # temporary file location where DockerHandler does it's operation. Copies content from self.userDirectory and put in self.workingDirectory before proceeding. None gives the handler its own temp directory.
+        self.temp_dir = None  # Temp directory the handler created for itself, deleted by cleanup_temp_dir()
+        self.build_log_callback = buildLogCallback  # Called as callback(handler, text) for every build output chunk, prints it when None
+        self.run_timeout = runTimeout  # Seconds the validation container gets to exit before it counts as failed
+        self.builder = builder  # "classic" builds through the docker API, "buildkit" through `docker buildx build`
+        self.build_process = None  # In-flight buildx process, so cancel() can kill it
+        self.build_context = buildContext  # Optional BuildContext shared by every version, the classic builder then skips re-tarring the workspace
+        self.cancel_event = threading.Event()  # Set by cancel(), checked between the execute() steps
+        self.log_directory = logDirectory  # Where the full container log is written as <image tag>.log, None keeps only the tail
+        self.log_tail_bytes = logTailBytes  # Bytes of the container log kept in memory and printed
+        self.job_log = jobLog  # Optional JobLog archiving the build and run logs of this version
+        self.job_id = jobId  # Job the handler validates for, names its log file so jobs sharing a tag keep their own logs
+        self.use_default_ignores = useDefaultIgnores  # Leave DEFAULT_IGNORE_PATTERNS out of the copied directory, like the build context
+        self.build_log = LogTail(logTailBytes)  # Ring buffer of the latest build output
+        self.build_log_writer = None  # Archive writer of the build in progress
+        self.image_id = None  # Id of the image the classic builder reported
+        self.build_response = None  # In-flight streaming build response, so cancel() can abort it
+        self.container = None  # Running validation container, so cancel() can kill it
 
     def validate_directory(self):
         """Ensure that app.py exists in the given directory."""
-        app_path = os.path.join(self.workingDirectory, "app.py")
+        if self.build_context is not None and not self.build_context.spool:
+            # Streamed straight from the user's directory or source, nothing is staged in the working directory
+            if not self.build_context.has_file("app.py"):
+                logger.error("Error: app.py not found in the build context.")
+                return False
+            return True
+        directory = self.workingDirectory if self.workingDirectory is not None else self.userDirectory
+        app_path = os.path.join(directory, "app.py")
         if not os.path.isfile(app_path):
-            print(f"Error: app.py not found in the directory {self.workingDirectory}.")
+            logger.error(f"Error: app.py not found in the directory {directory}.")
             return False
         return True
 
     def create_temp_directory(self):
-        # already done creating temp in write_or_copy_code_to_workspace
-        
-        return self.workingDirectory
+        """Return the directory to build from, a private copy of userDirectory when there is no working directory."""
+        if self.workingDirectory is not None:
+            # already done creating temp in write_or_copy_code_to_workspace
+            return self.workingDirectory
+        if self.temp_dir is None:
+            self.temp_dir = tempfile.mkdtemp(prefix="dockerhandler-")
+            # Only what goes in the build context, an ignored venv is never copied
+            copy_paths(self.userDirectory, self.temp_dir, BuildContext(self.userDirectory, use_default_ignores=self.use_default_ignores).directory_paths())
+            requirements_txt_path = os.path.join(self.temp_dir, "requirements.txt")
+            if not os.path.exists(requirements_txt_path):
+                open(requirements_txt_path, "w").close()  # Empty requirements.txt
+        return self.temp_dir
 
     def copy_directory(self):
         """Copy the directory contents to the temporary location."""
         try:
             temp_dir = self.create_temp_directory() ##mainly the self.workingDirectory 
-            print(f"Copying contents to {temp_dir}...")
+            logger.info(f"Copying contents to {temp_dir}...")
 
-            with open(os.path.join(temp_dir, "Dockerfile"), "w") as f:
-                f.write(self.dockerfile_content)
+            # Write a temporary file of its own then rename, so a concurrent build never tars a half-written Dockerfile
+            dockerfile_path = os.path.join(temp_dir, self.dockerfile_name)
+            fd, temp_path = tempfile.mkstemp(dir=temp_dir, prefix=f".{self.dockerfile_name}.")
+            try:
+                with os.fdopen(fd, "w") as f:
+                    f.write(self.dockerfile_content)
+                os.replace(temp_path, dockerfile_path)
+            except BaseException:
+                os.remove(temp_path)
+                raise
 
             return temp_dir
         except Exception as e:
-            print(f"Error copying directory: {e}")
+            logger.error(f"Error copying directory: {e}")
             return None
 
+    def base_image(self):
+        """Image of the first FROM line of the Dockerfile, None without one."""
+        for line in self.dockerfile_content.splitlines():
+            words = line.split()
+            if words and words[0].upper() == "FROM":
+                images = [word for word in words[1:] if not word.startswith("--")]  # Skip --platform
+                return images[0] if images else None
+        return None
+
+    def pull_base_image(self):
+        """Pull the base image unless it is already local. Concurrent builds needing the same image share one pull.
+
+        Returns False only if the handler was cancelled while waiting, a failed pull is left for the build to report.
+        """
+        image = self.base_image()
+        if image is None:
+            return True
+        try:
+            self.client.images.get(image)
+            return True
+        except docker.errors.ImageNotFound:
+            pass
+        except Exception as e:
+            logger.error(f"Error looking up the base image {image}: {e}")
+            return True
+
+        def pull():
+            logger.info(f"Pulling the base image {image}...")
+            return self.client.images.pull(image)
+
+        try:
+            _base_image_pulls.do(image, pull, abandon=self.cancelled,
+                                 on_join=lambda: logger.info(f"{image} is already being pulled, waiting for that pull."))
+        except FlightAbandoned:
+            return False
+        except Exception as e:
+            logger.error(f"Error pulling the base image {image}: {e}")
+        return True
+
     def build_image(self, temp_dir):
-        """Build the Docker image from the temporary directory."""
+        """Build the Docker image from the temporary directory, streaming the output and stopping at the first error."""
+        if self.builder == "buildkit":
+            return self.build_image_buildkit(temp_dir)
+        if track_build_response not in self.client.api.hooks["response"]:
+            self.client.api.hooks["response"].append(track_build_response)
+        _build_tracking.handler = self
+        stream = None
+        context = None
         try:
-            print(f"Building Docker image with tag: {self.image_tag} from {temp_dir}...")
-            image, build_log = self.client.images.build(path=temp_dir, tag=self.image_tag)
-            for line in build_log:
-                if 'error' in line:
-                    print(f"Build error: {line.get('error')}")
-                    return False  # Return False if there is a build error
-            print(f"Docker image {self.image_tag} built successfully.")
+            logger.info(f"Building Docker image with tag: {self.image_tag} from {temp_dir}...")
+            # The low-level generator yields raw chunks as the daemon sends them, decoded in linear time by json_stream
+            if self.build_context is not None:
+                context = self.build_context.open(self.dockerfile_name, self.dockerfile_content)
+                stream = self.client.api.build(fileobj=context, custom_context=True, dockerfile=self.dockerfile_name, tag=self.image_tag, decode=False)
+            else:
+                stream = self.client.api.build(path=temp_dir, dockerfile=self.dockerfile_name, tag=self.image_tag, decode=False)
+            image_id = None
+            for chunk in json_stream(stream):
+                if 'error' in chunk or 'errorDetail' in chunk:
+                    logger.error(f"Build error: {chunk.get('error') or chunk['errorDetail'].get('message')}")
+                    self.record_build_log(f"Build error: {chunk.get('error') or chunk['errorDetail'].get('message')}\n")
+                    self.abort_build()  # Don't let the daemon carry on with a build that already failed
+                    return False
+                if 'stream' in chunk:
+                    self.forward_build_log(chunk['stream'])
+                if 'ID' in chunk.get('aux', {}):
+                    image_id = chunk['aux']['ID']
+            self.image_id = image_id
+            if image_id is None:
+                if self.cancelled():
+                    logger.info(f"Build of {self.image_tag} cancelled.")
+                else:
+                    logger.error(f"Build failed: the build of {self.image_tag} ended without an image.")
+                return False
+            logger.info(f"Docker image {self.image_tag} built successfully.")
             return True
-        except docker.errors.BuildError as e:
-            print(f"Build failed: {e}")
+        except Exception as e:
+            if self.cancelled():
+                logger.info(f"Build of {self.image_tag} cancelled.")
+            else:
+                logger.error(f"Error building the image: {e}")
             return False
+        finally:
+            if stream is not None:
+                stream.close()
+            if context is not None:
+                context.close()
+            if self.build_response is not None:
+                self.build_response.close()  # Give the connection back to the pool, or drop it if it was aborted
+            _build_tracking.handler = None
+            self.build_response = None
+
+    def build_image_buildkit(self, temp_dir):
+        """Build the Docker image with BuildKit, which supports cache mounts and runs independent stages in parallel."""
+        # Outside the build context, buildx writes the id of the image there
+        fd, iidfile = tempfile.mkstemp(suffix=".iid")
+        os.close(fd)
+        try:
+            logger.info(f"Building Docker image with BuildKit with tag: {self.image_tag} from {temp_dir}...")
+            streamed = self.build_context is not None and not self.build_context.spool
+            self.build_process = buildkitBackend.start_build(temp_dir, self.dockerfile_name, self.image_tag, context_from_stdin=streamed, iidfile=iidfile)
+            if streamed:
+                context = self.build_context.open(self.dockerfile_name, self.dockerfile_content)
+                threading.Thread(target=buildkitBackend.feed_context, args=(self.build_process, context), daemon=True).start()
+            if self.cancelled():
+                self.abort_build()
+            for line in self.build_process.stdout:
+                self.forward_build_log(line)
+            if self.build_process.wait() != 0:
+                if self.cancelled():
+                    logger.info(f"Build of {self.image_tag} cancelled.")
+                else:
+                    logger.error(f"Build failed: docker buildx exited with code {self.build_process.returncode}")
+                    self.record_build_log(f"Build failed: docker buildx exited with code {self.build_process.returncode}\n")
+                return False
+            with open(iidfile) as f:
+                self.image_id = f.read().strip() or None
+            logger.info(f"Docker image {self.image_tag} built successfully.")
+            return True
         except Exception as e:
-            print(f"Error building the image: {e}")
+            logger.error(f"Error building the image: {e}")
             return False
+        finally:
+            if self.build_process is not None:
+                self.build_process.stdout.close()
+            self.build_process = None
+            os.remove(iidfile)
+
+    def record_build_log(self, text):
+        """Keep build output in the ring buffer and the archive."""
+        self.build_log.append(text)
+        if self.build_log_writer is not None:
+            self.build_log_writer.write(text)
+
+    def forward_build_log(self, text):
+        """Hand one chunk of build output to the log callback as soon as it arrives."""
+        self.record_build_log(text)
+        if self.build_log_callback:
+            self.build_log_callback(self, text)
+        else:
+            for line in text.splitlines():
+                if line.strip():
+                    logger.info(f"[{self.image_tag}] {line}")
 
     def run_container(self):
-        """Run the Docker container."""
+        """Run the Docker container, from the image this handler built when its id is known. The tag may meanwhile point to the
+        build of another job using the same tag."""
         try:
-            print(f"Running the container with image: {self.image_tag}...")
-            container = self.client.containers.run(self.image_tag, detach=True)
+            logger.info(f"Running the container with image: {self.image_tag}...")
+            container = self.client.containers.run(self.image_id or self.image_tag, detach=True)
+            self.container = container
             return container
         except docker.errors.ContainerError as e:
-            print(f"Error running the container: {e}")
+            logger.error(f"Error running the container: {e}")
             return None
         except Exception as e:
-            print(f"Error running the container: {e}")
+            logger.error(f"Error running the container: {e}")
             return None
 
-    def get_logs(self, container):
-        """Get the logs from the running container."""
+    def wait_container(self, container):
+        """Wait for the container to exit within run_timeout, returns its exit code or None on timeout."""
         try:
-            logs = container.logs()
-            print("Container logs:\n", logs.decode())
-            return True
+            return container.wait(timeout=self.run_timeout).get("StatusCode")
+        except (requests.exceptions.ReadTimeout, requests.exceptions.ConnectionError):
+            logger.info(f"Container {container.id} did not exit within {self.run_timeout}s.")
+            return None
         except Exception as e:
-            print(f"Error fetching container logs: {e}")
-            return False
+            logger.error(f"Error waiting for the container: {e}")
+            return None
 
-    def stop_container(self, container):
-        """Stop the container if it's running."""
+    def log_file_path(self):
+        """Path of the full container log, <image tag>-<job id>.log, None without a log directory."""
+        if self.log_directory is None:
+            return None
+        name = self.image_tag.replace("/", "_").replace(":", "_")
+        return os.path.join(self.log_directory, f"{name}-{self.job_id}.log" if self.job_id else f"{name}.log")
+
+    def get_logs(self, container):
+        """Stream the logs of the exited container to the log file, only their tail is kept in memory and printed."""
+        return self.record_logs(lambda tail, log_files: stream_container_logs(self.client, container.id, tail, log_files))
+
+    def record_logs(self, stream):
+        """Write the run output to the log file and the archive as stream(tail, log_files) produces it, then print its tail."""
+        log_path = self.log_file_path()
+        tail = LogTail(self.log_tail_bytes)
+        log_files = []
         try:
-            container.stop()
-            print(f"Container {container.id} stopped successfully.")
+            if log_path is not None:
+                os.makedirs(self.log_directory, exist_ok=True)
+                log_files.append(open(log_path, "wb"))
+            if self.job_log is not None:
+                log_files.append(self.job_log.writer("run"))
+            stream(tail, log_files)
+            if tail.truncated():
+                logger.info(f"Container logs (last {self.log_tail_bytes} of {tail.total} bytes{', full log in ' + log_path if log_path else ''}):\n {tail.text()}")
+            else:
+                logger.info(f"Container logs:\n {tail.text()}")
             return True
         except Exception as e:
-            print(f"Error stopping the container: {e}")
+            logger.error(f"Error fetching container logs: {e}")
             return False
+        finally:
+            for log_file in log_files:
+                log_file.close()
 
     def remove_container(self, container):
-        """Remove the container after use."""
+        """Remove the container after use, killing it if it is still running."""
         try:
-            self.stop_container(container)  # Ensure the container is stopped first
-            container.remove()
-            print(f"Container {container.id} removed successfully.")
+            # force kills a container that outlived its deadline, no stop timeout to sit through
+            container.remove(force=True)
+            logger.info(f"Container {container.id} removed successfully.")
             return True
         except Exception as e:
-            print(f"Error removing the container: {e}")
+            logger.error(f"Error removing the container: {e}")
             return False
 
+    def validate_container(self, container):
+        """Wait for the container, fetch its logs once and remove it. Passes only if it exited with code 0."""
+        exit_code = self.wait_container(container)
+        logs_fetched = self.get_logs(container)
+        removed = self.remove_container(container)
+        self.container = None
+        if exit_code != 0:
+            if exit_code is not None:
+                logger.info(f"Container exited with code {exit_code}.")
+            return False
+        return logs_fetched and removed
+
+    def cancelled(self):
+        """True once cancel() has been called."""
+        return self.cancel_event.is_set()
+
+    def abort_build(self):
+        """Abort the in-flight build, if any."""
+        process = self.build_process
+        if process is not None:
+            process.kill()
+        response = self.build_response
+        if response is not None:
+            try:
+                # Shutting the socket down unblocks the reading thread and makes the daemon abandon the build
+                self.client.api._get_raw_response_socket(response).shutdown(socket.SHUT_RDWR)
+            except Exception as e:
+                logger.error(f"Error aborting the build of {self.image_tag}: {e}")
+
+    def cancel(self):
+        """Cancel the execution: abort an in-flight build, kill the running container and stop at the next step."""
+        self.cancel_event.set()
+        self.abort_build()
+        container = self.container
+        if container is not None:
+            try:
+                container.kill()
+            except Exception as e:
+                logger.error(f"Error killing the container: {e}")
+
+    def save_dockerfile(self, directory=None, filename="Dockerfile"):
+        """Save the Dockerfile content, by default as the workspace Dockerfile."""
+        os.makedirs(directory or self.workingDirectory, exist_ok=True)
+        dockerfile_path = os.path.join(directory or self.workingDirectory, filename)
+        with open(dockerfile_path, "w") as f:
+            f.write(self.dockerfile_content)
+        logger.info(f"Successful Dockerfile content saved to {dockerfile_path}")
+        return dockerfile_path
+
     def cleanup_temp_dir(self):
-        """Delete the temporary directory to clean up."""
-        pass
-        # if os.path.exists(self.temp_dir):
-        #     try:
-        #         shutil.rmtree(self.temp_dir)
-        #         print(f"Temporary directory {self.temp_dir} cleaned up.")
-        #     except Exception as e:
-        #         print(f"Error cleaning up temporary directory {self.temp_dir}: {e}")
-        # else:
-        #     print(f"No temporary directory to clean up or it already exists.")
+        """Delete the temporary directory to clean up. Shared working directories belong to the caller and are kept."""
+        if self.temp_dir is None:
+            return
+        if os.path.exists(self.temp_dir):
+            try:
+                shutil.rmtree(self.temp_dir)
+                logger.info(f"Temporary directory {self.temp_dir} cleaned up.")
+            except Exception as e:
+                logger.error(f"Error cleaning up temporary directory {self.temp_dir}: {e}")
+        else:
+            logger.info("No temporary directory to clean up or it already exists.")
+        self.temp_dir = None
 
-    def execute(self):
-        """Main method to validate, copy files, build image, run container, and fetch logs."""
+    def build(self):
+        """Validate, copy files and build the image, without running it."""
         if not self.validate_directory():
             return False
 
-        temp_dir = self.copy_directory()
-        if not temp_dir:
-            return False
+        try:
+            temp_dir = self.copy_directory()
+            if not temp_dir or self.cancelled():
+                return False
+            if not self.pull_base_image() or self.cancelled():
+                return False
 
-        if not self.build_image(temp_dir):
+            self.build_log_writer = self.job_log.writer("build") if self.job_log else None
+            try:
+                built = self.build_image(temp_dir)
+            finally:
+                if self.build_log_writer is not None:
+                    self.build_log_writer.close()
+                    self.build_log_writer = None
+            return built and not self.cancelled()
+        finally:
+            # Cleanup temporary directory after the operation is complete
+            self.cleanup_temp_dir()
+
+    def execute(self):
+        """Main method to validate, copy files, build image, run container, and fetch logs."""
+        return self.build() and self.validate_image()
+
+    def validate_in_pool(self, pool, archive, install_requirements=False):
+        """Validate without building an image: run app.py in a warm container of the base image from the ContainerPool,
+        with the tar archive of the code copied in. Passes only if app.py exits with code 0 within run_timeout."""
+        image = self.base_image()
+        pooled = None
+        try:
+            pooled = pool.acquire(image)
+            self.container = pooled.container  # cancel() kills it
+            if self.cancelled():
+                return False
+            logger.info(f"Running {self.image_tag} in the warm container {pooled.container.short_id} of {image}...")
+            pool.copy_in(pooled, archive)
+            exec_id, output = pool.run_app(pooled, self.run_timeout, install_requirements)
+
+            def stream(tail, log_files):
+                for chunk in output:
+                    for log_file in log_files:
+                        log_file.write(chunk)
+                    tail.append(chunk)
+
+            logs_fetched = self.record_logs(stream)
+            exit_code = pool.exit_code(exec_id)
+            if exit_code != 0:
+                logger.info(f"app.py exited with code {exit_code}.")
+                return False
+            return logs_fetched and not self.cancelled()
+        except Exception as e:
+            if not self.cancelled():
+                logger.error(f"Error validating in a warm container of {image}: {e}")
             return False
+        finally:
+            self.container = None
+            if pooled is not None:
+                pool.release(pooled)
 
+    def validate_image(self):
+        """Run the built image, check the container's exit code and logs, and save the successful Dockerfile."""
         container = self.run_container()
 
+        if container and self.cancelled():
+            self.remove_container(container)
+            return False
+
         if container:
-            if not self.get_logs(container):
-                return False
-            if not self.remove_container(container):
+            if not self.validate_container(container):
                 return False
-            # Save the successful Dockerfile content to /tmp/executionWorkspace
-            dockerfile_path = os.path.join(self.workingDirectory, "Dockerfile")
-            with open(dockerfile_path, "w") as f:
-                f.write(self.dockerfile_content)
-            print(f"Successful Dockerfile content saved to {dockerfile_path}")
-            # Cleanup temporary directory after the operation is complete
-            self.cleanup_temp_dir()
+            # Save the successful Dockerfile content to /tmp/executionWorkspace.
+            # Builds sharing the workspace leave this to the caller once a winner is known.
+            if self.dockerfile_name == "Dockerfile" and self.workingDirectory is not None:
+                self.save_dockerfile()
             return True
         return False
\ No newline at end of file
@@ -0,0 +1,135 @@
+import contextlib
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from srcs.buildContext import BuildContext
+from srcs.singleFlight import FlightAbandoned
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_FILE = "/tmp/executionCache/results.json"
+LOCK_DIRECTORY = "locks"  # Next to the cache file, one lock file per cache key being built
+FAILURE_TTL = 3600  # Seconds a failed result is reused, a failure may come from the daemon or a slow host rather than the code
+
+
+def hash_workspace(directory, use_default_ignores=True):
+    """Hash the relative paths and contents of every file of the staged workspace that goes in the build context."""
+    return BuildContext(directory, use_default_ignores=use_default_ignores).content_hash()
+
+
+def write_json(path, data):
+    """Write the JSON file atomically through a temporary file of its own, concurrent writers never share one."""
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=os.path.basename(path) + ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(data, f)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
+
+class ResultCache:
+    def __init__(self, cacheFile=DEFAULT_CACHE_FILE, failureTtl=FAILURE_TTL):
+        self.cache_file = cacheFile  # JSON file mapping cache keys to validation results
+        self.failure_ttl = failureTtl  # Passes are kept until the key changes, failures expire after this many seconds
+        self.lock = threading.Lock()  # Concurrent version builds share one cache
+        self.entries = self.load()
+
+    def load(self):
+        """Load the cache file, an unreadable cache is treated as empty."""
+        try:
+            with open(self.cache_file) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def reload(self):
+        """Merge the entries other processes saved since the cache was loaded."""
+        entries = self.load()
+        with self.lock:
+            self.entries.update(entries)
+
+    def save(self):
+        """Write the cache file atomically, keeping the entries other processes saved meanwhile. The merge holds a lock file
+        next to the cache so two processes saving at once don't drop each other's entries."""
+        os.makedirs(os.path.dirname(self.cache_file), exist_ok=True)
+        with open(self.cache_file + ".lock", "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                self.entries = {**self.load(), **self.entries}
+                write_json(self.cache_file, self.entries)
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def base_image_digest(self, client, version):
+        """Resolve the digest the base image tag currently points to, None if it can't be resolved. Not memoized, the cache
+        outlives jobs and a tag moves to new digests, callers resolve it once per job."""
+        try:
+            digest = client.images.get_registry_data(version).id
+        except Exception:
+            try:
+                # Offline, fall back to the locally pulled image
+                digest = client.images.get(version).id
+            except Exception as e:
+                logger.warning(f"Could not resolve the digest of {version}, result cache disabled for it: {e}")
+                digest = None
+        return digest
+
+    def key(self, workspace_hash, dockerfile_content, base_digest, run_timeout, mode):
+        """Cache key, a new base image digest, Dockerfile, run timeout or validation mode automatically gives a new key."""
+        return hashlib.sha256("\0".join([workspace_hash, dockerfile_content, base_digest, str(run_timeout), mode]).encode()).hexdigest()
+
+    @contextlib.contextmanager
+    def building(self, key, abandon=None, poll_interval=0.2):
+        """Hold the build of a cache key across processes. A process validating the same key meanwhile waits here,
+        then finds the result in the reloaded cache. Yields True if it had to wait.
+
+        Raises FlightAbandoned when abandon() returns True while waiting.
+        """
+        lock_directory = os.path.join(os.path.dirname(self.cache_file), LOCK_DIRECTORY)
+        os.makedirs(lock_directory, exist_ok=True)
+        with open(os.path.join(lock_directory, key + ".lock"), "a") as f:
+            waited = False
+            while True:
+                try:
+                    fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    if not waited:
+                        logger.info("An identical build is running in another process, waiting for its result.")
+                    waited = True
+                    if abandon is not None and abandon():
+                        raise FlightAbandoned(key)
+                    time.sleep(poll_interval)
+            try:
+                if waited:
+                    self.reload()
+                yield waited
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def get(self, key):
+        """Return the cached entry for the key, or None. A failure older than the failure TTL is not returned so the version
+        is validated again."""
+        with self.lock:
+            entry = self.entries.get(key)
+        if entry and not entry["passed"] and time.time() - entry.get("created", 0) > self.failure_ttl:
+            return None
+        return entry
+
+    def put(self, key, version, passed, image_id):
+        """Record the result of a validation."""
+        with self.lock:
+            self.entries[key] = {"version": version, "passed": passed, "image_id": image_id, "created": time.time()}
+            try:
+                self.save()
+            except OSError as e:
+                logger.error(f"Error saving the result cache {self.cache_file}: {e}")
@@ -0,0 +1,55 @@
+import threading
+
+
+class FlightAbandoned(Exception):
+    """The caller stopped waiting for a call already in flight, i.e: its build was cancelled."""
+
+
+class Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None  # Exception raised by the call, raised again in every caller
+
+
+class SingleFlight:
+    """Runs a call once for concurrent callers asking for the same key, every caller gets its result.
+
+    Only calls that overlap are coalesced, a call made after the previous one finished runs again.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.flights = {}  # {key: Flight} of the calls in flight
+
+    def do(self, key, function, abandon=None, on_join=None, poll_interval=0.2):
+        """Return (function(), shared), shared being True when another caller ran the call.
+
+        A caller joining a call in flight calls on_join() then waits for it, raising FlightAbandoned
+        as soon as abandon() returns True. The call itself always runs to its end.
+        """
+        with self.lock:
+            flight = self.flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self.flights[key] = Flight()
+        if leader:
+            try:
+                flight.value = function()
+                return flight.value, False
+            except BaseException as e:
+                flight.error = e
+                raise
+            finally:
+                with self.lock:
+                    del self.flights[key]
+                flight.done.set()
+
+        if on_join is not None:
+            on_join()
+        while not flight.done.wait(poll_interval if abandon else None):
+            if abandon():
+                raise FlightAbandoned(key)
+        if flight.error is not None:
+            raise flight.error
+        return flight.value, True
@@ -0,0 +1,237 @@
+import collections
+import heapq
+import itertools
+import json
+import logging
+import os
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from srcs.dockerClientManager import get_client_manager
+from srcs.projectValidator import validate_project, warm_up
+
+logger = logging.getLogger(__name__)
+
+MAX_FINISHED_JOBS = 10000  # Finished jobs kept for polling, the oldest are forgotten first
+MAX_REQUEST_SIZE = 10 * 1024 * 1024  # Bytes of a submitted job, source code included
+
+
+class Job:
+    def __init__(self, path=None, source=None, tag=None, strategy=None, versions=None, priority=0):
+        self.id = uuid.uuid4().hex[:12]  # Also the job id of its logs in the log archive
+        self.path = path  # Project directory holding app.py
+        self.source = source  # Or the source code of app.py
+        self.tag = tag or f"job-{self.id}"
+        self.strategy = strategy  # None uses the strategy of the config
+        self.versions = versions  # None uses the versions of the config
+        self.priority = priority  # Higher runs first, jobs of equal priority run in submission order
+        self.status = "queued"  # "queued", "running", then the MatrixResult status: "pass", "fail" or "error"
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+        self.result = None  # MatrixResult.to_dict() once finished
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "tag": self.tag,
+            "priority": self.priority,
+            "status": self.status,
+            "submitted": self.submitted,
+            "queue_time": round((self.started or time.time()) - self.submitted, 3),
+            "run_time": round((self.finished or time.time()) - self.started, 3) if self.started else None,
+            "result": self.result,
+        }
+
+
+class JobQueue:
+    """In-memory priority queue of jobs, blocking get()."""
+
+    def __init__(self):
+        self.heap = []
+        self.order = itertools.count()  # Ties broken by submission order
+        self.condition = threading.Condition()
+        self.closed = False
+
+    def put(self, job):
+        with self.condition:
+            heapq.heappush(self.heap, (-job.priority, next(self.order), job))
+            self.condition.notify()
+
+    def get(self):
+        """Next job, None once the queue is closed."""
+        with self.condition:
+            while not self.heap and not self.closed:
+                self.condition.wait()
+            if self.closed:
+                return None
+            return heapq.heappop(self.heap)[2]
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+    def __len__(self):
+        with self.condition:
+            return len(self.heap)
+
+
+class ValidationService:
+    """Queue of validation jobs run by a fixed pool of worker threads sharing one warm Docker client."""
+
+    def __init__(self, config, workers=2):
+        self.config = config
+        self.workers = max(1, workers)
+        self.queue = JobQueue()
+        self.jobs = {}  # {job id: Job}
+        self.finished = collections.deque()  # Ids of finished jobs, oldest first
+        self.lock = threading.Lock()
+        self.threads = []
+
+    def start(self):
+        """Create the Docker client once and start the workers."""
+        client_manager = get_client_manager(maxPoolSize=2 * self.workers * max(self.config.max_parallel_builds, len(self.config.versions)),
+                                            apiVersion=self.config.docker_api_version)
+        client = client_manager.get_client()  # Connection pool and API version negotiated before the first job, not during it
+        # Base images pulled and warm containers started before the first job
+        warm_up(self.config, client_manager)
+        if self.config.base_images() is not None:
+            # Refreshed on a schedule, jobs build FROM their recorded digests
+            self.config.base_images().start_refresh(client, self.config.versions)
+        for number in range(self.workers):
+            thread = threading.Thread(target=self.work, name=f"validation-worker-{number}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def stop(self):
+        """Stop taking jobs, running jobs are finished first."""
+        self.queue.close()
+        for thread in self.threads:
+            thread.join()
+        if self.config.base_images() is not None:
+            self.config.base_images().stop_refresh()
+
+    def submit(self, job):
+        with self.lock:
+            self.jobs[job.id] = job
+        self.queue.put(job)
+        logger.info(f"Job {job.id} ({job.tag}) queued with priority {job.priority}, {len(self.queue)} waiting.")
+        return job
+
+    def get(self, job_id):
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def stats(self):
+        with self.lock:
+            running = sum(1 for job in self.jobs.values() if job.status == "running")
+        return {"queued": len(self.queue), "running": running, "workers": self.workers}
+
+    def work(self):
+        while True:
+            job = self.queue.get()
+            if job is None:
+                return
+            self.run(job)
+
+    def run(self, job):
+        job.status = "running"
+        job.started = time.time()
+        try:
+            result = validate_project(path=os.path.expanduser(job.path) if job.path else None, source=job.source, versions=job.versions, strategy=job.strategy, tag=job.tag,
+                                      config=self.config, job_id=job.id)
+            job.result = result.to_dict()
+            job.status = result.status()
+        except Exception as e:
+            logger.error(f"Error running job {job.id}: {e}")
+            job.result = {"error": str(e)}
+            job.status = "error"
+        job.finished = time.time()
+        logger.info(f"Job {job.id} ({job.tag}): {job.status} in {job.finished - job.started:.1f}s.")
+        with self.lock:
+            self.finished.append(job.id)
+            while len(self.finished) > MAX_FINISHED_JOBS:
+                self.jobs.pop(self.finished.popleft(), None)
+
+
+def parse_job(body):
+    """Job from a submitted JSON body, raises ValueError when it is invalid."""
+    spec = json.loads(body)
+    if not isinstance(spec, dict):
+        raise ValueError("expected a JSON object")
+    if ("path" in spec) == ("source" in spec):
+        raise ValueError('a job has either a project "path" or the "source" of app.py')
+    versions = spec.get("versions")
+    if versions is not None and (not isinstance(versions, list) or not all(isinstance(version, str) for version in versions)):
+        raise ValueError('"versions" is a list of base images')
+    return Job(spec.get("path"), spec.get("source"), spec.get("tag"), spec.get("strategy"), versions, int(spec.get("priority", 0)))
+
+
+class ValidationRequestHandler(BaseHTTPRequestHandler):
+    """POST /jobs submits a job, GET /jobs/<id> polls it, GET /health reports the queue."""
+
+    service = None  # ValidationService, set by serve()
+
+    def send_json(self, status, data):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        if self.path != "/jobs":
+            self.send_json(404, {"error": f"Unknown path {self.path}"})
+            return
+        length = int(self.headers.get("Content-Length", 0))
+        if length > MAX_REQUEST_SIZE:
+            self.send_json(413, {"error": f"Jobs are limited to {MAX_REQUEST_SIZE} bytes"})
+            return
+        try:
+            job = parse_job(self.rfile.read(length))
+        except (ValueError, TypeError) as e:
+            self.send_json(400, {"error": f"Invalid job: {e}"})
+            return
+        self.service.submit(job)
+        self.send_json(202, job.to_dict())
+
+    def do_GET(self):
+        match = re.fullmatch(r"/jobs/([0-9a-f]+)", self.path)
+        if match:
+            job = self.service.get(match.group(1))
+            if job is None:
+                self.send_json(404, {"error": f"Unknown job {match.group(1)}"})
+            else:
+                self.send_json(200, job.to_dict())
+        elif self.path == "/health":
+            self.send_json(200, self.service.stats())
+        else:
+            self.send_json(404, {"error": f"Unknown path {self.path}"})
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+
+def create_server(service, host="127.0.0.1", port=8765):
+    """HTTP server for the service, not started yet."""
+    handler = type("BoundValidationRequestHandler", (ValidationRequestHandler,), {"service": service})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def serve(config, host="127.0.0.1", port=8765, workers=2):
+    """Run the validation daemon until interrupted."""
+    service = ValidationService(config, workers)
+    service.start()
+    server = create_server(service, host, port)
+    logger.info(f"Validation server listening on http://{host}:{server.server_address[1]} with {service.workers} workers.")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.stop()
@@ -0,0 +1,55 @@
+import contextlib
+import fcntl
+import logging
+import os
+import shutil
+import tempfile
+
+logger = logging.getLogger(__name__)
+
+TMPFS_DIRECTORY = "/dev/shm"
+
+
+class WorkspaceManager:
+    def __init__(self, root="/tmp/executionWorkspace", use_tmpfs=False):
+        if use_tmpfs and os.path.isdir(TMPFS_DIRECTORY):
+            # Same layout, but every file of the job lives in memory
+            root = os.path.join(TMPFS_DIRECTORY, os.path.basename(os.path.normpath(root)))
+        elif use_tmpfs:
+            logger.info(f"{TMPFS_DIRECTORY} is not available, workspaces are created under {root}.")
+        self.root = root  # Every job gets its own directory under it
+
+    def create(self, prefix="job-"):
+        """Create a new, empty workspace no other job uses."""
+        os.makedirs(self.root, exist_ok=True)
+        return tempfile.mkdtemp(prefix=prefix, dir=self.root)
+
+    def cleanup(self, workspace):
+        """Delete a workspace created by create()."""
+        if os.path.exists(workspace):
+            try:
+                shutil.rmtree(workspace)
+                logger.info(f"Temporary directory {workspace} cleaned up.")
+            except Exception as e:
+                logger.error(f"Error cleaning up temporary directory {workspace}: {e}")
+
+    @contextlib.contextmanager
+    def job_workspace(self, prefix="job-"):
+        """Workspace for the duration of a with block, deleted afterwards."""
+        workspace = self.create(prefix)
+        try:
+            yield workspace
+        finally:
+            self.cleanup(workspace)
+
+
+@contextlib.contextmanager
+def locked_workspace(workspace):
+    """Hold an exclusive lock on a long-lived workspace so concurrent jobs of the same project take turns."""
+    os.makedirs(os.path.dirname(os.path.normpath(workspace)), exist_ok=True)
+    with open(os.path.normpath(workspace) + ".lock", "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield workspace
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
@@ -0,0 +1,134 @@
+import hashlib
+import os
+import shutil
+
+
+class SyncStats:
+    def __init__(self):
+        self.copied = 0  # Files added or changed since the previous staging
+        self.deleted = 0  # Files and directories removed from the source since the previous staging
+        self.unchanged = 0  # Files left as they were
+
+    def __str__(self):
+        return f"{self.copied} copied, {self.deleted} deleted, {self.unchanged} unchanged"
+
+
+def file_hash(path):
+    """sha256 of the file content."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def file_changed(source, destination, use_hash=False):
+    """True if the staged copy differs from the source, by size and mtime or by content hash."""
+    try:
+        destination_stat = os.stat(destination)
+    except FileNotFoundError:
+        return True
+    source_stat = os.stat(source)
+    if source_stat.st_size != destination_stat.st_size:
+        return True
+    if use_hash:
+        return file_hash(source) != file_hash(destination)
+    # copy2 keeps the source mtime, so an untouched file has the very same one
+    return source_stat.st_mtime_ns != destination_stat.st_mtime_ns
+
+
+def remove_path(path):
+    """Remove a file or a directory tree."""
+    if os.path.isdir(path) and not os.path.islink(path):
+        shutil.rmtree(path)
+    else:
+        os.remove(path)
+
+
+def included_directories(paths):
+    """Every directory leading to one of the relative paths."""
+    directories = set()
+    for path in paths:
+        parent = os.path.dirname(path)
+        while parent and parent not in directories:
+            directories.add(parent)
+            parent = os.path.dirname(parent)
+    return directories
+
+
+def copy_paths(source, destination, paths):
+    """Copy the relative paths, i.e: the ones a BuildContext keeps, from source to destination. Returns the number of files copied."""
+    copied = 0
+    for path in sorted(paths):
+        source_path = os.path.join(source, path)
+        target = os.path.join(destination, path)
+        if os.path.isdir(source_path):
+            os.makedirs(target, exist_ok=True)
+        elif os.path.isfile(source_path):
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            shutil.copy2(source_path, target)
+            copied += 1
+    return copied
+
+
+def sync_directory(source, destination, use_hash=False, keep=None, include=None):
+    """Make destination a copy of source, copying only added or changed files and deleting removed ones.
+
+    keep(relative_path) protects destination entries that don't come from the source, i.e: the generated Dockerfiles.
+    include is a set of relative paths, when given everything else of the source is treated as if it didn't exist.
+    """
+    stats = SyncStats()
+    os.makedirs(destination, exist_ok=True)
+    directories = None if include is None else included_directories(include) | {path for path in include if os.path.isdir(os.path.join(source, path))}
+    for root, dirs, files in os.walk(source, followlinks=True):
+        relative_root = os.path.relpath(root, source)
+        target_root = os.path.normpath(os.path.join(destination, relative_root))
+        if include is not None:
+            # Pruned here, os.walk never descends into an ignored venv
+            dirs[:] = [name for name in dirs if os.path.normpath(os.path.join(relative_root, name)) in directories]
+            files = [name for name in files if os.path.normpath(os.path.join(relative_root, name)) in include]
+
+        for name in os.listdir(target_root):
+            relative_path = os.path.normpath(os.path.join(relative_root, name))
+            if name not in dirs and name not in files and not (keep and keep(relative_path)):
+                remove_path(os.path.join(target_root, name))
+                stats.deleted += 1
+
+        for name in dirs:
+            target = os.path.join(target_root, name)
+            if os.path.exists(target) and not os.path.isdir(target):
+                os.remove(target)
+            os.makedirs(target, exist_ok=True)
+
+        for name in files:
+            source_path = os.path.join(root, name)
+            target = os.path.join(target_root, name)
+            if os.path.isdir(target):
+                shutil.rmtree(target)
+            if file_changed(source_path, target, use_hash):
+                shutil.copy2(source_path, target)
+                stats.copied += 1
+            else:
+                stats.unchanged += 1
+    return stats
+
+
+def sync_files(files, destination, keep=None):
+    """Make destination hold exactly the in-memory {relative_path: text} files, rewriting only the ones whose content changed."""
+    stats = SyncStats()
+    os.makedirs(destination, exist_ok=True)
+    for name in os.listdir(destination):
+        if name not in files and not (keep and keep(name)):
+            remove_path(os.path.join(destination, name))
+            stats.deleted += 1
+    for name, content in files.items():
+        path = os.path.join(destination, name)
+        if os.path.isfile(path):
+            with open(path) as f:
+                if f.read() == content:
+                    stats.unchanged += 1
+                    continue
+        with open(path, "w") as f:
+            f.write(content)
+        stats.copied += 1
+    return stats
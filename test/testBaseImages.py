@@ -0,0 +1,85 @@
+import json
+import shutil
+import tempfile
+import threading
+import unittest
+import sys
+import os
+from unittest.mock import MagicMock
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from srcs.baseImages import BaseImageRegistry, repository_digest
+
+VERSIONS = ["python:3.8-slim", "python:3.12-slim"]
+
+
+class TestBaseImageRegistry(unittest.TestCase):
+
+    def setUp(self):
+        """Setup a state file and a client whose pulls wait until every version is being pulled."""
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        self.state_file = os.path.join(self.root, "base_images.json")
+        self.barrier = threading.Barrier(len(VERSIONS), timeout=5)
+        self.client = MagicMock()
+        self.client.images.pull.side_effect = self.pull
+
+    def pull(self, version):
+        self.barrier.wait()  # Fails unless the pulls run in parallel
+        image = MagicMock()
+        image.id = f"sha256:{version}"
+        image.attrs = {"RepoDigests": ["other/python@sha256:other", f"python@sha256:{version.split(':')[1]}"]}
+        return image
+
+    def test_warm_pulls_in_parallel_and_pins(self):
+        """Every version is pulled at once and pinned to the digest of its repository."""
+        registry = BaseImageRegistry(self.state_file)
+        pins = registry.warm(self.client, VERSIONS)
+        self.assertEqual(pins, {"python:3.8-slim": "python@sha256:3.8-slim", "python:3.12-slim": "python@sha256:3.12-slim"})
+        with open(self.state_file) as f:
+            self.assertEqual(json.load(f)["python:3.8-slim"]["image_id"], "sha256:python:3.8-slim")
+
+    def test_fresh_digests_are_not_pulled_again(self):
+        """Recorded digests are reused by later processes until the refresh interval passes."""
+        BaseImageRegistry(self.state_file).warm(self.client, VERSIONS)
+        self.client.images.pull.reset_mock()
+        registry = BaseImageRegistry(self.state_file)
+        self.assertEqual(len(registry.warm(self.client, VERSIONS)), 2)
+        self.client.images.pull.assert_not_called()
+        registry.refresh_interval = 0
+        registry.warm(self.client, VERSIONS)
+        self.assertEqual(self.client.images.pull.call_count, 2)
+
+    def test_failed_pull_is_not_pinned(self):
+        """A version that can't be pulled keeps building FROM its tag."""
+        self.client.images.pull.side_effect = lambda version: self.pull(version) if version == "python:3.8-slim" else 1 / 0
+        self.barrier = threading.Barrier(1)
+        registry = BaseImageRegistry(self.state_file)
+        self.assertEqual(registry.warm(self.client, VERSIONS), {"python:3.8-slim": "python@sha256:3.8-slim"})
+        self.assertTrue(registry.stale("python:3.12-slim"))
+
+    def test_scheduled_refresh(self):
+        """The refresh thread pulls the base images again every interval until stopped."""
+        refreshed = threading.Event()
+        self.barrier = threading.Barrier(1)
+
+        def pull(version):
+            refreshed.set()
+            return self.pull(version)
+
+        self.client.images.pull.side_effect = pull
+        registry = BaseImageRegistry(self.state_file, refreshInterval=0.01)
+        registry.start_refresh(self.client, ["python:3.12-slim"])
+        self.assertTrue(refreshed.wait(5))
+        registry.stop_refresh()
+        self.assertEqual(registry.pins(["python:3.12-slim"]), {"python:3.12-slim": "python@sha256:3.12-slim"})
+
+    def test_repository_digest(self):
+        """Images without a registry digest, i.e: built locally, can't be pinned."""
+        image = MagicMock()
+        image.attrs = {"RepoDigests": []}
+        self.assertIsNone(repository_digest(image, "python:3.12-slim"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+import io
+import json
+import unittest
+import sys
+import os
+import shutil
+import tempfile
+from unittest.mock import patch
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from srcs.batchRunner import parse_manifest_line, read_manifest, run_batch
+from srcs.matrixExecutor import VersionResult
+from srcs.projectValidator import MatrixResult, ValidationConfig
+
+
+def fake_validate_project(path=None, source=None, versions=None, strategy=None, tag="python-app", config=None, job_id=None):
+    passed = source is not None or path.endswith("good")
+    results = {"python:3.12-slim": VersionResult("python:3.12-slim", passed, 1.0, f"{tag}-python3.12-slim")}
+    return MatrixResult(tag, strategy or config.strategy, "job", results)
+
+
+class TestBatchRunner(unittest.TestCase):
+
+    def setUp(self):
+        """Setup a manifest with a project, a snippet file and two broken lines."""
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        snippet = os.path.join(self.root, "snippet.py")
+        with open(snippet, "w") as f:
+            f.write("print('hi')")
+        self.manifest = os.path.join(self.root, "manifest.jsonl")
+        with open(self.manifest, "w") as f:
+            f.write(json.dumps({"path": "/projects/good", "tag": "good", "strategy": "race"}) + "\n")
+            f.write("\n# comment\n")
+            f.write(json.dumps({"path": "/projects/bad", "tag": "bad"}) + "\n")
+            f.write(json.dumps({"source_file": snippet, "tag": "snippet"}) + "\n")
+            f.write("not json\n")
+            f.write(json.dumps({"tag": "nothing"}) + "\n")
+        self.config = ValidationConfig(versions=["python:3.12-slim"], base_image_file=None, validation_mode="image")
+
+    def test_read_manifest(self):
+        """Every job line is read, broken lines become jobs with an error."""
+        jobs = read_manifest(self.manifest)
+        self.assertEqual([job.line for job in jobs], [1, 4, 5, 6, 7])
+        self.assertEqual(jobs[0].strategy, "race")
+        self.assertIsNotNone(jobs[3].error)
+        self.assertIsNotNone(jobs[4].error)
+
+    def test_manifest_types_checked(self):
+        """A line with a field of the wrong type becomes a job with an error, a string of versions isn't split into characters."""
+        for line in ['{"path": "/p", "versions": "python:3.12-slim"}', '{"path": "/p", "versions": [3.12]}', '{"path": "/p", "strategy": 1}',
+                     '{"path": "/p", "tag": ["a"]}', '{"path": 1}']:
+            job = parse_manifest_line(1, line)
+            self.assertIsNotNone(job.error, line)
+            self.assertIsNone(job.versions)
+        self.assertIsNone(parse_manifest_line(1, '{"path": "/p", "versions": ["python:3.12-slim"], "strategy": "race", "tag": "a"}').error)
+
+    def test_json_lines_results(self):
+        """One JSON line per job, in any order, with the job's manifest line."""
+        output = io.StringIO()
+        with patch("srcs.batchRunner.validate_project", side_effect=fake_validate_project), patch("srcs.batchRunner.get_client_manager"):
+            counts = run_batch(read_manifest(self.manifest), self.config, max_jobs=3, output=output)
+        records = {record["line"]: record for record in map(json.loads, output.getvalue().splitlines())}
+        self.assertEqual(sorted(records), [1, 4, 5, 6, 7])
+        self.assertEqual(records[1]["status"], "pass")
+        self.assertEqual(records[1]["strategy"], "race")
+        self.assertEqual(records[4]["status"], "fail")
+        self.assertEqual(records[5]["status"], "pass")
+        self.assertEqual(records[6]["status"], "error")
+        self.assertEqual(counts, {"pass": 2, "fail": 1, "error": 2})
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,113 @@
+import io
+import unittest
+import sys
+import os
+import shutil
+import tarfile
+import tempfile
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from srcs.buildContext import BuildContext
+
+
+class TestBuildContext(unittest.TestCase):
+
+    def setUp(self):
+        """Setup a workspace with a source file, a package and a per-version Dockerfile."""
+        self.workspace = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.workspace)
+        os.makedirs(os.path.join(self.workspace, "pkg"))
+        for path, content in [("app.py", "print('hello')"), ("pkg/util.py", "X = 1"), ("Dockerfile.python3.8-slim", "FROM python:3.8-slim")]:
+            with open(os.path.join(self.workspace, path), "w") as f:
+                f.write(content)
+        self.context = BuildContext(self.workspace)
+        self.addCleanup(self.context.cleanup)
+
+    def read_context(self, dockerfile_name, dockerfile_content, chunk_size):
+        reader = self.context.open(dockerfile_name, dockerfile_content)
+        data = b""
+        for chunk in iter(lambda: reader.read(chunk_size), b""):
+            data += chunk
+        reader.close()
+        self.assertEqual(len(data), len(reader))
+        return self.members(data)
+
+    def members(self, data):
+        with tarfile.open(fileobj=io.BytesIO(data)) as tar:
+            return {member.name: (tar.extractfile(member).read() if member.isfile() else None) for member in tar.getmembers()}
+
+    def test_overlay_adds_only_this_versions_dockerfile(self):
+        """The shared tar holds the sources, each open() adds its own Dockerfile."""
+        members = self.read_context("Dockerfile.python3.12-slim", "FROM python:3.12-slim", 1000)
+        self.assertEqual(members["app.py"], b"print('hello')")
+        self.assertEqual(members["pkg/util.py"], b"X = 1")
+        self.assertEqual(members["Dockerfile.python3.12-slim"], b"FROM python:3.12-slim")
+        self.assertNotIn("Dockerfile.python3.8-slim", members)
+
+    def test_tar_built_once(self):
+        """Every version reuses the same base tar."""
+        self.read_context("Dockerfile.a", "FROM a", -1)
+        tar_path = self.context.tar_path
+        self.read_context("Dockerfile.b", "FROM b", 512)
+        self.assertEqual(tar_path, self.context.tar_path)
+
+    def test_streamed_context_from_directory(self):
+        """A streamed context reads the directory directly and overlays the in-memory files."""
+        context = BuildContext(self.workspace, {"requirements.txt": ""}, spool=False)
+        members = self.members(b"".join(context.open("Dockerfile.python3.12-slim", "FROM python:3.12-slim")))
+        self.assertEqual(members["app.py"], b"print('hello')")
+        self.assertEqual(members["requirements.txt"], b"")
+        self.assertEqual(members["Dockerfile.python3.12-slim"], b"FROM python:3.12-slim")
+        self.assertIsNone(context.tar_path)
+
+    def test_streamed_context_from_source(self):
+        """Typed source code is streamed without any directory."""
+        context = BuildContext(files={"app.py": "print('hi')", "requirements.txt": ""}, spool=False)
+        self.assertTrue(context.has_file("app.py"))
+        members = self.members(b"".join(context.open("Dockerfile", "FROM python:3.12-slim")))
+        self.assertEqual(members["app.py"], b"print('hi')")
+
+    def test_content_hash_ignores_mtime(self):
+        """The hash only depends on paths and contents."""
+        before = BuildContext(self.workspace).content_hash()
+        os.utime(os.path.join(self.workspace, "app.py"), (0, 0))
+        self.assertEqual(before, BuildContext(self.workspace).content_hash())
+
+    def write(self, path, content):
+        os.makedirs(os.path.dirname(os.path.join(self.workspace, path)), exist_ok=True)
+        with open(os.path.join(self.workspace, path), "w") as f:
+            f.write(content)
+
+    def test_default_ignores(self):
+        """VCS data, bytecode and virtualenvs under any name stay out of the context."""
+        self.write(".git/HEAD", "ref: refs/heads/main")
+        self.write("pkg/__pycache__/util.cpython-312.pyc", "")
+        self.write("myenv/pyvenv.cfg", "home = /usr/bin")
+        self.write("myenv/lib/site.py", "")
+        paths = BuildContext(self.workspace).directory_paths()
+        self.assertIn("pkg/util.py", paths)
+        self.assertFalse([path for path in paths if path.startswith((".git", "myenv")) or "__pycache__" in path])
+        self.assertIn("myenv/pyvenv.cfg", BuildContext(self.workspace, use_default_ignores=False).directory_paths())
+
+    def test_dockerignore_overrides_defaults(self):
+        """The user's .dockerignore is applied after the defaults."""
+        self.write("venv/keep.py", "")
+        self.write("data.csv", "1,2")
+        self.write(".dockerignore", "!venv\n!venv/keep.py\ndata.csv\n")
+        paths = BuildContext(self.workspace).directory_paths()
+        self.assertIn("venv/keep.py", paths)
+        self.assertNotIn("data.csv", paths)
+
+    def test_report(self):
+        """The report sums file sizes per top-level path, largest first."""
+        self.write("data/big.bin", "x" * 5000)
+        report = BuildContext(self.workspace, {"requirements.txt": ""}).report(top_n=2)
+        self.assertEqual(report.largest[0], ("data", 5000))
+        self.assertEqual(len(report.largest), 2)
+        self.assertEqual(report.file_count, 4)
+        self.assertEqual(report.total_size, 5000 + len("print('hello')") + len("X = 1"))
+        self.assertTrue(report.exceeds(1000))
+        self.assertFalse(report.exceeds(None))
+
+if __name__ == "__main__":
+    unittest.main()
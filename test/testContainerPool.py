@@ -0,0 +1,121 @@
+import unittest
+import sys
+import os
+from unittest.mock import MagicMock
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from srcs.containerPool import APP_DIRECTORY, ContainerPool
+from srcs.pythonDockerHandler import DockerHandler
+
+
+class TestContainerPool(unittest.TestCase):
+
+    def setUp(self):
+        """Setup a pool on a client starting a new mocked container per run()."""
+        self.client = MagicMock()
+        self.containers = []
+
+        def run(image, command, **kwargs):
+            container = MagicMock()
+            container.id = f"container-{len(self.containers)}"
+            container.exec_run.return_value = (0, b"")
+            container.diff.return_value = None
+            container.put_archive.return_value = True
+            container.top.return_value = {"Titles": ["UID", "PID", "PPID", "C", "STIME", "TTY", "TIME", "CMD"],
+                                          "Processes": [["root", "1", "0", "0", "10:00", "?", "00:00:00", " ".join(command)]]}
+            self.containers.append(container)
+            return container
+
+        self.client.containers.run.side_effect = run
+        self.pool = ContainerPool(self.client, maxIdle=1)
+
+    def test_containers_are_reused_after_reset(self):
+        """A released container is reset and handed out again, no new container is started."""
+        pooled = self.pool.acquire("python:3.12-slim")
+        self.pool.release(pooled)
+        self.assertIs(self.pool.acquire("python:3.12-slim"), pooled)
+        self.assertEqual(len(self.containers), 1)
+        pooled.container.exec_run.assert_called_with(["rm", "-rf", APP_DIRECTORY])
+        self.assertEqual(self.client.containers.run.call_args.kwargs["auto_remove"], True)
+
+    def test_changed_container_is_discarded(self):
+        """A container the job changed outside the app directory is killed instead of reused."""
+        pooled = self.pool.acquire("python:3.12-slim")
+        pooled.container.diff.return_value = [{"Path": "/usr/local/lib/python3.12/site-packages", "Kind": 0}]
+        self.pool.release(pooled)
+        pooled.container.kill.assert_called_once()
+        self.assertIsNot(self.pool.acquire("python:3.12-slim"), pooled)
+
+    def test_container_with_leftover_process_is_discarded(self):
+        """A container still running a process the app forked is killed instead of reused."""
+        pooled = self.pool.acquire("python:3.12-slim")
+        pooled.container.top.return_value["Processes"].append(["root", "42", "1", "0", "10:00", "?", "00:00:00", "python worker.py"])
+        self.pool.release(pooled)
+        pooled.container.kill.assert_called_once()
+        self.assertIsNot(self.pool.acquire("python:3.12-slim"), pooled)
+
+    def test_pool_keeps_max_idle(self):
+        """Containers beyond max_idle per image are killed when released, images have their own containers."""
+        first, second = self.pool.acquire("python:3.12-slim"), self.pool.acquire("python:3.12-slim")
+        self.pool.release(first)
+        self.pool.release(second)
+        second.container.kill.assert_called_once()
+        self.assertIsNot(self.pool.acquire("python:3.8-slim").container, first.container)
+
+    def test_expired_containers_are_replaced(self):
+        """A container past half its lifetime is not handed out."""
+        pooled = self.pool.acquire("python:3.12-slim")
+        self.pool.release(pooled)
+        pooled.started -= self.pool.lifetime
+        self.assertIsNot(self.pool.acquire("python:3.12-slim"), pooled)
+        pooled.container.kill.assert_called_once()
+
+    def test_warm_and_close(self):
+        """warm() starts one idle container per image, close() kills the idle ones."""
+        self.pool.warm(["python:3.8-slim", "python:3.12-slim"])
+        self.assertEqual(len(self.containers), 2)
+        self.pool.close()
+        for container in self.containers:
+            container.kill.assert_called_once()
+
+    def test_run_app(self):
+        """requirements.txt goes to a directory the reset deletes and app.py gets the run timeout."""
+        pooled = self.pool.acquire("python:3.12-slim")
+        self.client.api.exec_create.return_value = {"Id": "exec"}
+        self.pool.run_app(pooled, 30, install_requirements=True)
+        script = self.client.api.exec_create.call_args.args[1][2]
+        self.assertIn("--target /app/.packages -r requirements.txt", script)
+        self.assertTrue(script.endswith("exec timeout -s KILL 30 python app.py"))
+        self.client.api.exec_start.assert_called_once_with("exec", stream=True)
+
+
+class TestDockerHandlerValidateInPool(unittest.TestCase):
+
+    def setUp(self):
+        """Setup a handler and a mocked pool whose exec prints two chunks."""
+        self.pool = MagicMock()
+        self.pooled = self.pool.acquire.return_value
+        self.pool.run_app.return_value = ("exec", iter([b"hello ", b"world\n"]))
+        self.handler = DockerHandler("FROM python@sha256:abc\nCOPY . /app", "myapp-python3.12-slim", client=MagicMock(), runTimeout=5)
+
+    def test_pass(self):
+        """The code runs in a container of the pinned base image, which goes back to the pool."""
+        self.pool.exit_code.return_value = 0
+        with self.assertLogs("srcs.pythonDockerHandler", level="INFO") as logs:
+            self.assertTrue(self.handler.validate_in_pool(self.pool, b"tar", install_requirements=True))
+        self.pool.acquire.assert_called_once_with("python@sha256:abc")
+        self.pool.copy_in.assert_called_once_with(self.pooled, b"tar")
+        self.pool.run_app.assert_called_once_with(self.pooled, 5, True)
+        self.pool.release.assert_called_once_with(self.pooled)
+        self.assertIn("hello world", "\n".join(logs.output))
+        self.assertIsNone(self.handler.container)
+
+    def test_fail(self):
+        """A non-zero exit code fails the version, the container still goes back to the pool."""
+        self.pool.exit_code.return_value = 137
+        self.assertFalse(self.handler.validate_in_pool(self.pool, b"tar"))
+        self.pool.release.assert_called_once_with(self.pooled)
+
+
+if __name__ == '__main__':
+    unittest.main()
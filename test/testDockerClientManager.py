@@ -0,0 +1,33 @@
+import unittest
+import sys
+import os
+from unittest.mock import patch, MagicMock
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from srcs.dockerClientManager import get_client_manager
+
+
+@patch("srcs.dockerClientManager._manager", None)
+@patch("srcs.dockerClientManager.docker.from_env", side_effect=lambda **kwargs: MagicMock())
+class TestGetClientManager(unittest.TestCase):
+
+    def test_pool_grows_to_the_largest_size(self, from_env):
+        """A caller asking for a larger pool gets a client recreated with it, a smaller size keeps the current client."""
+        manager = get_client_manager(maxPoolSize=2, apiVersion="1.43")
+        first = manager.get_client()
+        self.assertIs(get_client_manager(maxPoolSize=1), manager)
+        self.assertIs(manager.get_client(), first)
+        self.assertIs(get_client_manager(maxPoolSize=8), manager)
+        self.assertIsNot(manager.get_client(), first)
+        from_env.assert_called_with(version=first.api.api_version, max_pool_size=8)
+
+    def test_other_api_version_is_logged(self, from_env):
+        """The API version of the first call is kept, a different one is reported."""
+        get_client_manager(apiVersion="1.43")
+        with self.assertLogs("srcs.dockerClientManager", level="WARNING") as logs:
+            self.assertEqual(get_client_manager(apiVersion="1.41").api_version, "1.43")
+        self.assertIn("1.41 ignored", logs.output[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,9 +1,10 @@
 import unittest
 import docker
+import requests
 import sys
 import os
 from io import StringIO
-from unittest.mock import patch
+from unittest.mock import patch, MagicMock
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from main import DockerHandler  # Assuming DockerHandler is in main.py
@@ -44,5 +45,77 @@ class TestDockerHandler(unittest.TestCase):
         result = invalid_docker_handler.build_image()
         self.assertFalse(result)  # Expecting the build to fail
 
+
+class TestDockerHandlerStreamingBuild(unittest.TestCase):
+
+    def setUp(self):
+        """Setup a DockerHandler on a mocked client."""
+        self.client = MagicMock()
+        self.client.api.hooks = {"response": []}
+        self.docker_handler = DockerHandler("FROM python:3.12-slim", "python-docker-test", client=self.client, buildLogCallback=lambda handler, text: None)
+
+    def test_build_image_success(self):
+        """The build passes when the stream reports the image id."""
+        self.client.api.build.return_value = (chunk for chunk in [b'{"stream": "Step 1/1 : FROM python:3.12-slim\\n"}\r\n{"aux": ', b'{"ID": "sha256:abc"}}\r\n'])
+        self.assertTrue(self.docker_handler.build_image("/tmp"))
+
+    def test_container_runs_the_built_image(self):
+        """The container runs the image id the build reported, not whatever the tag points to since."""
+        self.client.api.build.return_value = (chunk for chunk in [b'{"aux": {"ID": "sha256:abc"}}\r\n'])
+        self.assertTrue(self.docker_handler.build_image("/tmp"))
+        self.docker_handler.run_container()
+        self.assertEqual(self.client.containers.run.call_args.args[0], "sha256:abc")
+
+    def test_build_image_stops_at_first_error(self):
+        """The build fails on the first error chunk without reading the rest of the stream."""
+        consumed = []
+
+        def chunks():
+            for chunk in [b'{"stream": "Step 1/2\\n"}\r\n', b'{"errorDetail": {"message": "boom"}, "error": "boom"}\r\n', b'{"stream": "never read\\n"}\r\n']:
+                consumed.append(chunk)
+                yield chunk
+
+        self.client.api.build.return_value = chunks()
+        self.assertFalse(self.docker_handler.build_image("/tmp"))
+        self.assertEqual(len(consumed), 2)
+
+    def test_pull_base_image_only_when_missing(self):
+        """The base image of the FROM line is pulled only when it isn't local."""
+        handler = DockerHandler("# comment\nFROM --platform=linux/amd64 python:3.12-slim\nCOPY . .", "python-docker-test", client=self.client)
+        self.assertEqual(handler.base_image(), "python:3.12-slim")
+        self.assertTrue(handler.pull_base_image())
+        self.client.images.pull.assert_not_called()
+        self.client.images.get.side_effect = docker.errors.ImageNotFound("missing")
+        self.assertTrue(handler.pull_base_image())
+        self.client.images.pull.assert_called_once_with("python:3.12-slim")
+
+
+class TestDockerHandlerValidateContainer(unittest.TestCase):
+
+    def setUp(self):
+        """Setup a DockerHandler on a mocked client and a mocked container."""
+        self.docker_handler = DockerHandler("FROM python:3.12-slim", "python-docker-test", client=MagicMock(), runTimeout=5)
+        self.container = MagicMock()
+        self.container.logs.return_value = b"Test Passed"
+
+    def test_validate_container_exit_code_zero(self):
+        """The container passes when it exits with code 0 and is force removed without a stop."""
+        self.container.wait.return_value = {"StatusCode": 0}
+        self.assertTrue(self.docker_handler.validate_container(self.container))
+        self.container.wait.assert_called_once_with(timeout=5)
+        self.container.remove.assert_called_once_with(force=True)
+        self.container.stop.assert_not_called()
+
+    def test_validate_container_non_zero_exit_code(self):
+        """A non-zero exit code fails the validation."""
+        self.container.wait.return_value = {"StatusCode": 1}
+        self.assertFalse(self.docker_handler.validate_container(self.container))
+
+    def test_validate_container_timeout(self):
+        """A container that doesn't exit before the deadline fails and is removed."""
+        self.container.wait.side_effect = requests.exceptions.ReadTimeout()
+        self.assertFalse(self.docker_handler.validate_container(self.container))
+        self.container.remove.assert_called_once_with(force=True)
+
 if __name__ == "__main__":
     unittest.main()
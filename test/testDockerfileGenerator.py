@@ -0,0 +1,65 @@
+import unittest
+import sys
+import os
+import shutil
+import tempfile
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from srcs.dockerfileGenerator import generate_dockerfile, generate_multistage_dockerfile, version_dockerfile
+
+
+class TestDockerfileGenerator(unittest.TestCase):
+
+    def setUp(self):
+        """Setup a workspace with an empty requirements.txt."""
+        self.workspace = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.workspace)
+        self.write_requirements("")
+
+    def write_requirements(self, content):
+        with open(os.path.join(self.workspace, "requirements.txt"), "w") as f:
+            f.write(content)
+
+    def test_no_pip_install_for_empty_requirements(self):
+        """An empty or comment-only requirements.txt doesn't generate a pip install step."""
+        self.write_requirements("# nothing yet\n\n")
+        dockerfile = generate_dockerfile(self.workspace)
+        self.assertNotIn("pip install", dockerfile)
+        self.assertIn("FROM {version}", dockerfile)
+
+    def test_requirements_installed_before_sources_are_copied(self):
+        """requirements.txt is copied and installed before the sources so source edits keep the dependency layer."""
+        self.write_requirements("requests==2.32.3\n")
+        dockerfile = generate_dockerfile(self.workspace, "python:3.12-slim")
+        self.assertIn("FROM python:3.12-slim", dockerfile)
+        self.assertLess(dockerfile.index("COPY requirements.txt"), dockerfile.index("RUN pip install --no-cache-dir"))
+        self.assertLess(dockerfile.index("RUN pip install --no-cache-dir"), dockerfile.index("COPY . /app"))
+
+    def test_pip_cache_mount(self):
+        """With BuildKit pip keeps its cache in a cache mount per Python version."""
+        self.write_requirements("requests==2.32.3\n")
+        dockerfile = generate_dockerfile(self.workspace, "python:3.12-slim", pip_cache=True)
+        self.assertIn("RUN --mount=type=cache,id=pip-python:3.12-slim,target=/root/.cache/pip", dockerfile)
+        self.assertNotIn("PIP_NO_CACHE_DIR", dockerfile)
+
+    def test_multistage_dockerfile(self):
+        """Every version gets its own named stage."""
+        dockerfile = generate_multistage_dockerfile(generate_dockerfile(self.workspace), ["python:3.8-slim", "python:3.12-slim"])
+        self.assertIn("FROM python:3.8-slim AS python3.8-slim", dockerfile)
+        self.assertIn("FROM python:3.12-slim AS python3.12-slim", dockerfile)
+        self.assertNotIn("{version}", dockerfile)
+
+    def test_pinned_base_image(self):
+        """A pinned FROM line names the digest, the pip cache stays per version."""
+        self.write_requirements("requests==2.32.3\n")
+        template = generate_dockerfile(self.workspace, pip_cache=True)
+        dockerfile = version_dockerfile(template, "python:3.12-slim", "python@sha256:abc")
+        self.assertIn("FROM python@sha256:abc\n", dockerfile)
+        self.assertIn("id=pip-python:3.12-slim,", dockerfile)
+        self.assertIn("FROM python:3.8-slim\n", version_dockerfile(template, "python:3.8-slim"))
+        dockerfile = generate_multistage_dockerfile(template, ["python:3.8-slim", "python:3.12-slim"], {"python:3.12-slim": "python@sha256:abc"})
+        self.assertIn("FROM python:3.8-slim AS python3.8-slim", dockerfile)
+        self.assertIn("FROM python@sha256:abc AS python3.12-slim", dockerfile)
+
+if __name__ == "__main__":
+    unittest.main()
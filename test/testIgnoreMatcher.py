@@ -0,0 +1,73 @@
+import unittest
+import sys
+import os
+import shutil
+import tempfile
+from docker.utils.build import exclude_paths as docker_exclude_paths
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from srcs.ignoreMatcher import IgnoreMatcher, exclude_paths
+
+TREE = [
+    "app.py", "Dockerfile", ".dockerignore", "README.md", "data.CSV", "notes.txt",
+    "pkg/__init__.py", "pkg/util.py", "pkg/__pycache__/util.cpython-312.pyc", "pkg/sub/deep/module.py", "pkg/sub/deep/Data.bin",
+    "venv/bin/python", "venv/lib/site.py", "venv/keep.py",
+    "node_modules/left-pad/index.js", "web/node_modules/react/index.js",
+    ".git/HEAD", ".git/objects/ab/cdef", "docs/a.md", "docs/b.txt", "docs/img/logo.png",
+    "build/out.o", "build/keep/me.txt", "x1.log", "x22.log", "[weird].py",
+]
+
+PATTERN_SETS = [
+    [],
+    ["*.md"],
+    [".git", "**/__pycache__", "**/*.py[cod]", "venv", "**/node_modules"],
+    ["venv", "!venv/keep.py"],
+    ["build", "!build/keep"],
+    ["docs/**", "!docs/*.md"],
+    ["**/*.bin", "*.csv"],
+    ["pkg", "!pkg/sub", "pkg/sub/deep/*.py"],
+    ["x?.log", "[!a-m]*.txt"],
+    ["*", "!app.py", "!pkg"],
+    ["/docs/", "./README.md", "pkg/../notes.txt", "."],
+    ["**"],
+    ["**/deep", "!**/module.py"],
+    ["[weird].py", "\\[weird].py", "pkg/sub/"],
+    ["!app.py", "app.py", "#comment", "  data.csv  "],
+]
+
+
+class TestIgnoreMatcher(unittest.TestCase):
+
+    def setUp(self):
+        """Setup a project tree with nested directories, VCS data and a virtualenv."""
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        for path in TREE:
+            full_path = os.path.join(self.root, path)
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            with open(full_path, "w") as f:
+                f.write(path)
+        os.symlink(os.path.join(self.root, "pkg"), os.path.join(self.root, "link"))
+
+    def test_same_paths_as_docker(self):
+        """The compiled matcher keeps exactly the paths docker's PatternMatcher keeps."""
+        for patterns in PATTERN_SETS:
+            with self.subTest(patterns=patterns):
+                self.assertEqual(exclude_paths(self.root, patterns), docker_exclude_paths(self.root, list(patterns)))
+
+    def test_dockerfile_always_included(self):
+        """Like docker, the Dockerfile is kept even when a pattern excludes it."""
+        self.assertIn("Dockerfile", exclude_paths(self.root, ["Dockerfile*"]))
+        self.assertNotIn("Dockerfile", exclude_paths(self.root, ["Dockerfile*"], "Dockerfile.custom"))
+
+    def test_last_pattern_wins(self):
+        """A later pattern overrides an earlier one, parent directories match too."""
+        matcher = IgnoreMatcher(["docs", "!docs/a.md", "docs/*.md"])
+        self.assertTrue(matcher.matches("docs/a.md"))
+        self.assertTrue(matcher.matches("docs/img/logo.png"))
+        self.assertFalse(matcher.matches("app.py"))
+        self.assertTrue(matcher.has_exception_under("docs"))
+        self.assertFalse(matcher.has_exception_under("build"))
+
+if __name__ == "__main__":
+    unittest.main()
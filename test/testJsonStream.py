@@ -0,0 +1,48 @@
+import unittest
+import sys
+import os
+from docker.errors import StreamParseError
+from docker.utils.json_stream import json_stream as docker_json_stream
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from srcs.jsonStream import JsonStreamDecoder, json_stream
+
+MESSAGES = b'{"stream": "Step 1/3 : FROM python:3.12-slim\\n"}\r\n{"stream": "caf\xc3\xa9 \xe2\x9c\x93\\n"}\r\n\r\n{"aux": {"ID": "sha256:abc"}}{"stream": "done"}\r\n{"status": "tail"}'
+
+
+class TestJsonStream(unittest.TestCase):
+
+    def test_same_messages_as_docker_for_any_chunking(self):
+        """Messages split anywhere, even inside a multi-byte character, decode like docker's json_stream."""
+        expected = list(docker_json_stream([MESSAGES]))
+        for size in [1, 2, 3, 7, 64, len(MESSAGES)]:
+            with self.subTest(size=size):
+                chunks = [MESSAGES[i:i + size] for i in range(0, len(MESSAGES), size)]
+                self.assertEqual(list(json_stream(chunks)), expected)
+
+    def test_messages_yielded_as_soon_as_complete(self):
+        """A message is returned by the feed that completes its line."""
+        decoder = JsonStreamDecoder()
+        self.assertEqual(decoder.feed(b'{"stream": "a'), [])
+        self.assertEqual(decoder.feed(b'"}\r\n{"str'), [{"stream": "a"}])
+        self.assertEqual(decoder.feed('eam": "b"}\n'), [{"stream": "b"}])
+
+    def test_message_spanning_lines(self):
+        """Pretty printed JSON is parsed once its last line arrives."""
+        self.assertEqual(list(json_stream([b'{\n"status":\n "ok"\n}\n'])), [{"status": "ok"}])
+
+    def test_buffer_compacted(self):
+        """Decoded bytes don't accumulate over a long build."""
+        decoder = JsonStreamDecoder()
+        line = b'{"stream": "' + b"x" * 1000 + b'"}\r\n'
+        for _ in range(1000):
+            self.assertEqual(len(decoder.feed(line)), 1)
+        self.assertLess(len(decoder.buffer), 200 * len(line))
+
+    def test_truncated_message(self):
+        """A stream ending in the middle of a message raises docker's StreamParseError."""
+        with self.assertRaises(StreamParseError):
+            list(json_stream([b'{"stream": "a"}\n{"stre']))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,60 @@
+import unittest
+import sys
+import os
+import shutil
+import tempfile
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from srcs.logArchive import ARCHIVE_FILE, LogArchive
+
+
+def pip_log(version):
+    """Build output shared by every version, with a version specific header and footer."""
+    lines = [f"Step 1/6 : FROM {version}\n"]
+    lines += [f"Collecting package-{i}==1.{i}\n  Downloading package-{i}-1.{i}-py3-none-any.whl ({i} kB)\n" for i in range(2000)]
+    lines += [f"Successfully built for {version}\n"]
+    return "".join(lines).encode()
+
+
+class TestLogArchive(unittest.TestCase):
+
+    def setUp(self):
+        """Setup an empty archive."""
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.archive = LogArchive(self.directory)
+
+    def archive_log(self, job_id, version, kind, data, write_size=1000):
+        writer = self.archive.writer(job_id, version, kind)
+        for i in range(0, len(data), write_size):
+            writer.write(data[i:i + write_size])
+        writer.close()
+
+    def test_read_back_one_version(self):
+        """Each log is read back exactly, from a reopened archive too."""
+        for version in ["python:3.8-slim", "python:3.9-slim"]:
+            self.archive_log("job1", version, "build", pip_log(version))
+        self.archive_log("job1", "python:3.9-slim", "run", b"hello\n")
+        reopened = LogArchive(self.directory)
+        self.assertEqual(reopened.read("job1", "python:3.8-slim", "build"), pip_log("python:3.8-slim"))
+        self.assertEqual(reopened.read("job1", "python:3.9-slim", "run"), b"hello\n")
+        self.assertIsNone(reopened.read("job1", "python:3.10-slim", "run"))
+        self.assertEqual(len(reopened.job_records("job1")), 3)
+
+    def test_empty_log_on_a_fresh_archive(self):
+        """A log that got no output reads back empty, before the archive file was ever written."""
+        self.archive_log("job1", "python:3.8-slim", "run", b"")
+        self.assertFalse(os.path.exists(os.path.join(self.directory, ARCHIVE_FILE)))
+        self.assertEqual(LogArchive(self.directory).read("job1", "python:3.8-slim", "run"), b"")
+
+    def test_identical_chunks_stored_once(self):
+        """The output the versions share takes no extra space."""
+        self.archive_log("job1", "python:3.8-slim", "build", pip_log("python:3.8-slim"))
+        size = os.path.getsize(os.path.join(self.directory, ARCHIVE_FILE))
+        self.archive_log("job1", "python:3.9-slim", "build", pip_log("python:3.9-slim"), write_size=333)
+        self.archive_log("job2", "python:3.8-slim", "build", pip_log("python:3.8-slim"))
+        self.assertLess(os.path.getsize(os.path.join(self.directory, ARCHIVE_FILE)), size * 1.2)
+        self.assertLess(size, len(pip_log("python:3.8-slim")) / 2)
+
+if __name__ == "__main__":
+    unittest.main()
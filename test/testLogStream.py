@@ -0,0 +1,79 @@
+import unittest
+import sys
+import os
+import shutil
+import struct
+import tempfile
+from unittest.mock import MagicMock
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from srcs.logStream import FrameDemuxer, LogTail, stream_container_logs
+from srcs.pythonDockerHandler import DockerHandler
+
+
+def frame(stream_type, payload):
+    return struct.pack(">BxxxL", stream_type, len(payload)) + payload
+
+
+class TestLogStream(unittest.TestCase):
+
+    def setUp(self):
+        """Setup a multiplexed log of many stdout and stderr frames."""
+        self.frames = [frame(1 if i % 3 else 2, f"line {i}\n".encode()) for i in range(1000)]
+        self.raw = b"".join(self.frames)
+        self.expected = b"".join(f"line {i}\n".encode() for i in range(1000))
+
+    def test_demux_any_chunking(self):
+        """Frames split anywhere, even inside a header, give back every payload in order."""
+        for size in [1, 5, 8, 13, 4096]:
+            with self.subTest(size=size):
+                demuxer = FrameDemuxer()
+                pieces = []
+                for i in range(0, len(self.raw), size):
+                    pieces += demuxer.feed(self.raw[i:i + size])
+                self.assertEqual(b"".join(payload for _, payload in pieces), self.expected)
+                self.assertEqual({stream for stream, _ in pieces}, {"stdout", "stderr"})
+
+    def test_tail_is_bounded(self):
+        """Only the last bytes are kept, starting at a line."""
+        tail = LogTail(100)
+        for i in range(1000):
+            tail.append(f"line {i}\n".encode())
+        self.assertTrue(tail.truncated())
+        self.assertLess(tail.size, 200)
+        self.assertTrue(tail.text().startswith("line "))
+        self.assertTrue(tail.text().endswith("line 999\n"))
+
+    def test_tail_wraps_around(self):
+        """Writes larger than the space left wrap to the start of the ring, oldest bytes first."""
+        tail = LogTail(10)
+        tail.append(b"abcdefg")
+        tail.append(b"hijkl")
+        self.assertEqual(tail.contents(), b"cdefghijkl")
+        tail.append(b"0123456789ABC")
+        self.assertEqual(tail.contents(), b"3456789ABC")
+        self.assertEqual(tail.total, 25)
+
+    def test_stream_to_file(self):
+        """The whole log goes to the file in large reads, the tail stays small."""
+        client = MagicMock()
+        response = client.api._get.return_value
+        response.iter_content.side_effect = lambda size: (self.raw[i:i + size] for i in range(0, len(self.raw), size))
+        log_directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, log_directory)
+        handler = DockerHandler("FROM python:3.12-slim", "myapp-python3.12-slim", client=client, logDirectory=log_directory, logTailBytes=64, jobId="job1")
+        self.assertTrue(handler.get_logs(MagicMock(id="abc")))
+        with open(os.path.join(log_directory, "myapp-python3.12-slim-job1.log"), "rb") as f:
+            self.assertEqual(f.read(), self.expected)
+        self.assertGreater(response.iter_content.call_args[0][0], 1)
+        response.close.assert_called_once()
+
+    def test_stream_without_file(self):
+        """Without a log file the size is still counted."""
+        client = MagicMock()
+        client.api._get.return_value.iter_content.return_value = [self.raw]
+        tail = LogTail(64)
+        self.assertEqual(stream_container_logs(client, "abc", tail), len(self.expected))
+
+if __name__ == "__main__":
+    unittest.main()
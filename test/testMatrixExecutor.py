@@ -0,0 +1,236 @@
+import io
+import json
+import unittest
+import sys
+import os
+import shutil
+import tempfile
+import threading
+from unittest.mock import patch, MagicMock
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from srcs.matrixExecutor import MatrixExecutor, version_image_tag
+from srcs.dockerClientManager import DockerClientManager
+from srcs.resultCache import hash_workspace
+
+VERSIONS = ["python:3.7-slim", "python:3.8-slim", "python:3.9-slim", "python:3.10-slim"]
+
+
+class TestMatrixExecutor(unittest.TestCase):
+
+    def setUp(self):
+        """Setup a workspace and a DockerHandler whose execute() passes from a given version upwards."""
+        self.workspace = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.workspace)
+        self.passing = set(VERSIONS[1:])
+        self.executed = []
+        self.slow = set()
+        self.gate = None  # Event every execute() waits for when set
+        from_env = patch("srcs.pythonDockerHandler.docker.from_env", return_value=MagicMock())
+        self.from_env = from_env.start()
+        self.addCleanup(from_env.stop)
+
+        def fake_execute(handler):
+            version = "python:" + handler.image_tag.split("-python")[1]
+            self.executed.append(version)
+            if self.gate is not None:
+                self.gate.wait(5)
+            if version in self.slow:
+                # Keep building until the race cancels this version
+                handler.cancel_event.wait(5)
+                return False
+            return version in self.passing
+
+        execute = patch("srcs.pythonDockerHandler.DockerHandler.execute", autospec=True, side_effect=fake_execute)
+        execute.start()
+        self.addCleanup(execute.stop)
+        self.executor = MatrixExecutor("FROM {version}", "myapp", self.workspace, VERSIONS, max_workers=2)
+
+    def test_run_matrix_builds_every_version(self):
+        """Every version gets a result and the lowest passing one wins."""
+        results = self.executor.run_matrix()
+        self.assertEqual(list(results), VERSIONS)
+        self.assertEqual(sorted(self.executed), sorted(VERSIONS))
+        self.assertFalse(results["python:3.7-slim"].passed)
+        self.assertEqual(self.executor.first_passing(results).version, "python:3.8-slim")
+        with open(os.path.join(self.workspace, "Dockerfile")) as f:
+            self.assertEqual(f.read(), "FROM python:3.8-slim")
+
+    def test_run_matrix_no_passing_version(self):
+        """No winner when every version fails."""
+        self.passing = set()
+        results = self.executor.run_matrix()
+        self.assertIsNone(self.executor.first_passing(results))
+
+    def test_run_race_cancels_losing_versions(self):
+        """Versions above the lowest passing one are cancelled instead of running to completion."""
+        self.slow = {"python:3.9-slim", "python:3.10-slim"}
+        executor = MatrixExecutor("FROM {version}", "myapp", self.workspace, VERSIONS, max_workers=len(VERSIONS))
+        results = executor.run_race()
+        self.assertEqual(executor.first_passing(results).version, "python:3.8-slim")
+        self.assertEqual(results["python:3.7-slim"].status(), "fail")
+        self.assertEqual(results["python:3.9-slim"].status(), "cancelled")
+        self.assertEqual(results["python:3.10-slim"].status(), "cancelled")
+
+    def test_run_bisect_probes_middle_first(self):
+        """Bisection starts in the middle and narrows down to the lowest passing version."""
+        results = self.executor.run_bisect()
+        self.assertEqual(self.executed[0], "python:3.9-slim")
+        self.assertEqual(self.executor.first_passing(results).version, "python:3.8-slim")
+        self.assertEqual(list(results), VERSIONS)
+
+    def test_run_bisect_falls_back_to_linear_scan(self):
+        """A failing newest version after a pass triggers a linear scan of the untried older versions."""
+        self.passing = {"python:3.7-slim", "python:3.9-slim"}
+        results = self.executor.run_bisect()
+        self.assertEqual(self.executor.first_passing(results).version, "python:3.7-slim")
+        self.assertEqual(results["python:3.10-slim"].status(), "fail")
+
+    def test_run_bisect_finds_versions_older_than_every_probe(self):
+        """A project passing only on the oldest versions is found although every bisection probe failed."""
+        for passing in [set(VERSIONS[:2]), set(VERSIONS[:1])]:
+            self.passing = passing
+            self.executed = []
+            results = self.executor.run_bisect()
+            self.assertEqual(self.executor.first_passing(results).version, "python:3.7-slim")
+            self.assertEqual(results["python:3.10-slim"].status(), "fail")
+
+    def test_handlers_share_one_client(self):
+        """With a client manager every version reuses one pooled client."""
+        manager = DockerClientManager(maxPoolSize=8, apiVersion="1.43")
+        executor = MatrixExecutor("FROM {version}", "myapp", self.workspace, VERSIONS, client_manager=manager)
+        executor.run_matrix()
+        self.from_env.assert_called_once_with(version="1.43", max_pool_size=8)
+
+    def test_default_ignores_can_be_turned_off(self):
+        """With use_default_ignores off, directories the default policy drops stay in the build context and the workspace hash."""
+        os.makedirs(os.path.join(self.workspace, "node_modules"))
+        with open(os.path.join(self.workspace, "node_modules", "data.js"), "w") as f:
+            f.write("module.exports = 1")
+        for use_default_ignores in [True, False]:
+            executor = MatrixExecutor("FROM {version}", "myapp", self.workspace, VERSIONS, use_default_ignores=use_default_ignores)
+            executor.prepare_handlers()
+            included = "node_modules/data.js" in executor.build_context.directory_paths()
+            self.assertEqual(included, not use_default_ignores)
+            self.assertEqual(executor.create_handler(VERSIONS[0]).use_default_ignores, use_default_ignores)
+        self.assertNotEqual(hash_workspace(self.workspace), hash_workspace(self.workspace, use_default_ignores=False))
+
+    def test_run_multistage_builds_once(self):
+        """The multistage strategy runs one bake for every version and only validates the images afterwards."""
+        process = MagicMock()
+        process.stdout = io.StringIO("#1 building\n")
+        process.wait.return_value = 0
+        with patch("srcs.matrixExecutor.buildkitBackend.start_bake", return_value=process) as start_bake, \
+                patch("srcs.pythonDockerHandler.DockerHandler.validate_image", autospec=True, return_value=True) as validate_image:
+            executor = MatrixExecutor("FROM {version}", "myapp", self.workspace, VERSIONS, builder="buildkit")
+            results = executor.run_multistage()
+        start_bake.assert_called_once()
+        self.assertEqual(validate_image.call_count, len(VERSIONS))
+        self.assertEqual(self.executed, [])
+        self.assertTrue(all(result.passed for result in results.values()))
+        with open(os.path.join(self.workspace, "Dockerfile.matrix")) as f:
+            self.assertIn("FROM python:3.10-slim AS python3.10-slim", f.read())
+
+    def test_run_multistage_uses_the_baked_image_ids(self):
+        """The images the bake reported are validated and the winner is promoted by id, not through the per-version tags."""
+        process = MagicMock()
+        process.stdout = io.StringIO("")
+        process.wait.return_value = 0
+
+        def start_bake(bake_file, metadata_file):
+            with open(metadata_file, "w") as f:
+                json.dump({f"python{version.split(':')[1]}": {"containerimage.config.digest": f"sha256:{version}"} for version in VERSIONS}, f)
+            return process
+
+        validated = []
+
+        def validate_image(handler):
+            validated.append(handler.image_id)
+            return True
+
+        with patch("srcs.matrixExecutor.buildkitBackend.start_bake", side_effect=start_bake), \
+                patch("srcs.pythonDockerHandler.DockerHandler.validate_image", autospec=True, side_effect=validate_image):
+            executor = MatrixExecutor("FROM {version}", "myapp", self.workspace, VERSIONS, builder="buildkit")
+            results = executor.run_multistage()
+        self.assertEqual(sorted(validated), sorted(f"sha256:{version}" for version in VERSIONS))
+        self.assertEqual(results["python:3.7-slim"].image_id, "sha256:python:3.7-slim")
+        self.from_env.return_value.images.get.assert_called_with("sha256:python:3.7-slim")
+
+    def test_run_multistage_falls_back_when_bake_fails(self):
+        """A failed bake builds the versions separately."""
+        process = MagicMock()
+        process.stdout = io.StringIO("")
+        process.wait.return_value = 1
+        with patch("srcs.matrixExecutor.buildkitBackend.start_bake", return_value=process):
+            executor = MatrixExecutor("FROM {version}", "myapp", self.workspace, VERSIONS, builder="buildkit")
+            results = executor.run_multistage()
+        self.assertEqual(sorted(self.executed), sorted(VERSIONS))
+        self.assertEqual(executor.first_passing(results).version, "python:3.8-slim")
+
+    def test_identical_concurrent_jobs_build_once(self):
+        """Two jobs validating the same content at the same time build each version once, the second job reuses the results."""
+        self.gate = threading.Event()
+        joined = threading.Semaphore(0)
+        executors = []
+        for tag in ["myapp", "other"]:
+            # Each job stages its own copy of the same content, as two submissions of one project do
+            workspace = tempfile.mkdtemp()
+            self.addCleanup(shutil.rmtree, workspace)
+            executors.append(MatrixExecutor("FROM {version}", tag, workspace, VERSIONS, max_workers=len(VERSIONS)))
+        results = {}
+        threads = [threading.Thread(target=lambda executor=executor: results.update({executor.image_tag: executor.run_matrix()})) for executor in executors]
+        with patch("srcs.matrixExecutor.logger.info", side_effect=lambda message: joined.release() if "identical build" in message else None):
+            for thread in threads:
+                thread.start()
+            for _ in VERSIONS:
+                self.assertTrue(joined.acquire(timeout=5))
+            self.gate.set()
+            for thread in threads:
+                thread.join(5)
+        self.assertEqual(sorted(self.executed), sorted(VERSIONS))
+        for version in VERSIONS:
+            # Either job may have run the build of a version, the other one shares it
+            self.assertEqual(sorted(results[tag][version].shared for tag in results), [False, True])
+            self.assertEqual({results[tag][version].passed for tag in results}, {version in self.passing})
+        self.assertEqual(executors[1].first_passing(results["other"]).image_tag, "other-python3.8-slim")
+
+    def test_pinned_base_images(self):
+        """Versions with a recorded digest build FROM it, the others FROM their tag."""
+        executor = MatrixExecutor("FROM {version}", "myapp", self.workspace, VERSIONS, base_images={"python:3.8-slim": "python@sha256:abc"})
+        self.assertEqual(executor.create_handler("python:3.8-slim").dockerfile_content, "FROM python@sha256:abc")
+        self.assertEqual(executor.create_handler("python:3.9-slim").dockerfile_content, "FROM python:3.9-slim")
+
+    def test_container_pool_builds_only_the_winner(self):
+        """With a container pool every version runs in a warm container and only the lowest passing one is built."""
+        with open(os.path.join(self.workspace, "app.py"), "w") as f:
+            f.write("print('hi')")
+
+        def validate_in_pool(handler, pool, archive, install_requirements=False):
+            return "python:" + handler.image_tag.split("-python")[1] in self.passing
+
+        with patch("srcs.pythonDockerHandler.DockerHandler.validate_in_pool", autospec=True, side_effect=validate_in_pool) as pool_validations, \
+                patch("srcs.pythonDockerHandler.DockerHandler.build", autospec=True, return_value=True) as build:
+            executor = MatrixExecutor("FROM {version}", "myapp", self.workspace, VERSIONS, container_pool=MagicMock())
+            results = executor.run_matrix()
+        self.assertEqual(self.executed, [])
+        self.assertEqual(pool_validations.call_count, len(VERSIONS))
+        self.assertEqual([call.args[0].image_tag for call in build.call_args_list], ["myapp-python3.8-slim"])
+        self.assertEqual(executor.first_passing(results).version, "python:3.8-slim")
+        self.assertIsNotNone(results["python:3.8-slim"].image_id)
+        self.assertIsNone(results["python:3.9-slim"].image_id)
+
+    def test_container_pool_falls_back_when_the_winner_does_not_build(self):
+        """A version that passed in a container but fails to build loses to the next passing version."""
+        with patch("srcs.pythonDockerHandler.DockerHandler.validate_in_pool", autospec=True, return_value=True), \
+                patch("srcs.pythonDockerHandler.DockerHandler.build", autospec=True, side_effect=[False, True]):
+            executor = MatrixExecutor("FROM {version}", "myapp", self.workspace, VERSIONS, container_pool=MagicMock())
+            results = executor.run_matrix()
+        self.assertEqual(results["python:3.7-slim"].status(), "fail")
+        self.assertEqual(executor.first_passing(results).version, "python:3.8-slim")
+
+    def test_version_image_tag(self):
+        """Version tags stay valid docker tags."""
+        self.assertEqual(version_image_tag("myapp", "python:3.10-slim"), "myapp-python3.10-slim")
+
+if __name__ == "__main__":
+    unittest.main()
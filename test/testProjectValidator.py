@@ -0,0 +1,94 @@
+import json
+import unittest
+import sys
+import os
+import shutil
+import tempfile
+from unittest.mock import patch
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from srcs.matrixExecutor import VersionResult
+from srcs.projectValidator import ValidationConfig, validate_project
+
+VERSIONS = ["python:3.7-slim", "python:3.8-slim"]
+
+
+class TestProjectValidator(unittest.TestCase):
+
+    def setUp(self):
+        """Setup a project directory and a config keeping every file under a temp directory."""
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        self.project = os.path.join(self.root, "project")
+        os.makedirs(self.project)
+        with open(os.path.join(self.project, "app.py"), "w") as f:
+            f.write("print('hello')")
+        self.config = ValidationConfig(versions=VERSIONS, workspace_root=os.path.join(self.root, "workspaces"), container_log_directory=None,
+                                       log_archive_directory=os.path.join(self.root, "archive"), result_cache_file=None, base_image_file=None, validation_mode="image")
+
+    def fake_run_strategy(self, executor, strategy):
+        self.staged = sorted(os.listdir(executor.workingDirectory))
+        return {"python:3.7-slim": VersionResult("python:3.7-slim", False, 1.0, "app-python3.7-slim"),
+                "python:3.8-slim": VersionResult("python:3.8-slim", True, 2.0, "app-python3.8-slim", image_id="sha256:abc")}
+
+    def test_structured_result(self):
+        """The result names the lowest passing version and serializes to JSON."""
+        with patch("srcs.projectValidator.MatrixExecutor.run_strategy", autospec=True, side_effect=self.fake_run_strategy):
+            result = validate_project(path=self.project, tag="app", config=self.config)
+        self.assertEqual(result.status(), "pass")
+        self.assertEqual(result.winner.version, "python:3.8-slim")
+        self.assertEqual(self.staged, ["app.py", "requirements.txt"])
+        data = json.loads(json.dumps(result.to_dict()))
+        self.assertEqual([version["status"] for version in data["versions"]], ["fail", "pass"])
+        self.assertEqual(data["versions"][1]["image_id"], "sha256:abc")
+        # The job workspace is gone
+        self.assertEqual(os.listdir(self.config.workspace_root), [])
+
+    def test_source_code(self):
+        """Typed source is validated without a project directory."""
+        with patch("srcs.projectValidator.MatrixExecutor.run_strategy", autospec=True, side_effect=self.fake_run_strategy):
+            result = validate_project(source="print('hi')", tag="app", config=self.config)
+        self.assertTrue(result.passed)
+
+    def test_sync_workspace_per_source(self):
+        """In the sync staging mode every typed source gets its own workspace, the same source reuses it."""
+        self.config.staging_mode = "sync"
+        self.config.workspace_cache_root = os.path.join(self.root, "cache")
+        workspaces = []
+
+        def run_strategy(executor, strategy):
+            workspaces.append(executor.workingDirectory)
+            return self.fake_run_strategy(executor, strategy)
+
+        with patch("srcs.projectValidator.MatrixExecutor.run_strategy", autospec=True, side_effect=run_strategy):
+            for source in ["print('hi')", "print('bye')", "print('hi')"]:
+                self.assertTrue(validate_project(source=source, tag="app", config=self.config).passed)
+        self.assertNotEqual(workspaces[0], workspaces[1])
+        self.assertEqual(workspaces[0], workspaces[2])
+
+    def test_errors_reported_not_raised(self):
+        """A project that can't be validated gives an error result."""
+        os.remove(os.path.join(self.project, "app.py"))
+        self.assertEqual(validate_project(path=self.project, config=self.config).status(), "error")
+        self.assertEqual(validate_project(path=os.path.join(self.root, "missing"), config=self.config).status(), "error")
+        self.assertEqual(validate_project(config=self.config).status(), "error")
+
+    def test_unknown_strategy_rejected_up_front(self):
+        """An unknown strategy is an error naming the known ones, nothing is staged for it."""
+        with patch("srcs.projectValidator.build_versions") as build_versions:
+            result = validate_project(path=self.project, strategy="fastest", config=self.config)
+        self.assertEqual(result.status(), "error")
+        self.assertIn("sequential, matrix, race, bisect, multistage", result.error)
+        build_versions.assert_not_called()
+
+    def test_context_size_limit(self):
+        """A build context over the limit is rejected before anything is built."""
+        with open(os.path.join(self.project, "data.bin"), "wb") as f:
+            f.write(b"x" * 2048)
+        self.config.max_context_size = 1024
+        result = validate_project(path=self.project, config=self.config)
+        self.assertEqual(result.status(), "error")
+        self.assertIn("data.bin", result.error)
+
+if __name__ == "__main__":
+    unittest.main()
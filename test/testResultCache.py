@@ -0,0 +1,130 @@
+import unittest
+import sys
+import os
+import shutil
+import tempfile
+import threading
+import time
+from unittest.mock import patch, MagicMock
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from srcs.matrixExecutor import MatrixExecutor
+from srcs.resultCache import FAILURE_TTL, ResultCache, hash_workspace
+
+VERSIONS = ["python:3.7-slim", "python:3.8-slim"]
+
+
+class TestResultCache(unittest.TestCase):
+
+    def setUp(self):
+        """Setup a workspace, a cache file and a mocked docker client."""
+        self.workspace = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.workspace)
+        with open(os.path.join(self.workspace, "app.py"), "w") as f:
+            f.write("print('hello')")
+        self.cache_file = os.path.join(tempfile.mkdtemp(), "results.json")
+        self.addCleanup(shutil.rmtree, os.path.dirname(self.cache_file))
+
+        self.client = MagicMock()
+        self.client.images.get_registry_data.return_value.id = "sha256:base"
+        self.client.images.get.return_value.id = "sha256:built"
+        from_env = patch("srcs.pythonDockerHandler.docker.from_env", return_value=self.client)
+        from_env.start()
+        self.addCleanup(from_env.stop)
+        execute = patch("srcs.pythonDockerHandler.DockerHandler.execute", autospec=True, return_value=True)
+        self.execute = execute.start()
+        self.addCleanup(execute.stop)
+
+    def run_matrix(self):
+        executor = MatrixExecutor("FROM {version}", "myapp", self.workspace, VERSIONS, cache=ResultCache(self.cache_file))
+        return executor.run_matrix()
+
+    def test_building_waits_for_another_process(self):
+        """A second process building the same key waits for the first one, then finds its result."""
+        first, second = ResultCache(self.cache_file), ResultCache(self.cache_file)
+        waited = []
+
+        def build_second():
+            with second.building("key", poll_interval=0.01) as second_waited:
+                waited.append(second_waited)
+
+        with first.building("key") as first_waited:
+            thread = threading.Thread(target=build_second)
+            thread.start()
+            thread.join(0.2)
+            self.assertTrue(thread.is_alive())
+            first.put("key", "python:3.7-slim", True, "sha256:built")
+        thread.join(5)
+        self.assertEqual((first_waited, waited), (False, [True]))
+        self.assertEqual(second.get("key")["image_id"], "sha256:built")
+
+    def test_concurrent_saves_keep_every_entry(self):
+        """Caches of several processes saving at once neither fail nor drop each other's entries."""
+        errors = []
+
+        def put_many(writer):
+            cache = ResultCache(self.cache_file)
+            for number in range(50):
+                cache.put(f"{writer}-{number}", "python:3.7-slim", True, "sha256:built")
+
+        threads = [threading.Thread(target=put_many, args=(writer,)) for writer in range(4)]
+        with patch("srcs.resultCache.logger.error", side_effect=errors.append):
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join(30)
+        self.assertEqual(errors, [])
+        self.assertEqual(len(ResultCache(self.cache_file).entries), 200)
+        self.assertEqual(sorted(os.listdir(os.path.dirname(self.cache_file))), ["results.json", "results.json.lock"])
+
+    def test_hash_ignores_generated_dockerfiles(self):
+        """Writing the per-version Dockerfiles doesn't change the workspace hash."""
+        before = hash_workspace(self.workspace)
+        with open(os.path.join(self.workspace, "Dockerfile.python3.8-slim"), "w") as f:
+            f.write("FROM python:3.8-slim")
+        self.assertEqual(before, hash_workspace(self.workspace))
+        with open(os.path.join(self.workspace, "app.py"), "w") as f:
+            f.write("print('changed')")
+        self.assertNotEqual(before, hash_workspace(self.workspace))
+
+    def test_cache_hit_skips_execute(self):
+        """A second run on the same workspace and base image reuses the results without building."""
+        self.run_matrix()
+        self.assertEqual(self.execute.call_count, 2)
+        results = self.run_matrix()
+        self.assertEqual(self.execute.call_count, 2)
+        self.assertTrue(all(result.cached and result.passed for result in results.values()))
+
+    def test_new_base_image_digest_invalidates(self):
+        """A base image that moved to a new digest is built again."""
+        self.run_matrix()
+        self.client.images.get_registry_data.return_value.id = "sha256:newbase"
+        self.run_matrix()
+        self.assertEqual(self.execute.call_count, 4)
+
+    def test_moved_tag_invalidates_in_a_long_lived_process(self):
+        """A cache shared by the jobs of one process resolves the base image digest again for every job."""
+        cache = ResultCache(self.cache_file)
+        MatrixExecutor("FROM {version}", "myapp", self.workspace, VERSIONS, cache=cache).run_matrix()
+        self.client.images.get_registry_data.return_value.id = "sha256:newbase"
+        MatrixExecutor("FROM {version}", "myapp", self.workspace, VERSIONS, cache=cache).run_matrix()
+        self.assertEqual(self.execute.call_count, 4)
+
+    def test_failures_expire(self):
+        """A failed result is reused until the failure TTL passes, then the version is validated again."""
+        self.execute.return_value = False
+        self.run_matrix()
+        self.run_matrix()
+        self.assertEqual(self.execute.call_count, 2)
+        with patch("srcs.resultCache.time.time", return_value=time.time() + FAILURE_TTL + 1):
+            self.run_matrix()
+        self.assertEqual(self.execute.call_count, 4)
+
+    def test_run_timeout_and_mode_are_part_of_the_key(self):
+        """A result validated with another run timeout or validation mode is not reused."""
+        cache = ResultCache(self.cache_file)
+        keys = {cache.key("workspace", "FROM python:3.8-slim", "sha256:base", timeout, mode) for timeout in [60, 5] for mode in ["classic", "container"]}
+        self.assertEqual(len(keys), 4)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+import threading
+import unittest
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from srcs.singleFlight import FlightAbandoned, SingleFlight
+
+
+class TestSingleFlight(unittest.TestCase):
+
+    def setUp(self):
+        """Setup a call blocked until released, counting how often it runs."""
+        self.flights = SingleFlight()
+        self.release = threading.Event()
+        self.joined = threading.Semaphore(0)
+        self.started = threading.Event()
+        self.calls = 0
+
+    def call(self):
+        self.calls += 1
+        self.started.set()
+        self.release.wait(5)
+        return "image"
+
+    def start_callers(self, count, key="python:3.12-slim"):
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(self.flights.do(key, self.call, on_join=self.joined.release))) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        return threads, results
+
+    def test_concurrent_calls_run_once(self):
+        """Test callers arriving while the call is in flight share its result."""
+        threads, results = self.start_callers(3)
+        for _ in range(2):
+            self.assertTrue(self.joined.acquire(timeout=5))
+        self.release.set()
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(sorted(results), [("image", False), ("image", True), ("image", True)])
+
+    def test_later_calls_run_again(self):
+        """Test a call made after the previous one finished is not coalesced."""
+        self.release.set()
+        self.assertEqual(self.flights.do("key", self.call), ("image", False))
+        self.assertEqual(self.flights.do("key", self.call), ("image", False))
+        self.assertEqual(self.calls, 2)
+
+    def test_errors_reach_every_caller(self):
+        """Test the exception of the call is raised in the callers that joined it."""
+        errors = []
+
+        def failing():
+            self.release.wait(5)
+            raise RuntimeError("pull failed")
+
+        def caller():
+            try:
+                self.flights.do("key", failing, on_join=self.joined.release)
+            except RuntimeError as e:
+                errors.append(str(e))
+
+        threads = [threading.Thread(target=caller) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        self.assertTrue(self.joined.acquire(timeout=5))
+        self.release.set()
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual(errors, ["pull failed", "pull failed"])
+
+    def test_abandon(self):
+        """Test a waiting caller stops waiting once abandon() is true, the call itself goes on."""
+        threads, results = self.start_callers(1)
+        self.assertTrue(self.started.wait(5))
+        cancelled = threading.Event()
+        cancelled.set()
+        with self.assertRaises(FlightAbandoned):
+            self.flights.do("python:3.12-slim", self.call, abandon=cancelled.is_set, poll_interval=0.01)
+        self.release.set()
+        threads[0].join(5)
+        self.assertEqual(results, [("image", False)])
+
+
+if __name__ == '__main__':
+    unittest.main()
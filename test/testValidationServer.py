@@ -0,0 +1,136 @@
+import json
+import threading
+import time
+import unittest
+import sys
+import os
+import urllib.error
+import urllib.request
+from unittest.mock import patch
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from srcs.matrixExecutor import VersionResult
+from srcs.projectValidator import MatrixResult, ValidationConfig
+from srcs.validationServer import Job, JobQueue, ValidationService, create_server, parse_job
+
+
+def fake_validate_project(path=None, source=None, versions=None, strategy=None, tag="python-app", config=None, job_id=None):
+    passed = source is not None
+    results = {"python:3.12-slim": VersionResult("python:3.12-slim", passed, 1.0, f"{tag}-python3.12-slim")}
+    return MatrixResult(tag, strategy or config.strategy, job_id, results)
+
+
+class TestJobQueue(unittest.TestCase):
+
+    def test_priority_order(self):
+        """Test higher priorities come first and equal priorities in submission order."""
+        queue = JobQueue()
+        jobs = [Job(source="a", priority=0), Job(source="b", priority=5), Job(source="c", priority=0), Job(source="d", priority=5)]
+        for job in jobs:
+            queue.put(job)
+        self.assertEqual([queue.get() for _ in jobs], [jobs[1], jobs[3], jobs[0], jobs[2]])
+
+    def test_close_releases_waiting_workers(self):
+        """Test get() returns None once the queue is closed."""
+        queue = JobQueue()
+        results = []
+        worker = threading.Thread(target=lambda: results.append(queue.get()))
+        worker.start()
+        queue.close()
+        worker.join(5)
+        self.assertEqual(results, [None])
+
+    def test_parse_job(self):
+        """Test submitted bodies are validated."""
+        job = parse_job(b'{"path": "/projects/a", "tag": "a", "priority": 3, "versions": ["python:3.12-slim"]}')
+        self.assertEqual((job.path, job.tag, job.priority, job.versions, job.status), ("/projects/a", "a", 3, ["python:3.12-slim"], "queued"))
+        for body in [b"not json", b"[]", b'{"tag": "a"}', b'{"path": "a", "source": "b"}', b'{"source": "a", "versions": "python:3.12"}']:
+            with self.assertRaises(ValueError):
+                parse_job(body)
+
+
+@patch("srcs.validationServer.get_client_manager")
+@patch("srcs.validationServer.validate_project", side_effect=fake_validate_project)
+class TestValidationServer(unittest.TestCase):
+
+    def setUp(self):
+        self.config = ValidationConfig(versions=["python:3.12-slim"], base_image_file=None, validation_mode="image")
+
+    def start_server(self, workers=1):
+        service = ValidationService(self.config, workers)
+        service.start()
+        server = create_server(service, port=0)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(service.stop)
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return service, f"http://127.0.0.1:{server.server_address[1]}"
+
+    def request(self, url, body=None):
+        data = json.dumps(body).encode() if body is not None else None
+        try:
+            with urllib.request.urlopen(urllib.request.Request(url, data=data), timeout=5) as response:
+                return response.status, json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            return e.code, json.loads(e.read())
+
+    def wait(self, url, job_id):
+        for _ in range(100):
+            status, job = self.request(f"{url}/jobs/{job_id}")
+            if job["status"] not in ("queued", "running"):
+                return job
+            time.sleep(0.05)
+        self.fail(f"Job {job_id} did not finish")
+
+    def test_submit_and_poll(self, mock_validate, mock_client_manager):
+        """Test a job is queued, run by a worker with its id as the log job id, then reported with its timing."""
+        service, url = self.start_server()
+        mock_client_manager.return_value.get_client.assert_called_once()
+        status, submitted = self.request(f"{url}/jobs", {"source": "print('hi')", "tag": "hi"})
+        self.assertEqual(status, 202)
+        job = self.wait(url, submitted["id"])
+        self.assertEqual(job["status"], "pass")
+        self.assertEqual(job["result"]["version"], "python:3.12-slim")
+        self.assertEqual(job["result"]["job_id"], submitted["id"])
+        self.assertGreaterEqual(job["run_time"], 0)
+        self.assertGreaterEqual(job["queue_time"], 0)
+        status, job = self.request(f"{url}/jobs", {"path": "/projects/a"})
+        self.assertEqual(self.wait(url, job["id"])["status"], "fail")
+        self.assertEqual(self.request(f"{url}/health"), (200, {"queued": 0, "running": 0, "workers": 1}))
+
+    def test_errors(self, mock_validate, mock_client_manager):
+        """Test invalid jobs, unknown jobs and failing validations."""
+        service, url = self.start_server()
+        self.assertEqual(self.request(f"{url}/jobs", {"tag": "a"})[0], 400)
+        self.assertEqual(self.request(f"{url}/jobs/0123abcd")[0], 404)
+        self.assertEqual(self.request(f"{url}/unknown")[0], 404)
+        mock_validate.side_effect = RuntimeError("daemon gone")
+        status, job = self.request(f"{url}/jobs", {"source": "print('hi')"})
+        job = self.wait(url, job["id"])
+        self.assertEqual((job["status"], job["result"]), ("error", {"error": "daemon gone"}))
+
+    def test_workers_take_jobs_by_priority(self, mock_validate, mock_client_manager):
+        """Test queued jobs are run by priority once a worker is free."""
+        release = threading.Event()
+        order = []
+
+        def blocking_validate(**kwargs):
+            release.wait(5)
+            order.append(kwargs["tag"])
+            return fake_validate_project(**kwargs)
+
+        mock_validate.side_effect = blocking_validate
+        service, url = self.start_server(workers=1)
+        first = self.request(f"{url}/jobs", {"source": "x", "tag": "first"})[1]["id"]
+        while service.get(first).status == "queued":
+            time.sleep(0.01)
+        ids = [self.request(f"{url}/jobs", {"source": "x", "tag": tag, "priority": priority})[1]["id"] for tag, priority in [("low", 0), ("high", 9)]]
+        self.assertEqual(self.request(f"{url}/health")[1], {"queued": 2, "running": 1, "workers": 1})
+        release.set()
+        for job_id in ids:
+            self.wait(url, job_id)
+        self.assertEqual(order, ["first", "high", "low"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+import unittest
+import sys
+import os
+import shutil
+import tempfile
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from srcs.workspaceManager import WorkspaceManager, locked_workspace
+
+
+class TestWorkspaceManager(unittest.TestCase):
+
+    def setUp(self):
+        """Setup an empty workspace root."""
+        self.root = os.path.join(tempfile.mkdtemp(), "workspaces")
+        self.addCleanup(shutil.rmtree, os.path.dirname(self.root))
+        self.manager = WorkspaceManager(self.root)
+
+    def test_jobs_get_distinct_workspaces(self):
+        """Two jobs never stage into the same directory."""
+        first = self.manager.create()
+        second = self.manager.create()
+        self.assertNotEqual(first, second)
+        self.assertEqual(os.path.dirname(first), self.root)
+        self.assertEqual(os.listdir(first), [])
+
+    def test_job_workspace_is_deleted_afterwards(self):
+        """The workspace is removed even when the job fails."""
+        with self.assertRaises(RuntimeError):
+            with self.manager.job_workspace() as workspace:
+                with open(os.path.join(workspace, "app.py"), "w") as f:
+                    f.write("print('hello')")
+                raise RuntimeError("build failed")
+        self.assertFalse(os.path.exists(workspace))
+
+    def test_locked_workspace(self):
+        """The lock file lives next to the workspace, not inside its build context."""
+        workspace = os.path.join(self.root, "project")
+        with locked_workspace(workspace) as locked:
+            self.assertEqual(locked, workspace)
+            self.assertTrue(os.path.isfile(workspace + ".lock"))
+        self.assertFalse(os.path.exists(workspace))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+import unittest
+import sys
+import os
+import shutil
+import tempfile
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from srcs.workspaceSync import copy_paths, sync_directory, sync_files
+
+
+class TestWorkspaceSync(unittest.TestCase):
+
+    def setUp(self):
+        """Setup a project directory and an empty workspace."""
+        self.source = tempfile.mkdtemp()
+        self.workspace = os.path.join(tempfile.mkdtemp(), "workspace")
+        self.addCleanup(shutil.rmtree, self.source)
+        self.addCleanup(shutil.rmtree, os.path.dirname(self.workspace))
+        os.makedirs(os.path.join(self.source, "pkg"))
+        self.write("app.py", "print('hello')")
+        self.write("pkg/util.py", "X = 1")
+
+    def write(self, path, content):
+        with open(os.path.join(self.source, path), "w") as f:
+            f.write(content)
+
+    def test_second_sync_copies_nothing(self):
+        """An unchanged project is not copied again."""
+        self.assertEqual(sync_directory(self.source, self.workspace).copied, 2)
+        stats = sync_directory(self.source, self.workspace)
+        self.assertEqual((stats.copied, stats.deleted, stats.unchanged), (0, 0, 2))
+
+    def test_only_changed_file_copied(self):
+        """A one-file change copies one file."""
+        sync_directory(self.source, self.workspace)
+        self.write("pkg/util.py", "X = 22")
+        stats = sync_directory(self.source, self.workspace)
+        self.assertEqual(stats.copied, 1)
+        with open(os.path.join(self.workspace, "pkg/util.py")) as f:
+            self.assertEqual(f.read(), "X = 22")
+
+    def test_removed_files_deleted_and_kept_files_protected(self):
+        """Files removed from the project are deleted, generated files survive."""
+        sync_directory(self.source, self.workspace)
+        with open(os.path.join(self.workspace, "Dockerfile"), "w") as f:
+            f.write("FROM python:3.12-slim")
+        shutil.rmtree(os.path.join(self.source, "pkg"))
+        stats = sync_directory(self.source, self.workspace, keep=lambda path: path == "Dockerfile")
+        self.assertEqual(stats.deleted, 1)
+        self.assertFalse(os.path.exists(os.path.join(self.workspace, "pkg")))
+        self.assertTrue(os.path.exists(os.path.join(self.workspace, "Dockerfile")))
+
+    def test_excluded_paths_not_synced(self):
+        """Paths left out of include are neither copied nor kept in the workspace."""
+        os.makedirs(os.path.join(self.source, "venv", "lib"))
+        self.write("venv/lib/site.py", "")
+        sync_directory(self.source, self.workspace)
+        stats = sync_directory(self.source, self.workspace, include={"app.py", "pkg", "pkg/util.py"})
+        self.assertEqual(stats.deleted, 1)
+        self.assertEqual(sorted(os.listdir(self.workspace)), ["app.py", "pkg"])
+
+    def test_copy_paths(self):
+        """Only the given paths are copied."""
+        self.assertEqual(copy_paths(self.source, self.workspace, ["pkg/util.py"]), 1)
+        self.assertEqual(os.listdir(self.workspace), ["pkg"])
+
+    def test_sync_files_rewrites_changed_content_only(self):
+        """In-memory source is only rewritten when it changed."""
+        sync_files({"app.py": "print(1)", "requirements.txt": ""}, self.workspace)
+        stats = sync_files({"app.py": "print(2)", "requirements.txt": ""}, self.workspace)
+        self.assertEqual((stats.copied, stats.unchanged), (1, 1))
+
+if __name__ == "__main__":
+    unittest.main()